@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Pipeline de archivos estáticos: minificación, huella de contenido y precompresión.
+
+`python activos.py` recorre static/, minifica CSS y JS, copia cada archivo
+a static/dist/ con el hash de su contenido en el nombre (main.css →
+main.3f9a1c0b7e2d.css), guarda las variantes .gz y .br (si está instalado
+el paquete `brotli`) y escribe static/dist/manifest.json.
+
+En la aplicación, init_app() lee el manifiesto: url_for('static', ...) en
+las plantillas apunta a /assets/<nombre con hash> y esa ruta entrega la
+variante precomprimida que acepte el navegador con caché inmutable de un
+año. Como el nombre cambia con el contenido, nunca hay que revalidar. Sin
+manifiesto (o con debug activo) se usa el manejador estático de Flask.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import sys
+
+from flask import abort, current_app, request, send_from_directory, url_for
+from flask.sessions import SecureCookieSessionInterface
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin él solo se genera la variante gzip
+    brotli = None
+
+MANIFIESTO = 'manifest.json'
+PREFIJO = '/assets/'
+
+# Tipos que vale la pena comprimir (imágenes y fuentes ya vienen comprimidas)
+COMPRIMIBLES = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map', '.xml', '.ico'}
+TAMAÑO_MINIMO_COMPRESION = 256
+
+# Orden de preferencia: (codificación HTTP, sufijo del archivo)
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+# Manifiesto cargado por init_app: original → nombre con hash, y variantes de cada uno
+_archivos = {}
+_variantes = {}
+
+
+# ---------------------------------------------------------------------------
+# Minificación
+# ---------------------------------------------------------------------------
+
+_CSS_CADENA_O_COMENTARIO = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.S)
+
+
+def minificar_css(texto):
+    """Quitar comentarios y espacios sobrantes sin tocar el contenido de las cadenas"""
+    cadenas = []
+
+    def proteger(m):
+        if m.group(1) is None:
+            return ''
+        cadenas.append(m.group(1))
+        return f'\x00{len(cadenas) - 1}\x00'
+
+    texto = _CSS_CADENA_O_COMENTARIO.sub(proteger, texto)
+    texto = re.sub(r'\s+', ' ', texto)
+    # Sin espacios alrededor de llaves, ; , > ni después de ':' (antes de ':' puede ser un selector)
+    texto = re.sub(r'\s*([{};,>])\s*', r'\1', texto)
+    texto = re.sub(r':\s+', ':', texto)
+    texto = texto.replace(';}', '}').strip()
+    return re.sub('\x00(\\d+)\x00', lambda m: cadenas[int(m.group(1))], texto)
+
+
+# Tras estos caracteres (o palabras) una '/' abre una expresión regular y no es una división
+_ANTES_DE_REGEX = set('(,=:[!&|?{};+-*%<>~^\n')
+_PALABRAS_ANTES_DE_REGEX = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void', 'throw'}
+
+
+def _es_palabra(c):
+    return c.isalnum() or c in '_$\\' or ord(c) > 127
+
+
+def minificar_js(texto):
+    """Minificación conservadora: quita comentarios, sangrías y espacios redundantes.
+
+    Recorre el código con un analizador mínimo que respeta cadenas,
+    plantillas (con ${...} anidados) y expresiones regulares. Conserva los
+    saltos de línea entre sentencias para no depender de la inserción
+    automática de punto y coma. No renombra variables.
+    """
+    salida = []
+    pila = []  # Profundidad de llaves de cada ${...} abierto dentro de una plantilla
+    i, n = 0, len(texto)
+
+    def ultimo():
+        return salida[-1][-1] if salida and salida[-1] else ''
+
+    def ultima_palabra():
+        j = len(salida) - 1
+        palabra = ''
+        while j >= 0 and len(salida[j]) == 1 and _es_palabra(salida[j]):
+            palabra = salida[j] + palabra
+            j -= 1
+        return palabra
+
+    def copiar_hasta(cierre, inicio):
+        """Copiar literal de cadena o regex hasta `cierre` sin escapar"""
+        j, en_clase = inicio, False
+        while j < n:
+            c = texto[j]
+            if c == '\\':
+                j += 2
+                continue
+            if cierre == '/' and c == '[':
+                en_clase = True
+            elif cierre == '/' and c == ']':
+                en_clase = False
+            elif c == cierre and not en_clase:
+                return j + 1
+            elif c == '\n' and cierre != '`':
+                return j  # Literal mal cerrado: no tragar el resto del archivo
+            j += 1
+        return n
+
+    def copiar_plantilla(inicio):
+        """Copiar una plantilla `...` hasta su cierre o hasta el siguiente ${"""
+        j = inicio
+        while j < n:
+            c = texto[j]
+            if c == '\\':
+                j += 2
+                continue
+            if c == '`':
+                return j + 1, False
+            if c == '$' and texto.startswith('${', j):
+                return j + 2, True
+            j += 1
+        return n, False
+
+    while i < n:
+        c = texto[i]
+
+        if c.isspace():
+            j = i
+            while j < n and texto[j].isspace():
+                j += 1
+            siguiente = texto[j] if j < n else ''
+            previo = ultimo()
+            if '\n' in texto[i:j]:
+                if previo and previo != '\n' and siguiente:
+                    salida.append('\n')
+            elif previo and siguiente and (
+                    (_es_palabra(previo) and _es_palabra(siguiente)) or
+                    (previo in '+-' and siguiente == previo)):
+                salida.append(' ')
+            i = j
+            continue
+
+        if c == '/' and texto.startswith('//', i):
+            while i < n and texto[i] != '\n':
+                i += 1
+            continue
+        if c == '/' and texto.startswith('/*', i):
+            fin = texto.find('*/', i + 2)
+            i = n if fin < 0 else fin + 2
+            if ultimo() and _es_palabra(ultimo()) and i < n and _es_palabra(texto[i]):
+                salida.append(' ')
+            continue
+
+        if c in '"\'':
+            j = copiar_hasta(c, i + 1)
+            salida.append(texto[i:j])
+            i = j
+            continue
+
+        if c == '/':
+            previo = ultimo()
+            if not previo or previo in _ANTES_DE_REGEX or ultima_palabra() in _PALABRAS_ANTES_DE_REGEX:
+                j = copiar_hasta('/', i + 1)
+                while j < n and texto[j].isalpha():  # Banderas
+                    j += 1
+                salida.append(texto[i:j])
+                i = j
+                continue
+
+        if c == '`' or (c == '}' and pila and pila[-1] == 0):
+            if c == '}':
+                pila.pop()
+            j, abre_expresion = copiar_plantilla(i + 1)
+            salida.append(texto[i:j])
+            if abre_expresion:
+                pila.append(0)
+            i = j
+            continue
+
+        if pila and c == '{':
+            pila[-1] += 1
+        elif pila and c == '}':
+            pila[-1] -= 1
+        salida.append(c)
+        i += 1
+
+    return ''.join(salida).strip() + '\n'
+
+
+MINIFICADORES = {'.css': minificar_css, '.js': minificar_js}
+
+
+# ---------------------------------------------------------------------------
+# Construcción
+# ---------------------------------------------------------------------------
+
+def huella(contenido):
+    return hashlib.sha256(contenido).hexdigest()[:12]
+
+
+def nombre_con_huella(ruta, contenido):
+    base, extension = posixpath.splitext(ruta)
+    return f'{base}.{huella(contenido)}{extension}'
+
+
+def comprimir(contenido):
+    """Variantes precomprimidas {sufijo: bytes}, solo las que ahorran espacio"""
+    variantes = {'.gz': gzip.compress(contenido, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variantes['.br'] = brotli.compress(contenido, quality=11)
+    return {sufijo: datos for sufijo, datos in variantes.items() if len(datos) < len(contenido)}
+
+
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def _reescribir_urls_css(texto, ruta_css, archivos):
+    """Apuntar url(...) relativos del CSS a los nombres con huella"""
+    directorio = posixpath.dirname(ruta_css)
+
+    def reemplazar(m):
+        comilla, destino = m.group(1), m.group(2)
+        if re.match(r'^(?:[a-z]+:|/|#)', destino):
+            return m.group(0)
+        ruta, sep, sufijo = destino.partition('?')
+        ruta, almohadilla, fragmento = ruta.partition('#')
+        objetivo = posixpath.normpath(posixpath.join(directorio, ruta))
+        if objetivo not in archivos:
+            return m.group(0)
+        nuevo = posixpath.relpath(archivos[objetivo], directorio or '.')
+        return f'url({comilla}{nuevo}{almohadilla}{fragmento}{comilla})'
+
+    return _CSS_URL.sub(reemplazar, texto)
+
+
+def construir(origen, destino, minificar=True):
+    """Generar destino/ con los archivos de origen/ con huella y el manifiesto.
+
+    Devuelve el manifiesto escrito. Los CSS se procesan al final para que
+    sus url(...) puedan apuntar a las imágenes y fuentes ya renombradas.
+    """
+    origen, destino = os.path.abspath(origen), os.path.abspath(destino)
+    rutas = []
+    for carpeta, subcarpetas, nombres in os.walk(origen):
+        if os.path.abspath(carpeta) == destino:
+            subcarpetas[:] = []
+            continue
+        subcarpetas[:] = [s for s in subcarpetas if os.path.join(carpeta, s) != destino]
+        for nombre in nombres:
+            completa = os.path.join(carpeta, nombre)
+            rutas.append(os.path.relpath(completa, origen).replace(os.sep, '/'))
+    rutas.sort(key=lambda r: (r.endswith('.css'), r))
+
+    # Nunca borrar una carpeta que no generamos nosotros
+    if os.path.isdir(destino):
+        if os.listdir(destino) and not os.path.isfile(os.path.join(destino, MANIFIESTO)):
+            raise SystemExit(f'❌ {destino} existe y no contiene {MANIFIESTO}; no se sobrescribe')
+        shutil.rmtree(destino)
+
+    archivos, variantes, tamaños = {}, {}, {}
+    for ruta in rutas:
+        with open(os.path.join(origen, ruta), 'rb') as f:
+            contenido = f.read()
+        extension = posixpath.splitext(ruta)[1].lower()
+        original = len(contenido)
+        if extension == '.css':
+            contenido = _reescribir_urls_css(contenido.decode('utf-8'), ruta, archivos).encode('utf-8')
+        if minificar and extension in MINIFICADORES:
+            contenido = MINIFICADORES[extension](contenido.decode('utf-8')).encode('utf-8')
+
+        final = nombre_con_huella(ruta, contenido)
+        salida = os.path.join(destino, *final.split('/'))
+        os.makedirs(os.path.dirname(salida), exist_ok=True)
+        with open(salida, 'wb') as f:
+            f.write(contenido)
+
+        comprimidas = {}
+        if extension in COMPRIMIBLES and len(contenido) >= TAMAÑO_MINIMO_COMPRESION:
+            comprimidas = comprimir(contenido)
+        for sufijo, datos in comprimidas.items():
+            with open(salida + sufijo, 'wb') as f:
+                f.write(datos)
+
+        archivos[ruta] = final
+        variantes[final] = sorted(codificacion for codificacion, sufijo in CODIFICACIONES if sufijo in comprimidas)
+        tamaños[ruta] = (original, len(contenido), {s: len(d) for s, d in comprimidas.items()})
+
+    manifiesto = {'archivos': archivos, 'variantes': variantes}
+    with open(os.path.join(destino, MANIFIESTO), 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=2, ensure_ascii=False, sort_keys=True)
+        f.write('\n')
+    return manifiesto, tamaños
+
+
+# ---------------------------------------------------------------------------
+# Integración con Flask
+# ---------------------------------------------------------------------------
+
+def carpeta_activos(app):
+    return app.config.get('ACTIVOS_CARPETA') or os.path.join(app.static_folder, 'dist')
+
+
+def cargar_manifiesto(app):
+    """Leer el manifiesto; devuelve False si todavía no se ha construido"""
+    ruta = os.path.join(carpeta_activos(app), MANIFIESTO)
+    _archivos.clear()
+    _variantes.clear()
+    if not os.path.isfile(ruta):
+        return False
+    with open(ruta, encoding='utf-8') as f:
+        manifiesto = json.load(f)
+    _archivos.update(manifiesto['archivos'])
+    _variantes.update((nombre, frozenset(v)) for nombre, v in manifiesto['variantes'].items())
+    return True
+
+
+def url_activo(endpoint, **valores):
+    """url_for de las plantillas: los estáticos con huella se sirven desde /assets/"""
+    if endpoint == 'static' and _archivos and not current_app.debug:
+        final = _archivos.get(valores.get('filename'))
+        if final is not None:
+            valores['filename'] = final
+            endpoint = 'activos'
+    return url_for(endpoint, **valores)
+
+
+def servir(filename):
+    """Archivo con huella: variante precomprimida aceptada y caché inmutable"""
+    variantes = _variantes.get(filename)
+    if variantes is None:
+        abort(404)
+
+    codificacion, sufijo = None, ''
+    for candidata, sufijo_candidato in CODIFICACIONES:
+        if candidata in variantes and request.accept_encodings[candidata]:
+            codificacion, sufijo = candidata, sufijo_candidato
+            break
+
+    tipo = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    # Content-Disposition con el nombre lógico, no el de la variante (.gz, .br) que se envía
+    respuesta = send_from_directory(carpeta_activos(current_app), filename + sufijo, mimetype=tipo,
+                                    download_name=posixpath.basename(filename),
+                                    max_age=current_app.config.get('ACTIVOS_MAX_AGE', 31536000))
+    if codificacion:
+        respuesta.content_encoding = codificacion
+    if variantes:
+        respuesta.vary.add('Accept-Encoding')
+    respuesta.cache_control.public = True
+    respuesta.cache_control.immutable = True
+    return respuesta
+
+
+class SesionSinActivos(SecureCookieSessionInterface):
+    """Sesión de cookie que las peticiones a /assets/ no abren ni guardan.
+
+    Flask marca la sesión como usada en cuanto alguien la lee (Flask-Login
+    lo hace después de cada vista) y entonces añade `Vary: Cookie`, que
+    haría que los proxies guarden una copia por usuario de archivos iguales
+    para todos. Los activos reciben una sesión vacía que nunca se escribe.
+    """
+
+    def open_session(self, app, request):
+        if request.path.startswith(PREFIJO):
+            return self.session_class()
+        return super().open_session(app, request)
+
+    def save_session(self, app, session, response):
+        if not request.path.startswith(PREFIJO):
+            super().save_session(app, session, response)
+
+
+def init_app(app):
+    """Registrar /assets/ y el url_for con huella si existe el manifiesto"""
+    app.add_url_rule(PREFIJO + '<path:filename>', 'activos', servir)
+    app.session_interface = SesionSinActivos()
+    if cargar_manifiesto(app):
+        app.jinja_env.globals['url_for'] = url_activo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    parser.add_argument('--origen', default=os.path.join(raiz, 'static'))
+    parser.add_argument('--destino', default=os.path.join(raiz, 'static', 'dist'))
+    parser.add_argument('--sin-minificar', action='store_true', help='Solo huella y compresión')
+    args = parser.parse_args()
+
+    print(f"🛠️  Construyendo activos de {args.origen}...")
+    if brotli is None:
+        print("⚠️  Paquete 'brotli' no instalado: solo se generan variantes gzip")
+    manifiesto, tamaños = construir(args.origen, args.destino, minificar=not args.sin_minificar)
+    for ruta, (original, minificado, comprimidos) in tamaños.items():
+        extra = ''.join(f"  {sufijo} {tamaño:,} B" for sufijo, tamaño in sorted(comprimidos.items()))
+        print(f"   ✅ {ruta} → {manifiesto['archivos'][ruta]}  ({original:,} B → {minificado:,} B{extra})")
+    print(f"💾 Manifiesto en {os.path.join(args.destino, MANIFIESTO)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,336 @@
+# almacenamiento.py - Almacenamiento de archivos direccionado por contenido (SHA-256)
+import hashlib
+import io
+import mimetypes
+import os
+import tempfile
+import zipfile
+from collections import Counter
+from flask import current_app, abort, send_file, make_response, g, has_app_context
+from sqlalchemy import bindparam, event, select, update
+from sqlalchemy.orm import Session
+from werkzeug.utils import secure_filename
+import dialecto
+from extensions import db
+from models import ArchivoContenido
+
+TAMAÑO_BLOQUE = 64 * 1024
+DIRECTORIO_CONTENIDO = 'contenido'
+
+
+def _raiz():
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], DIRECTORIO_CONTENIDO)
+
+
+def ruta_contenido(sha256):
+    """Ruta del archivo para un hash, repartida en subdirectorios por prefijo (ab/cd/abcd...)"""
+    return os.path.join(_raiz(), sha256[:2], sha256[2:4], sha256)
+
+
+def es_clave_contenido(clave):
+    """Las claves nuevas tienen la forma '<sha256>/<nombre original>'"""
+    if not clave or '/' not in clave:
+        return False
+    sha256 = clave.split('/', 1)[0]
+    return len(sha256) == 64 and all(c in '0123456789abcdef' for c in sha256)
+
+
+def hash_de(clave):
+    return clave.split('/', 1)[0] if es_clave_contenido(clave) else None
+
+
+def nombre_de(clave):
+    """Nombre original del archivo guardado en la clave"""
+    return os.path.basename(clave) if clave else None
+
+
+def ruta_archivo(clave):
+    """Ruta en disco de una clave de contenido o de una ruta antigua ('tareas/...', 'entregas/...')"""
+    if es_clave_contenido(clave):
+        return ruta_contenido(hash_de(clave))
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], clave)
+
+
+def enviar_archivo(clave, como_adjunto=True):
+    """Respuesta de descarga para una clave sin cargar el archivo en memoria.
+
+    Con SERVIR_ARCHIVOS = 'x-accel' (nginx) o 'x-sendfile' (Apache/lighttpd)
+    el servidor web envía el archivo y el worker queda libre de inmediato.
+    Si no, `send_file` usa `wsgi.file_wrapper` (sendfile en gunicorn) y
+    atiende Range, If-None-Match e If-Modified-Since.
+    """
+    ruta = ruta_archivo(clave)
+    if not os.path.isfile(ruta):
+        abort(404)
+
+    nombre = nombre_de(clave)
+    modo = current_app.config.get('SERVIR_ARCHIVOS')
+    sha256 = hash_de(clave)
+
+    if modo in ('x-accel', 'x-sendfile'):
+        respuesta = make_response('')
+        respuesta.mimetype = mimetypes.guess_type(nombre)[0] or 'application/octet-stream'
+        if modo == 'x-accel':
+            relativa = os.path.relpath(ruta, current_app.config['UPLOAD_FOLDER']).replace(os.sep, '/')
+            respuesta.headers['X-Accel-Redirect'] = current_app.config.get('X_ACCEL_PREFIJO', '/_uploads/') + relativa
+        else:
+            respuesta.headers['X-Sendfile'] = os.path.abspath(ruta)
+        disposicion = 'attachment' if como_adjunto else 'inline'
+        respuesta.headers.set('Content-Disposition', disposicion, filename=nombre)
+    else:
+        # El contenido de una clave nunca cambia: el hash es un ETag fuerte
+        respuesta = send_file(os.path.abspath(ruta), as_attachment=como_adjunto, download_name=nombre,
+                              conditional=True, etag=sha256 or True,
+                              max_age=current_app.config.get('DESCARGAS_MAX_AGE', 3600))
+
+    # Archivos con control de acceso: no deben guardarse en cachés compartidas
+    respuesta.cache_control.public = False
+    respuesta.cache_control.private = True
+    return respuesta
+
+
+class _SalidaZip(io.RawIOBase):
+    """Destino no buscable para ZipFile: acumula lo escrito hasta que se vacía"""
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def zip_en_streaming(entradas):
+    """Generar un ZIP por trozos a partir de (nombre_en_zip, ruta) sin temporales.
+
+    Como el destino no es buscable, ZipFile escribe tamaños y CRC en un
+    descriptor después de cada archivo; en memoria solo hay un bloque a la vez.
+    Los archivos se guardan sin comprimir (PDF y DOCX ya lo están).
+    """
+    salida = _SalidaZip()
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for nombre, ruta in entradas:
+            info = zipfile.ZipInfo.from_file(ruta, nombre)
+            info.compress_type = zipfile.ZIP_STORED
+            with open(ruta, 'rb') as origen, zf.open(info, 'w', force_zip64=True) as destino:
+                while True:
+                    bloque = origen.read(TAMAÑO_BLOQUE)
+                    if not bloque:
+                        break
+                    destino.write(bloque)
+                    yield salida.vaciar()
+            yield salida.vaciar()
+    yield salida.vaciar()
+
+
+def _escribir_temporal(stream):
+    """Copiar el stream a un temporal calculando el SHA-256 en la misma pasada"""
+    directorio = os.path.join(_raiz(), 'tmp')
+    os.makedirs(directorio, exist_ok=True)
+    sha = hashlib.sha256()
+    tamaño = 0
+    fd, ruta_tmp = tempfile.mkstemp(dir=directorio)
+    try:
+        with os.fdopen(fd, 'wb') as destino:
+            while True:
+                bloque = stream.read(TAMAÑO_BLOQUE)
+                if not bloque:
+                    break
+                sha.update(bloque)
+                destino.write(bloque)
+                tamaño += len(bloque)
+    except Exception:
+        os.unlink(ruta_tmp)
+        raise
+    return ruta_tmp, sha.hexdigest(), tamaño
+
+
+def _registrar_referencia(sha256, tamaño):
+    """Sumar una referencia al contenido (creando el registro si es nuevo).
+
+    En una sola sentencia: dos primeras subidas simultáneas del mismo
+    contenido no chocan en la clave primaria.
+    """
+    tabla = ArchivoContenido.__table__
+    dialecto.upsert(db.session.connection(), tabla,
+                    [{'sha256': sha256, 'tamaño': tamaño, 'referencias': 1}], ['sha256'],
+                    {'referencias': tabla.c.referencias + 1})
+
+
+def guardar_stream(stream, nombre):
+    """Guardar un stream y devolver su clave de contenido.
+
+    Si el contenido ya existe no se vuelve a escribir: solo se incrementa su
+    contador de referencias. El commit queda a cargo de quien llama, junto
+    con el registro (Tarea, Calificacion) que guarda la clave.
+    """
+    ruta_tmp, sha256, tamaño = _escribir_temporal(stream)
+    return _incorporar(ruta_tmp, sha256, tamaño, nombre)
+
+
+def hash_archivo(ruta):
+    """(sha256, tamaño) de un archivo en disco, leído por bloques"""
+    sha = hashlib.sha256()
+    tamaño = 0
+    with open(ruta, 'rb') as origen:
+        while True:
+            bloque = origen.read(TAMAÑO_BLOQUE)
+            if not bloque:
+                break
+            sha.update(bloque)
+            tamaño += len(bloque)
+    return sha.hexdigest(), tamaño
+
+
+def guardar_ruta(ruta, nombre, huella=None):
+    """Incorporar un archivo que ya está en disco (p. ej. una carga por bloques).
+
+    Se lee una vez para calcular el hash (o se usa `huella`, el resultado de
+    hash_archivo si quien llama ya lo calculó) y luego se mueve con
+    `os.replace`, sin copiarlo. Debe estar en el mismo sistema de archivos
+    que UPLOAD_FOLDER.
+    """
+    sha256, tamaño = huella or hash_archivo(ruta)
+    return _incorporar(ruta, sha256, tamaño, nombre)
+
+
+def _incorporar(ruta_tmp, sha256, tamaño, nombre):
+    destino = ruta_contenido(sha256)
+    if os.path.exists(destino):
+        os.unlink(ruta_tmp)
+    else:
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        os.replace(ruta_tmp, destino)
+        # Si la transacción no llega al commit, el archivo no queda huérfano (ver _al_terminar)
+        g.setdefault('contenidos_nuevos', set()).add(sha256)
+
+    _registrar_referencia(sha256, tamaño)
+
+    nombre = secure_filename(nombre or '') or 'archivo'
+    return f"{sha256}/{nombre[-180:]}"
+
+
+def guardar_archivo(archivo):
+    """Guardar un FileStorage subido en un formulario"""
+    return guardar_stream(archivo.stream, archivo.filename)
+
+
+def liberar(clave):
+    """Quitar una referencia al contenido de una clave.
+
+    Se llama al borrar o reemplazar el registro que guarda la clave, en la
+    misma transacción. El archivo no se borra aquí (la transacción aún
+    puede revertirse); `purgar_sin_referencias` elimina después los que
+    quedaron en cero.
+    """
+    liberar_varias(db.session.connection(), [clave])
+
+
+def liberar_varias(conexion, claves):
+    """liberar() para muchas claves en `conexion`: un UPDATE por contenido distinto"""
+    cuentas = Counter(hash_de(clave) for clave in claves)
+    cuentas.pop(None, None)
+    if cuentas:
+        tabla = ArchivoContenido.__table__
+        conexion.execute(
+            update(tabla).where(tabla.c.sha256 == bindparam('contenido'))
+            .values(referencias=tabla.c.referencias - bindparam('cantidad')),
+            [{'contenido': sha256, 'cantidad': cantidad} for sha256, cantidad in cuentas.items()]
+        )
+
+
+def _es_db_session(session):
+    """Solo cuenta la sesión de db.session del contexto actual (no las de archivo_historico, etc.)"""
+    return has_app_context() and db.session.registry.has() and db.session.registry() is session
+
+
+def _al_confirmar(session):
+    """after_commit: los contenidos nuevos ya tienen su registro"""
+    if _es_db_session(session):
+        g.pop('contenidos_nuevos', None)
+
+
+def _al_terminar(session, transaccion):
+    """after_transaction_end: borrar los archivos nuevos de una transacción revertida.
+
+    _incorporar mueve el archivo antes del commit de quien llama; si la
+    transacción se revierte (o la sesión se cierra sin commit) el registro
+    de ArchivoContenido no existe y nadie más borraría el archivo. Se
+    conservan los que otra transacción registró mientras tanto.
+    """
+    if transaccion.parent is not None or not _es_db_session(session):
+        return
+    nuevos = g.pop('contenidos_nuevos', None)
+    if not nuevos:
+        return
+    with db.engine.connect() as conexion:
+        registrados = set(conexion.execute(
+            select(ArchivoContenido.sha256).where(ArchivoContenido.sha256.in_(nuevos))).scalars())
+    for sha256 in nuevos - registrados:
+        try:
+            os.unlink(ruta_contenido(sha256))
+        except FileNotFoundError:
+            pass
+
+
+def purgar_sin_referencias():
+    """Eliminar del disco y de la base de datos los contenidos sin referencias"""
+    huerfanos = [c.sha256 for c in ArchivoContenido.query.filter(ArchivoContenido.referencias <= 0).all()]
+    for sha256 in huerfanos:
+        try:
+            os.unlink(ruta_contenido(sha256))
+        except FileNotFoundError:
+            pass
+    if huerfanos:
+        ArchivoContenido.query.filter(ArchivoContenido.sha256.in_(huerfanos),
+                                      ArchivoContenido.referencias <= 0).delete(synchronize_session=False)
+        db.session.commit()
+    return len(huerfanos)
+
+
+def init_app(app):
+    """Registrar los eventos que limpian los archivos de transacciones revertidas"""
+    if not event.contains(Session, 'after_commit', _al_confirmar):
+        event.listen(Session, 'after_commit', _al_confirmar)
+        event.listen(Session, 'after_transaction_end', _al_terminar)
+
+
+def migrar_archivos_antiguos():
+    """Mover los archivos de 'uploads/tareas' y 'uploads/entregas' al almacenamiento por contenido"""
+    from models import Tarea, Calificacion
+
+    migrados = 0
+    registros = [(t, 'archivo_adjunto') for t in Tarea.query.filter(Tarea.archivo_adjunto.isnot(None)).all()]
+    registros += [(c, 'archivo_entrega') for c in Calificacion.query.filter(Calificacion.archivo_entrega.isnot(None)).all()]
+
+    for registro, campo in registros:
+        ruta = getattr(registro, campo)
+        if es_clave_contenido(ruta):
+            continue
+        ruta_antigua = ruta_archivo(ruta)
+        if not os.path.exists(ruta_antigua):
+            continue
+        with open(ruta_antigua, 'rb') as origen:
+            setattr(registro, campo, guardar_stream(origen, os.path.basename(ruta_antigua)))
+        db.session.commit()
+        os.unlink(ruta_antigua)
+        migrados += 1
+    return migrados
+
+
+if __name__ == '__main__':
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        print("📦 Migrando archivos al almacenamiento por contenido...")
+        print(f"   ✅ {migrar_archivos_antiguos()} archivos migrados")
+        print(f"   🧹 {purgar_sin_referencias()} contenidos sin referencias eliminados")
@@ -3,12 +3,31 @@ from config import Config
 from extensions import db, login_manager, csrf
 import os
 
-def create_app():
+# (módulo de routes/, blueprint, prefijo de URL)
+BLUEPRINTS = [
+    ('main_routes', 'main_bp', None),
+    ('admin_routes', 'admin_bp', '/admin'),
+    ('profesor_routes', 'profesor_bp', '/profesor'),
+    ('estudiante_routes', 'estudiante_bp', '/estudiante'),
+    ('horario_routes', 'horario_bp', '/horario'),
+    ('archivos_routes', 'archivos_bp', '/archivos'),
+    ('trabajos_routes', 'trabajos_bp', '/trabajos'),
+]
+
+def create_app(config=None):
     app = Flask(__name__)
     app.config.from_object(Config)
+    if config:
+        # Valores adicionales (scripts de datos, benchmarks)
+        app.config.update(config)
+    
+    # Bind de solo lectura para reportes (ver lectura.py); debe existir antes de crear los motores
+    import lectura
+    lectura.configurar(app)
     
     # Inicializar extensiones con app
     db.init_app(app)
+    lectura.init_app(app)
     login_manager.init_app(app)
     csrf.init_app(app)
     login_manager.login_view = 'main.login'
@@ -21,10 +40,33 @@ def create_app():
     # Importar modelos
     from models import Usuario, Curso, Asignatura, Tarea, Calificacion, Horario, NotificacionReemplazo
     
-    # Función de carga de usuario para Flask-Login
-    @login_manager.user_loader
-    def load_user(user_id):
-        return db.session.get(Usuario, int(user_id))
+    # Carga de usuario para Flask-Login (instantáneas en caché, ver autenticacion.py)
+    import autenticacion
+    autenticacion.init_app(app, login_manager)
+    
+    # Caché de fragmentos de plantillas ({% cache %}) invalidada por escrituras
+    import fragmentos
+    fragmentos.init_app(app)
+    
+    # Archivos subidos: limpieza de los que quedan de transacciones revertidas
+    import almacenamiento
+    almacenamiento.init_app(app)
+    
+    # Bandeja de tareas por estudiante, mantenida en cada flush
+    import bandeja
+    bandeja.init_app(app)
+    
+    # Recordatorios de entrega (hilo en memoria, arranca con la primera petición)
+    import recordatorios
+    recordatorios.init_app(app)
+    
+    # Cola de trabajos en segundo plano (pool de hilos, arranca con la primera petición)
+    import trabajos
+    trabajos.init_app(app)
+    
+    # Estáticos con huella y precomprimidos (/assets/, ver activos.py)
+    import activos
+    activos.init_app(app)
     
     # Hacer csrf_token disponible en todos los templates
     @app.context_processor
@@ -59,18 +101,13 @@ def create_app():
         import os
         return os.path.basename(path)
     
-    # Registrar blueprints
-    from routes.main_routes import main_bp
-    from routes.admin_routes import admin_bp
-    from routes.profesor_routes import profesor_bp
-    from routes.estudiante_routes import estudiante_bp
-    from routes.horario_routes import horario_bp
-    
-    app.register_blueprint(main_bp)
-    app.register_blueprint(admin_bp, url_prefix='/admin')
-    app.register_blueprint(profesor_bp, url_prefix='/profesor')
-    app.register_blueprint(estudiante_bp, url_prefix='/estudiante')
-    app.register_blueprint(horario_bp, url_prefix='/horario')
+    # Caché de bytecode de plantillas en disco (ver arranque.py); después de registrar
+    # las extensiones de Jinja, que forman parte de su huella
+    import arranque
+    arranque.init_app(app)
+    
+    # Registrar blueprints (con ARRANQUE_PEREZOSO, cada módulo se importa con su primera petición)
+    arranque.registrar_blueprints(app, BLUEPRINTS)
     
     return app
 
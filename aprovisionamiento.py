@@ -0,0 +1,159 @@
+# aprovisionamiento.py - Creación masiva de usuarios (scripts de datos e importación)
+import csv
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from werkzeug.security import generate_password_hash
+from extensions import db
+from models import Usuario, usuario_curso
+from fragmentos import tocar_al_confirmar
+import bandeja
+
+# Contraseñas de los datos de ejemplo y sintéticos según el rol (las mismas que usa
+# admin.nuevo_usuario); crear_usuarios_masivo no las asigna por su cuenta
+CONTRASEÑAS_POR_ROL = {
+    'estudiante': 'estudiante123',
+    'profesor': 'profesor123',
+    'admin': 'admin123'
+}
+
+# Columnas de Usuario aceptadas en los datos de entrada
+CAMPOS_USUARIO = (
+    'nombres', 'apellidos', 'email', 'tipo_documento', 'numero_documento',
+    'telefono', 'direccion', 'fecha_nacimiento', 'role', 'materia_especialidad', 'activo'
+)
+
+
+def _hashear_lote(contraseñas):
+    """Derivar los hashes de un lote de contraseñas (se ejecuta en un proceso hijo)"""
+    return [generate_password_hash(p) for p in contraseñas]
+
+
+def hashear_contraseñas(contraseñas, procesos=None, tamaño_lote=32):
+    """Generar los hashes de una lista de contraseñas usando todos los núcleos.
+
+    La derivación de claves es intensiva en CPU, así que se reparte en lotes
+    entre procesos. Con pocas contraseñas no compensa arrancar el pool.
+    Los procesos se crean con spawn y no con fork: quien llama puede ser un
+    worker con hilos (la importación CSV), y un fork copiaría los locks que
+    otros hilos tuvieran tomados.
+    """
+    contraseñas = list(contraseñas)
+    if not contraseñas:
+        return []
+
+    procesos = procesos or os.cpu_count() or 1
+    if procesos == 1 or len(contraseñas) <= tamaño_lote:
+        return _hashear_lote(contraseñas)
+
+    lotes = [contraseñas[i:i + tamaño_lote] for i in range(0, len(contraseñas), tamaño_lote)]
+    hashes = []
+    with ProcessPoolExecutor(max_workers=min(procesos, len(lotes)),
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        for resultado in executor.map(_hashear_lote, lotes):
+            hashes.extend(resultado)
+    return hashes
+
+
+class ResultadoAprovisionamiento:
+    """Resumen de una creación masiva de usuarios"""
+
+    def __init__(self, total, segundos_hash, segundos_insercion):
+        self.total = total
+        self.segundos_hash = segundos_hash
+        self.segundos_insercion = segundos_insercion
+
+    @property
+    def segundos_total(self):
+        return self.segundos_hash + self.segundos_insercion
+
+    @property
+    def usuarios_por_segundo(self):
+        return self.total / self.segundos_total if self.segundos_total else 0.0
+
+    def __str__(self):
+        return (f"{self.total} usuarios en {self.segundos_total:.2f}s "
+                f"(hash {self.segundos_hash:.2f}s, inserción {self.segundos_insercion:.2f}s, "
+                f"{self.usuarios_por_segundo:.0f} usuarios/s)")
+
+
+def crear_usuarios_masivo(usuarios, procesos=None, tamaño_bloque=1000, commit=True):
+    """Crear usuarios en bloque.
+
+    `usuarios` es una lista de diccionarios con las columnas de Usuario,
+    `password` o `password_hash` ya calculado (no hay contraseña por
+    defecto: falta una y se lanza ValueError) y opcionalmente `curso_id`
+    (curso al que se matricula el estudiante).
+    Las contraseñas se hashean en paralelo y las filas se insertan con
+    `bulk_insert_mappings` por bloques.
+    """
+    usuarios = list(usuarios)
+    sin_contraseña = [u.get('email') for u in usuarios if not (u.get('password') or u.get('password_hash'))]
+    if sin_contraseña:
+        raise ValueError(f"{len(sin_contraseña)} usuarios sin contraseña (p. ej. {sin_contraseña[0]})")
+    inicio = time.perf_counter()
+    # Los usuarios que ya traen `password_hash` (p. ej. datos sintéticos) no se vuelven a hashear
+    pendientes = [i for i, u in enumerate(usuarios) if not u.get('password_hash')]
+    hashes = [u.get('password_hash') for u in usuarios]
+    nuevos = hashear_contraseñas([usuarios[i]['password'] for i in pendientes], procesos=procesos)
+    for i, password_hash in zip(pendientes, nuevos):
+        hashes[i] = password_hash
+    segundos_hash = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    ahora = datetime.utcnow()
+    for i in range(0, len(usuarios), tamaño_bloque):
+        bloque = usuarios[i:i + tamaño_bloque]
+        filas = []
+        for datos, password_hash in zip(bloque, hashes[i:i + tamaño_bloque]):
+            fila = {campo: datos[campo] for campo in CAMPOS_USUARIO if campo in datos}
+            fila.setdefault('activo', True)
+            fila['fecha_creacion'] = datos.get('fecha_creacion', ahora)
+            fila['password_hash'] = password_hash
+            filas.append(fila)
+        db.session.bulk_insert_mappings(Usuario, filas)
+
+        # Matricular en cursos usando el documento (único) para recuperar los ids
+        matriculas = {u['numero_documento']: u['curso_id'] for u in bloque if u.get('curso_id')}
+        if matriculas:
+            ids = db.session.query(Usuario.numero_documento, Usuario.id).filter(
+                Usuario.numero_documento.in_(list(matriculas))
+            ).all()
+            db.session.execute(usuario_curso.insert(), [
+                {'usuario_id': usuario_id, 'curso_id': matriculas[documento]}
+                for documento, usuario_id in ids
+            ])
+            bandeja.sincronizar_estudiantes(db.session.connection(), [usuario_id for _, usuario_id in ids])
+
+    # La inserción masiva no pasa por el flush: versionar a mano para la caché de fragmentos
+    tocar_al_confirmar(db.session, {'Usuario'})
+    if commit:
+        db.session.commit()
+    segundos_insercion = time.perf_counter() - inicio
+
+    return ResultadoAprovisionamiento(len(usuarios), segundos_hash, segundos_insercion)
+
+
+def leer_usuarios_csv(contenido):
+    """Convertir un CSV (cabeceras = columnas de Usuario) en diccionarios para crear_usuarios_masivo"""
+    if isinstance(contenido, bytes):
+        contenido = contenido.decode('utf-8-sig')
+    usuarios = []
+    for fila in csv.DictReader(io.StringIO(contenido)):
+        datos = {k.strip(): (v or '').strip() for k, v in fila.items() if k}
+        usuario = {campo: datos[campo] for campo in CAMPOS_USUARIO if datos.get(campo)}
+        if 'activo' in usuario:
+            usuario['activo'] = usuario['activo'].lower() in ('1', 'true', 'si', 'sí')
+        if usuario.get('fecha_nacimiento'):
+            usuario['fecha_nacimiento'] = datetime.strptime(usuario['fecha_nacimiento'], '%Y-%m-%d').date()
+        if datos.get('email'):
+            usuario['email'] = datos['email'].lower()
+        if datos.get('curso_id'):
+            usuario['curso_id'] = int(datos['curso_id'])
+        if datos.get('password'):
+            usuario['password'] = datos['password']
+        usuarios.append(usuario)
+    return usuarios
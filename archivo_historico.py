@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Archivo histórico: los años académicos cerrados se mueven a un archivo
+SQLite por año y se adjuntan (ATTACH) solo cuando se consultan.
+
+Tareas, calificaciones, horarios, asistencias y notificaciones de
+reemplazo de un año cerrado salen de la base de datos en uso, que queda
+pequeña. Los archivos adjuntos y entregados de esas filas no se
+archivan: pierden su referencia y `almacenamiento.purgar_sin_referencias`
+los borra. El archivo del año guarda además una copia de los cursos,
+asignaturas, matrículas y usuarios de ese año (sin contraseñas), así que los mismos modelos y sus
+relaciones funcionan contra él sin cambios:
+
+    with sesion_año(2023) as sesion:
+        sesion.query(Calificacion).filter_by(estudiante_id=7)  # Lee archivo_2023
+
+Para consultas de varios años, union_años() arma un UNION ALL que solo
+incluye (y adjunta) los archivos de los años pedidos.
+
+    python archivo_historico.py 2023              # Archivar 2023
+    python archivo_historico.py 2023 --compactar  # ... y reducir el archivo en uso (VACUUM)
+    python archivo_historico.py --listar
+"""
+
+import argparse
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import MetaData, delete, func, insert, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import (Usuario, Curso, Asignatura, Tarea, Calificacion, Horario, NotificacionReemplazo,
+                    BandejaTarea, RecordatorioEnviado, SesionCarga, BloqueCarga, AñoArchivado, ListaCurso,
+                    Asistencia, usuario_curso)
+import almacenamiento
+import dialecto
+import fragmentos
+
+# Filas que se mueven al archivo (se borran de la base en uso)
+_MOVIDAS = [Tarea.__table__, Calificacion.__table__, Horario.__table__, NotificacionReemplazo.__table__,
+            ListaCurso.__table__, Asistencia.__table__]
+# Filas que se copian para que las relaciones funcionen dentro del archivo
+_COPIADAS = [Usuario.__table__, Curso.__table__, Asignatura.__table__, usuario_curso]
+
+# Copias de las tablas en el esquema de cada archivo (ver tablas())
+_metadatos = {}
+
+
+def esquema(año):
+    """Nombre con el que se adjunta el archivo del año"""
+    return f'archivo_{int(año)}'
+
+
+def ruta_año(año):
+    carpeta = current_app.config.get('ARCHIVO_CARPETA') or os.path.join(current_app.instance_path, 'archivo')
+    return os.path.join(carpeta, f'colegio_{int(año)}.db')
+
+
+def años_archivados():
+    return set(db.session.execute(select(AñoArchivado.año)).scalars())
+
+
+def tablas(año=None):
+    """{nombre: Table} del año: las de la base en uso (año None o vivo) o las del archivo"""
+    if año is None:
+        return {t.name: t for t in [*_MOVIDAS, *_COPIADAS]}
+    nombre = esquema(año)
+    if nombre not in _metadatos:
+        metadatos = MetaData()
+        for tabla in [*_COPIADAS, *_MOVIDAS]:
+            tabla.to_metadata(metadatos, schema=nombre)
+        _metadatos[nombre] = metadatos
+    return {t.name: t for t in _metadatos[nombre].tables.values()}
+
+
+def adjuntar(conexion, año):
+    """ATTACH del archivo del año (fuera de una transacción de escritura)"""
+    conexion.exec_driver_sql(f'ATTACH DATABASE ? AS {esquema(año)}', (ruta_año(año),))
+
+
+def separar(conexion, año):
+    conexion.exec_driver_sql(f'DETACH DATABASE {esquema(año)}')
+
+
+@contextmanager
+def adjuntos(años, motor=None):
+    """Conexión (de `motor`, por defecto el principal) con los archivos de `años` adjuntos.
+
+    Se separan al salir. SQLite admite pocas bases adjuntas por conexión
+    (10 por defecto), así que conviene pedir solo los años que se van a leer.
+    """
+    archivados = sorted(set(años) & años_archivados())
+    with (motor or db.engine).connect() as conexion:
+        for año in archivados:
+            adjuntar(conexion, año)
+        conexion.commit()
+        try:
+            yield conexion
+        finally:
+            conexion.rollback()
+            for año in archivados:
+                separar(conexion, año)
+            conexion.commit()
+
+
+@contextmanager
+def sesion_año(año):
+    """Sesión para consultar un año: la de siempre si está vivo, o una sobre su archivo.
+
+    Con un año archivado todas las consultas de la sesión (también las
+    cargas perezosas de relaciones) se traducen al esquema del archivo.
+    Los objetos solo se pueden usar dentro del bloque.
+    """
+    if año is None or año not in años_archivados():
+        yield db.session
+        return
+    with adjuntos([año]) as conexion:
+        traducida = conexion.execution_options(schema_translate_map={None: esquema(año)})
+        with Session(bind=traducida, autoflush=False) as sesion:
+            yield sesion
+
+
+def union_años(consulta, años):
+    """UNION ALL de `consulta(tablas, año)` para cada año.
+
+    `consulta` arma el SELECT de un año con las tablas que recibe (ver
+    tablas()) y debe filtrar por ese año; los años vivos usan las tablas
+    de la base en uso y los archivados las de su archivo, que hay que
+    adjuntar con adjuntos(años) antes de ejecutar.
+    """
+    archivados = años_archivados()
+    partes = [consulta(tablas(año if año in archivados else None), año) for año in sorted(años)]
+    return partes[0] if len(partes) == 1 else union_all(*partes)
+
+
+def _filas_del_año(año):
+    """SELECT de ids de cada tabla que pertenece al año"""
+    cursos = select(Curso.id).where(Curso.año_academico == año)
+    asignaturas = select(Asignatura.id).where(Asignatura.curso_id.in_(cursos))
+    tareas = select(Tarea.id).where(Tarea.asignatura_id.in_(asignaturas))
+    horarios = select(Horario.id).where(Horario.curso_id.in_(cursos))
+    usuarios = union_all(
+        select(usuario_curso.c.usuario_id).where(usuario_curso.c.curso_id.in_(cursos)),
+        select(Asignatura.profesor_id).where(Asignatura.id.in_(asignaturas)),
+        select(Tarea.profesor_id).where(Tarea.id.in_(tareas)),
+        select(Horario.profesor_id).where(Horario.id.in_(horarios)),
+        select(NotificacionReemplazo.profesor_ausente_id).where(NotificacionReemplazo.horario_id.in_(horarios)),
+        select(NotificacionReemplazo.profesor_reemplazo_id).where(NotificacionReemplazo.horario_id.in_(horarios)),
+        select(Asistencia.profesor_id).where(Asistencia.horario_id.in_(horarios)),
+    )
+    return {
+        'usuario': Usuario.id.in_(usuarios),
+        'curso': Curso.id.in_(cursos),
+        'asignatura': Asignatura.id.in_(asignaturas),
+        'usuario_curso': usuario_curso.c.curso_id.in_(cursos),
+        'tarea': Tarea.id.in_(tareas),
+        'calificacion': Calificacion.tarea_id.in_(tareas),
+        'horario': Horario.id.in_(horarios),
+        'notificacion_reemplazo': NotificacionReemplazo.horario_id.in_(horarios),
+        'lista_curso': ListaCurso.curso_id.in_(cursos),
+        'asistencia': Asistencia.horario_id.in_(horarios),
+    }, tareas
+
+
+def _copiar(conexion, tabla, destino, condicion):
+    columnas = [c.name for c in tabla.columns]
+    seleccion = select(*[
+        # Las contraseñas no salen de la base en uso
+        literal('').label(c.name) if tabla is Usuario.__table__ and c.name == 'password_hash' else c
+        for c in tabla.columns
+    ]).where(condicion)
+    # Las copias se refrescan si se vuelve a archivar; las filas movidas no se repiten
+    prefijo = 'OR REPLACE' if tabla in _COPIADAS else 'OR IGNORE'
+    return conexion.execute(insert(destino).prefix_with(prefijo).from_select(columnas, seleccion)).rowcount
+
+
+def archivar(año, compactar=False):
+    """Mover el año cerrado `año` a su archivo; devuelve las filas movidas por tabla"""
+    if db.engine.url.get_backend_name() != 'sqlite':
+        raise ValueError('El archivo histórico necesita SQLite como base de datos en uso')
+    activos = db.session.execute(select(func.count()).select_from(Curso).where(
+        Curso.año_academico == año, Curso.activo == True)).scalar()
+    if activos:
+        raise ValueError(f'El año {año} tiene {activos} cursos activos: haz antes el cambio de año')
+
+    inicio = time.perf_counter()
+    os.makedirs(os.path.dirname(ruta_año(año)), exist_ok=True)
+    condiciones, tareas = _filas_del_año(año)
+    destino = tablas(año)
+    conteos = {}
+
+    with db.engine.connect() as conexion:
+        adjuntar(conexion, año)
+        conexion.commit()
+        try:
+            _metadatos[esquema(año)].create_all(conexion)
+            conexion.commit()
+            with conexion.begin():
+                for tabla in [*_COPIADAS, *_MOVIDAS]:
+                    conteos[tabla.name] = _copiar(conexion, tabla, destino[tabla.name], condiciones[tabla.name])
+                # Los archivos adjuntos y entregados no van al archivo: las filas movidas sueltan su referencia
+                claves = [*conexion.execute(select(Tarea.archivo_adjunto).where(
+                              condiciones['tarea'], Tarea.archivo_adjunto.isnot(None))).scalars(),
+                          *conexion.execute(select(Calificacion.archivo_entrega).where(
+                              condiciones['calificacion'], Calificacion.archivo_entrega.isnot(None))).scalars()]
+                almacenamiento.liberar_varias(conexion, claves)
+                # Borrar de la base en uso, de lo más dependiente a lo menos
+                sesiones = select(SesionCarga.id).where(SesionCarga.tarea_id.in_(tareas))
+                conexion.execute(delete(BloqueCarga.__table__).where(BloqueCarga.sesion_id.in_(sesiones)))
+                for modelo in (SesionCarga, RecordatorioEnviado, BandejaTarea):
+                    conexion.execute(delete(modelo.__table__).where(modelo.__table__.c.tarea_id.in_(tareas)))
+                for tabla in (NotificacionReemplazo.__table__, Asistencia.__table__, ListaCurso.__table__,
+                              Calificacion.__table__, Tarea.__table__, Horario.__table__):
+                    conexion.execute(delete(tabla).where(condiciones[tabla.name]))
+                previas = conexion.execute(select(AñoArchivado.filas).where(AñoArchivado.año == año)).scalar() or 0
+                fila = {'año': año, 'ruta': ruta_año(año), 'fecha_archivo': datetime.utcnow(),
+                        'filas': previas + sum(conteos[t.name] for t in _MOVIDAS)}
+                dialecto.upsert(conexion, AñoArchivado.__table__, [fila], ['año'],
+                                {c: fila[c] for c in ('ruta', 'filas', 'fecha_archivo')})
+            fragmentos.tocar({'Tarea', 'Calificacion', 'Horario', 'NotificacionReemplazo',
+                              'Asistencia', 'ListaCurso', 'AñoArchivado'})
+        finally:
+            separar(conexion, año)
+            conexion.commit()
+        if compactar:
+            conexion.exec_driver_sql('VACUUM')
+
+    conteos['segundos'] = round(time.perf_counter() - inicio, 2)
+    return conteos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('año', type=int, nargs='?', help='Año académico cerrado que se archiva')
+    parser.add_argument('--compactar', action='store_true', help='Ejecutar VACUUM después de archivar')
+    parser.add_argument('--listar', action='store_true', help='Mostrar los años ya archivados')
+    args = parser.parse_args()
+    if not args.listar and args.año is None:
+        parser.error('Indica el año a archivar o --listar')
+
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        if args.listar:
+            for registro in AñoArchivado.query.order_by(AñoArchivado.año):
+                print(f"📦 {registro.año}: {registro.filas:,} filas en {registro.ruta}")
+            return 0
+        try:
+            conteos = archivar(args.año, compactar=args.compactar)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 1
+    print(f"📦 Año {args.año} archivado en {conteos.pop('segundos')}s")
+    for tabla, filas in conteos.items():
+        print(f"   ✅ {filas:>10,} {tabla}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Arranque rápido de los workers.
+
+Cada worker nuevo (también cuando gunicorn recicla uno) importa todos los
+módulos de rutas y compila cada plantilla Jinja la primera vez que la
+usa, y las primeras peticiones pagan esa espera. Este módulo la reduce:
+
+- Caché de bytecode de Jinja en disco (PLANTILLAS_BYTECODE): una plantilla
+  compilada por un worker ya no se compila en los demás ni en los que
+  vengan después. Jinja comprueba la suma del código fuente, así que una
+  plantilla editada se vuelve a compilar sola; el nombre de los archivos
+  lleva además una huella de las extensiones (p. ej. {% cache %}), cuyo
+  código también queda dentro del bytecode.
+- Rutas perezosas (ARRANQUE_PEREZOSO): las reglas de URL se registran
+  desde un manifiesto y cada módulo de routes/ se importa con la primera
+  petición que atiende. url_for funciona desde el principio. Un módulo
+  que cambió después de generar el manifiesto, o cuyo blueprint tiene
+  hooks que corren antes de la vista (before_request, url_defaults...),
+  se importa al arrancar, como siempre. Las funciones que Werkzeug
+  compila para url_for en cada regla también esperan a su primer uso.
+
+En el despliegue, después de `python activos.py`:
+
+    python arranque.py     # Manifiesto de rutas y todas las plantillas compiladas
+
+Para medir el efecto: python benchmarks/bench_arranque.py
+"""
+
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.routing import Rule
+
+MANIFIESTO = 'rutas.json'
+
+
+def carpeta(app):
+    return app.config.get('ARRANQUE_CARPETA') or os.path.join(app.instance_path, 'arranque')
+
+
+def _huella_archivos(rutas):
+    huella = hashlib.sha1()
+    for ruta in rutas:
+        with open(ruta, 'rb') as archivo:
+            huella.update(archivo.read())
+    return huella.hexdigest()[:12]
+
+
+def _ruta_modulo(nombre):
+    """Archivo de un módulo de routes/ sin importarlo"""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'routes', f'{nombre}.py')
+
+
+# Caché de bytecode de plantillas
+
+def configurar_plantillas(app):
+    """Guardar en disco el bytecode de las plantillas compiladas"""
+    if not app.config.get('PLANTILLAS_BYTECODE', True):
+        return None
+    directorio = os.path.join(carpeta(app), 'jinja')
+    os.makedirs(directorio, exist_ok=True)
+    # El código de las extensiones también queda compilado en cada plantilla
+    extensiones = sorted({inspect.getsourcefile(type(e)) for e in app.jinja_env.extensions.values()})
+    huella = _huella_archivos(e for e in extensiones if e and os.path.isfile(e))
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directorio, f'__jinja2_{huella}_%s.cache')
+    return app.jinja_env.bytecode_cache
+
+
+def precompilar_plantillas(app):
+    """Compilar todas las plantillas al caché de bytecode; devuelve cuántas"""
+    cache = app.jinja_env.bytecode_cache
+    if cache is None:
+        raise ValueError('PLANTILLAS_BYTECODE está desactivado')
+    cache.clear()  # Quitar también las de huellas anteriores
+    nombres = app.jinja_env.list_templates(extensions=['html'])
+    for nombre in nombres:
+        app.jinja_env.get_template(nombre)
+    return len(nombres)
+
+
+# Rutas perezosas
+
+class _NoSoloRutas(Exception):
+    pass
+
+
+class _Recolector:
+    """Hace de aplicación al aplicar las funciones diferidas de un Blueprint: anota las reglas"""
+
+    def __init__(self):
+        self.reglas = []
+
+    def add_url_rule(self, rule, endpoint=None, view_func=None, **opciones):
+        self.reglas.append((rule, endpoint, view_func, opciones))
+
+    def __getattr__(self, nombre):
+        # Filtros, hooks de aplicación (app_*), etc.: necesitan la aplicación de verdad
+        raise _NoSoloRutas(nombre)
+
+
+def reglas_de(blueprint, prefijo):
+    """[(regla, endpoint completo, vista, opciones)] que registraría el blueprint con ese prefijo"""
+    recolector = _Recolector()
+    estado = blueprint.make_setup_state(recolector, {'url_prefix': prefijo}, True)
+    for diferida in blueprint.deferred_functions:
+        diferida(estado)
+    return recolector.reglas
+
+
+# Corren antes de la vista (o al construir URLs): con el módulo sin importar se saltarían
+_HOOKS_PREVIOS = ('before_request_funcs', 'url_value_preprocessors', 'url_default_functions')
+
+
+def puede_ser_perezoso(blueprint):
+    """Si el blueprint solo aporta rutas y lo que se consulta después de elegir la vista"""
+    if blueprint._blueprints:
+        return False
+    if any(funciones for atributo in _HOOKS_PREVIOS for funciones in getattr(blueprint, atributo).values()):
+        return False
+    try:
+        reglas_de(blueprint, None)
+    except _NoSoloRutas:
+        return False
+    return True
+
+
+class ReglaPerezosa(Rule):
+    """Regla que compila sus funciones de url_for con el primer uso.
+
+    Werkzeug genera y compila dos funciones de Python por regla al
+    registrarla; con todas las rutas de la aplicación es buena parte de
+    create_app, y la mayoría de las reglas no se usan en url_for.
+    """
+
+    def _compile_builder(self, append_unknown=True):
+        compilar = super()._compile_builder
+        funcion = None
+
+        def construir(regla, **valores):
+            nonlocal funcion
+            if funcion is None:
+                funcion = compilar(append_unknown)
+            return funcion(regla, **valores)
+        return construir
+
+
+class RutasPerezosas:
+    """Blueprints que se importan al atender su primera petición"""
+
+    def __init__(self, app):
+        self.app = app
+        self.pendientes = {}  # módulo -> (atributo del blueprint, prefijo)
+        self._lock = threading.Lock()
+
+    def agregar(self, modulo, atributo, prefijo, reglas):
+        self.pendientes[modulo] = (atributo, prefijo)
+        vistas = {}  # Un endpoint puede tener varias reglas, con la misma vista
+        for regla in reglas:
+            opciones = dict(regla['opciones'])
+            if 'methods' in opciones:
+                opciones['methods'] = set(opciones['methods'])
+            endpoint = regla['endpoint']
+            if endpoint not in vistas:
+                vistas[endpoint] = _VistaPerezosa(self, modulo, endpoint)
+            self.app.add_url_rule(regla['regla'], endpoint, vistas[endpoint], **opciones)
+
+    def importar(self, modulo):
+        """Importar el módulo y poner sus vistas, manejadores y hooks en la aplicación"""
+        with self._lock:
+            if modulo not in self.pendientes:
+                return
+            atributo, prefijo = self.pendientes[modulo]
+            blueprint = getattr(importlib.import_module(f'routes.{modulo}'), atributo)
+            self.app.blueprints[blueprint.name] = blueprint
+            # Lo mismo que hace register_blueprint con los manejadores de errores y los hooks
+            blueprint._merge_blueprint_funcs(self.app, blueprint.name)
+            for _, endpoint, vista, _ in reglas_de(blueprint, prefijo):
+                self.app.view_functions[endpoint] = vista
+            del self.pendientes[modulo]
+
+    def importar_todo(self):
+        for modulo in list(self.pendientes):
+            self.importar(modulo)
+
+
+class _VistaPerezosa:
+    """Vista provisional: importa su módulo y cede el lugar a la vista real"""
+
+    def __init__(self, rutas, modulo, endpoint):
+        self.rutas = rutas
+        self.modulo = modulo
+        self.endpoint = endpoint
+        self.__name__ = endpoint
+
+    def __call__(self, **argumentos):
+        self.rutas.importar(self.modulo)
+        return self.rutas.app.view_functions[self.endpoint](**argumentos)
+
+
+def _cargar_manifiesto(app):
+    try:
+        with open(os.path.join(carpeta(app), MANIFIESTO), encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return {}
+
+
+def registrar_blueprints(app, blueprints):
+    """Registrar los blueprints [(módulo de routes/, atributo, prefijo)].
+
+    Con ARRANQUE_PEREZOSO, los módulos cuyo manifiesto está al día quedan
+    como rutas perezosas; los demás se importan y registran ahora.
+    """
+    manifiesto = {}
+    if app.config.get('ARRANQUE_PEREZOSO'):
+        app.url_rule_class = ReglaPerezosa
+        manifiesto = _cargar_manifiesto(app)
+    perezosas = None
+    for modulo, atributo, prefijo in blueprints:
+        entrada = manifiesto.get(modulo)
+        if (entrada and entrada['perezoso'] and entrada['prefijo'] == prefijo
+                and entrada['huella'] == _huella_archivos([_ruta_modulo(modulo)])):
+            if perezosas is None:
+                perezosas = app.extensions['arranque'] = RutasPerezosas(app)
+            perezosas.agregar(modulo, atributo, prefijo, entrada['reglas'])
+        else:
+            blueprint = getattr(importlib.import_module(f'routes.{modulo}'), atributo)
+            app.register_blueprint(blueprint, url_prefix=prefijo)
+
+
+def generar_manifiesto(app, blueprints):
+    """Escribir el manifiesto de rutas de los blueprints; devuelve {módulo: reglas}"""
+    manifiesto = {}
+    for modulo, atributo, prefijo in blueprints:
+        blueprint = getattr(importlib.import_module(f'routes.{modulo}'), atributo)
+        perezoso = puede_ser_perezoso(blueprint)
+        reglas = []
+        for regla, endpoint, _, opciones in reglas_de(blueprint, prefijo) if perezoso else ():
+            opciones = dict(opciones)
+            if opciones.get('methods') is not None:
+                opciones['methods'] = sorted(opciones['methods'])
+            reglas.append({'regla': regla, 'endpoint': endpoint, 'opciones': opciones})
+        manifiesto[modulo] = {'prefijo': prefijo, 'huella': _huella_archivos([_ruta_modulo(modulo)]),
+                              'perezoso': perezoso, 'reglas': reglas}
+    os.makedirs(carpeta(app), exist_ok=True)
+    ruta = os.path.join(carpeta(app), MANIFIESTO)
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(manifiesto, archivo, ensure_ascii=False, indent=1)
+    os.replace(temporal, ruta)
+    return manifiesto
+
+
+def init_app(app):
+    """Caché de bytecode de plantillas (las rutas se registran con registrar_blueprints)"""
+    configurar_plantillas(app)
+
+
+def main():
+    from app import create_app, BLUEPRINTS
+    # Sin rutas perezosas: el manifiesto sale de los módulos importados
+    app = create_app({'ARRANQUE_PEREZOSO': False})
+    inicio = time.perf_counter()
+    manifiesto = generar_manifiesto(app, BLUEPRINTS)
+    print(f"🗺️  Manifiesto de rutas en {os.path.join(carpeta(app), MANIFIESTO)}")
+    for modulo, entrada in manifiesto.items():
+        if entrada['perezoso']:
+            print(f"   ✅ {modulo}: {len(entrada['reglas'])} rutas")
+        else:
+            print(f"   ⚠️  {modulo}: con hooks previos a la vista, se importa al arrancar")
+    try:
+        total = precompilar_plantillas(app)
+    except ValueError as e:
+        print(f"⚠️  {e}: no se precompilan las plantillas")
+    else:
+        print(f"📄 {total} plantillas compiladas en {os.path.join(carpeta(app), 'jinja')}")
+    print(f"⏱️  {time.perf_counter() - inicio:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,218 @@
+# asgi.py - Servidor ASGI para las APIs de horario en tiempo real
+"""
+Las pantallas de horario en tiempo real quedan abiertas toda la jornada y
+cada una consulta el estado cada pocos segundos; con la aplicación WSGI
+cada consulta ocupa un hilo. Este módulo atiende solo esas APIs en un
+bucle asyncio, sin ningún framework:
+
+- GET /horario/api/estado_actual
+- GET /horario/api/notificaciones_estudiantes/<curso_id>   (admin)
+- GET /horario/api/eventos   canal de eventos (Server-Sent Events) que
+  envía el estado cada vez que cambia
+
+Las respuestas salen de la instantánea del día de estado_horario.py, la
+misma que usan las vistas WSGI, así que no hay una consulta por petición:
+una tarea la revisa cada ASGI_INTERVALO segundos (en un hilo, con la
+sesión de SQLAlchemy de siempre) y avisa a los canales abiertos. Miles de
+conexiones abiertas son miles de corrutinas esperando un asyncio.Event,
+no miles de hilos.
+
+La sesión es la cookie firmada de Flask, y el usuario sale de la misma
+caché que el user_loader (autenticacion.py). Las páginas HTML siguen en
+la aplicación WSGI (app.create_app); el proxy envía /horario/api/ aquí:
+
+    uvicorn asgi:aplicacion --host 127.0.0.1 --port 8001
+
+    location /horario/api/ {
+        proxy_pass http://127.0.0.1:8001;
+        proxy_buffering off;           # Los eventos salen en cuanto ocurren
+        proxy_read_timeout 1h;
+    }
+
+Si este servidor no está desplegado, static/js/main.js vuelve a consultar
+/horario/api/estado_actual en la aplicación WSGI.
+"""
+import asyncio
+import re
+
+from itsdangerous import BadSignature
+from werkzeug.http import parse_cookie
+
+from app import create_app
+import autenticacion
+import estado_horario
+
+_NOTIFICACIONES = re.compile(r'^/horario/api/notificaciones_estudiantes/(\d+)$')
+
+
+class ServidorHorario:
+    """Aplicación ASGI sobre una aplicación Flask ya configurada"""
+
+    def __init__(self, app):
+        self.app = app
+        self.intervalo = app.config.get('ASGI_INTERVALO', 2)
+        self.ping = app.config.get('ASGI_PING', 15)
+        self._firmas = app.session_interface.get_signing_serializer(app)
+        self._cookie = app.config['SESSION_COOKIE_NAME']
+        self._vigencia = int(app.permanent_session_lifetime.total_seconds())
+        self.instantanea = None
+        self.estado = None         # JSON del último estado publicado
+        self._cambio = asyncio.Event()
+        self._tarea = None
+        self.conexiones = 0        # Canales de eventos abiertos
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._ciclo_de_vida(receive, send)
+        elif scope['type'] == 'http':
+            self._iniciar()
+            await self._atender(scope, receive, send)
+
+    # Ciclo de vida y refresco de la instantánea
+
+    async def _ciclo_de_vida(self, receive, send):
+        while True:
+            mensaje = await receive()
+            if mensaje['type'] == 'lifespan.startup':
+                self._iniciar()
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensaje['type'] == 'lifespan.shutdown':
+                if self._tarea:
+                    self._tarea.cancel()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _iniciar(self):
+        # Sin lifespan (algunos servidores), arranca con la primera petición
+        if self._tarea is None:
+            self._tarea = asyncio.get_running_loop().create_task(self._refrescar())
+
+    def _cargar(self):
+        with self.app.app_context():
+            return estado_horario.instantanea()
+
+    async def _refrescar(self):
+        while True:
+            try:
+                await self.actualizar()
+            except Exception:
+                self.app.logger.exception('Error actualizando el estado del horario')
+            await asyncio.sleep(self.intervalo)
+
+    async def actualizar(self):
+        """Revisar la instantánea y avisar a los canales si el estado cambió"""
+        self.instantanea = await asyncio.to_thread(self._cargar)
+        estado = self.app.json.dumps(estado_horario.estado_actual(self.instantanea))
+        if estado != self.estado:
+            self.estado = estado
+            cambio, self._cambio = self._cambio, asyncio.Event()
+            cambio.set()
+
+    async def _vigente(self):
+        if self.instantanea is None:
+            await self.actualizar()
+        return self.instantanea
+
+    # Peticiones
+
+    async def _usuario(self, scope):
+        """Usuario de la cookie de sesión de Flask, o None"""
+        cabecera = b'; '.join(v for k, v in scope['headers'] if k == b'cookie').decode('latin-1')
+        valor = parse_cookie(cabecera).get(self._cookie)
+        if not valor:
+            return None
+        try:
+            sesion = self._firmas.loads(valor, max_age=self._vigencia)
+        except BadSignature:
+            return None
+        if '_user_id' not in sesion:
+            return None
+        usuario = await asyncio.to_thread(self._cargar_usuario, sesion['_user_id'])
+        return usuario if usuario is not None and usuario.activo else None
+
+    def _cargar_usuario(self, user_id):
+        with self.app.app_context():
+            return autenticacion.cargar_usuario(user_id)
+
+    async def _atender(self, scope, receive, send):
+        ruta = scope['path']
+        if scope['method'] not in ('GET', 'HEAD'):
+            return await self._json(send, {'error': 'Método no permitido'}, 405)
+        notificaciones = _NOTIFICACIONES.match(ruta)
+        if ruta not in ('/horario/api/estado_actual', '/horario/api/eventos') and not notificaciones:
+            return await self._json(send, {'error': 'No encontrado'}, 404)
+
+        usuario = await self._usuario(scope)
+        if usuario is None:
+            return await self._json(send, {'error': 'Inicia sesión para continuar'}, 401)
+
+        if ruta == '/horario/api/eventos':
+            return await self._eventos(receive, send)
+        instantanea = await self._vigente()
+        if ruta == '/horario/api/estado_actual':
+            return await self._json(send, estado_horario.estado_actual(instantanea))
+        if not usuario.es_admin:
+            return await self._json(send, {'error': 'Acceso denegado'}, 403)
+        resultado = estado_horario.notificaciones_curso(instantanea, int(notificaciones.group(1)))
+        if resultado is None:
+            return await self._json(send, {'error': 'Curso no encontrado'}, 404)
+        await self._json(send, resultado)
+
+    async def _json(self, send, datos, estado=200):
+        cuerpo = self.app.json.dumps(datos).encode('utf-8')
+        await send({'type': 'http.response.start', 'status': estado, 'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(cuerpo)).encode()),
+            (b'cache-control', b'no-store'),
+        ]})
+        await send({'type': 'http.response.body', 'body': cuerpo})
+
+    async def _eventos(self, receive, send):
+        """Canal de eventos: el estado al conectar y cada vez que cambia; un comentario cada `ping` s"""
+        await self._vigente()
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-store'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        desconexion = asyncio.ensure_future(self._esperar_desconexion(receive))
+        espera = None
+        enviado = None
+        self.conexiones += 1
+        try:
+            while True:
+                # Lo publicado mientras se enviaba el mensaje anterior no se pierde
+                if self.estado != enviado:
+                    enviado = self.estado
+                    await send({'type': 'http.response.body', 'more_body': True,
+                                'body': f'event: estado\ndata: {enviado}\n\n'.encode('utf-8')})
+                if espera is None:
+                    espera = asyncio.ensure_future(self._cambio.wait())
+                listas, _ = await asyncio.wait({desconexion, espera}, timeout=self.ping,
+                                               return_when=asyncio.FIRST_COMPLETED)
+                if desconexion in listas:
+                    break
+                if espera in listas:
+                    espera = None
+                else:
+                    await send({'type': 'http.response.body', 'body': b': ping\n\n', 'more_body': True})
+        except OSError:
+            pass  # El cliente se fue a mitad de un envío
+        finally:
+            self.conexiones -= 1
+            desconexion.cancel()
+            if espera is not None:
+                espera.cancel()
+
+    @staticmethod
+    async def _esperar_desconexion(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+
+def crear_asgi(app=None):
+    """Aplicación ASGI; por defecto sobre create_app() con la configuración de siempre"""
+    return ServidorHorario(app or create_app())
+
+
+aplicacion = crear_asgi()
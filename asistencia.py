@@ -0,0 +1,189 @@
+"""
+Asistencia a clase guardada como mapa de bits.
+
+Cada clase dictada (horario + fecha) es una sola fila de Asistencia con un
+bit por estudiante de la lista del curso: el bit i está encendido si el
+estudiante i de la ListaCurso faltó. El profesor marca el curso completo
+en una petición y la escritura es siempre una fila, sin importar cuántos
+estudiantes tenga el curso.
+
+Las listas guardan los ids de los estudiantes ordenados; si la matrícula
+cambia se crea una lista nueva y las asistencias viejas siguen leyéndose
+con la suya. Las tasas se calculan sobre los bits:
+
+- por curso, con total_ausentes (popcount guardado al escribir) y el
+  tamaño de la lista, sumados en SQL;
+- por estudiante, sumando los mapas de cada lista en contadores por
+  planos de bits: cada clase cuesta unas pocas operaciones con enteros
+  del ancho de la lista, no una operación por estudiante.
+"""
+
+import hashlib
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from models import Usuario, ListaCurso, Asistencia, usuario_curso
+
+
+def a_bits(posiciones):
+    """bytes con los bits de `posiciones` encendidos (bit i = byte i//8, bit i%8)"""
+    bits = 0
+    for posicion in posiciones:
+        bits |= 1 << posicion
+    return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+
+def de_bits(datos):
+    return int.from_bytes(datos, 'little')
+
+
+def posiciones(bits):
+    """Posiciones de los bits encendidos de un entero"""
+    while bits:
+        menor = bits & -bits
+        yield menor.bit_length() - 1
+        bits ^= menor
+
+
+def ids_de(lista):
+    """Ids de los estudiantes de una lista, en el orden de sus bits"""
+    ids = array('I')
+    ids.frombytes(lista.estudiantes)
+    return ids
+
+
+def matriculados(sesion, curso_id):
+    """Ids ordenados de los estudiantes activos del curso"""
+    return array('I', sesion.execute(
+        select(Usuario.id).join(usuario_curso, usuario_curso.c.usuario_id == Usuario.id)
+        .where(usuario_curso.c.curso_id == curso_id, Usuario.role == 'estudiante', Usuario.activo == True)
+        .order_by(Usuario.id)
+    ).scalars())
+
+
+def lista_actual(sesion, curso_id):
+    """ListaCurso con los estudiantes activos de hoy; se crea si la matrícula cambió"""
+    ids = matriculados(sesion, curso_id)
+    datos = ids.tobytes()
+    huella = hashlib.sha1(b'%d:' % curso_id + datos).hexdigest()
+    lista = sesion.execute(select(ListaCurso).filter_by(huella=huella)).scalar_one_or_none()
+    if lista:
+        return lista
+    try:
+        # Otra petición puede estar creando la misma lista a la vez
+        with sesion.begin_nested():
+            lista = ListaCurso(curso_id=curso_id, estudiantes=datos, tamaño=len(ids), huella=huella)
+            sesion.add(lista)
+    except IntegrityError:
+        lista = sesion.execute(select(ListaCurso).filter_by(huella=huella)).scalar_one()
+    return lista
+
+
+def registrar(sesion, horario, fecha, ausentes_ids, profesor_id):
+    """Guardar (o corregir) la asistencia de una clase; ausentes_ids fuera de la lista se ignoran"""
+    lista = lista_actual(sesion, horario.curso_id)
+    ids = ids_de(lista)
+    indice = {estudiante_id: i for i, estudiante_id in enumerate(ids)}
+    datos = a_bits(indice[e] for e in set(ausentes_ids) if e in indice)
+
+    asistencia = sesion.get(Asistencia, (horario.id, fecha))
+    if asistencia is None:
+        asistencia = Asistencia(horario_id=horario.id, fecha=fecha, curso_id=horario.curso_id)
+        sesion.add(asistencia)
+    asistencia.lista_id = lista.id
+    asistencia.ausentes = datos
+    asistencia.total_ausentes = de_bits(datos).bit_count()
+    asistencia.profesor_id = profesor_id
+    return asistencia
+
+
+def ausentes_de(asistencia):
+    """Ids de los estudiantes ausentes en una asistencia"""
+    ids = ids_de(asistencia.lista)
+    return {ids[i] for i in posiciones(de_bits(asistencia.ausentes))}
+
+
+def contar_por_posicion(mapas, tamaño):
+    """Cuántos de los `mapas` (enteros) tienen encendida cada posición 0..tamaño-1.
+
+    Suma con acarreo sobre planos de bits: planos[k] guarda el bit k del
+    contador de todas las posiciones a la vez, así que sumar un mapa son
+    O(log n) operaciones &/^ sobre enteros del ancho de la lista.
+    """
+    planos = []
+    for acarreo in mapas:
+        for k, plano in enumerate(planos):
+            if not acarreo:
+                break
+            planos[k], acarreo = plano ^ acarreo, plano & acarreo
+        if acarreo:
+            planos.append(acarreo)
+    return [sum(((plano >> i) & 1) << k for k, plano in enumerate(planos)) for i in range(tamaño)]
+
+
+def _filtrar_fechas(consulta, desde, hasta):
+    if desde:
+        consulta = consulta.where(Asistencia.fecha >= desde)
+    if hasta:
+        consulta = consulta.where(Asistencia.fecha <= hasta)
+    return consulta
+
+
+def ausencias_por_estudiante(sesion, curso_id, desde=None, hasta=None):
+    """{estudiante_id: (ausencias, clases)} del curso entre las fechas dadas"""
+    filas = sesion.execute(_filtrar_fechas(
+        select(Asistencia.lista_id, Asistencia.ausentes).where(Asistencia.curso_id == curso_id),
+        desde, hasta)).all()
+    por_lista = defaultdict(list)
+    for lista_id, datos in filas:
+        por_lista[lista_id].append(de_bits(datos))
+
+    resultado = defaultdict(lambda: (0, 0))
+    for lista in sesion.execute(select(ListaCurso).where(ListaCurso.id.in_(por_lista))).scalars():
+        mapas = por_lista[lista.id]
+        conteos = contar_por_posicion(mapas, lista.tamaño)
+        for estudiante_id, ausencias in zip(ids_de(lista), conteos):
+            previas, clases = resultado[estudiante_id]
+            resultado[estudiante_id] = (previas + ausencias, clases + len(mapas))
+    return dict(resultado)
+
+
+def ausencias_de_estudiante(sesion, estudiante_id, curso_id, desde=None, hasta=None):
+    """(ausencias, clases) de un estudiante: busca su bit en cada lista del curso"""
+    filas = sesion.execute(_filtrar_fechas(
+        select(ListaCurso.estudiantes, Asistencia.ausentes)
+        .join(ListaCurso, ListaCurso.id == Asistencia.lista_id)
+        .where(Asistencia.curso_id == curso_id),
+        desde, hasta)).all()
+    ausencias = clases = 0
+    posicion_en = {}
+    for estudiantes, datos in filas:
+        if estudiantes not in posicion_en:
+            ids = array('I')
+            ids.frombytes(estudiantes)
+            i = bisect_left(ids, estudiante_id)
+            posicion_en[estudiantes] = i if i < len(ids) and ids[i] == estudiante_id else None
+        posicion = posicion_en[estudiantes]
+        if posicion is not None:
+            clases += 1
+            ausencias += (de_bits(datos) >> posicion) & 1
+    return ausencias, clases
+
+
+def tasas_por_curso(sesion, curso_ids, desde=None, hasta=None):
+    """{curso_id: (ausencias, asistencias posibles, clases)} sumado en SQL con los popcounts guardados"""
+    consulta = _filtrar_fechas(
+        select(Asistencia.curso_id, func.sum(Asistencia.total_ausentes), func.sum(ListaCurso.tamaño), func.count())
+        .join(ListaCurso, ListaCurso.id == Asistencia.lista_id)
+        .where(Asistencia.curso_id.in_(list(curso_ids)))
+        .group_by(Asistencia.curso_id),
+        desde, hasta)
+    return {curso_id: (ausencias, posibles, clases) for curso_id, ausencias, posibles, clases in sesion.execute(consulta)}
+
+
+def porcentaje(ausencias, total):
+    return round(100 * ausencias / total, 1) if total else 0.0
@@ -0,0 +1,365 @@
+# autenticacion.py - Carga de usuarios para Flask-Login y verificación de credenciales
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as TiempoAgotado
+from flask import g
+from werkzeug.security import check_password_hash
+from cache import CacheLRU
+from extensions import db
+from models import Usuario, usuario_curso
+import fragmentos
+
+# Caché de instantáneas por id de usuario (se configura en init_app)
+_cache_usuarios = CacheLRU()
+
+# Caché de credenciales por email normalizado: email -> (id, password_hash, activo)
+_cache_credenciales = CacheLRU()
+
+# Las dos cachés guardan (versión de 'Usuario', valor). La versión es la de
+# fragmentos.versiones(), que se lee una vez por petición y sube justo después
+# del commit de cada escritura de Usuario o de sus matrículas en cualquier
+# proceso (también en scripts como promocion.py): una entrada con otra versión
+# se descarta.
+# invalidar_usuario/invalidar_todos solo adelantan eso en el proceso actual.
+
+
+def _version_usuarios():
+    return fragmentos.versiones().get('Usuario', 0)
+
+
+def _vigente(cache, clave, version):
+    entrada = cache.get(clave)
+    if entrada is not None and entrada[0] == version:
+        return entrada[1]
+    return None
+
+
+class UsuarioSesion:
+    """Instantánea compacta y de solo lectura del usuario autenticado.
+
+    Contiene lo necesario para autenticar y autorizar sin consultar la base
+    de datos. Cualquier otro atributo (relaciones, datos personales) se
+    resuelve cargando el `Usuario` real una sola vez por petición.
+    """
+    __slots__ = ('id', 'role', 'activo', 'nombres', 'apellidos', 'email',
+                 'numero_documento', 'curso_ids')
+
+    def __init__(self, id, role, activo, nombres, apellidos, email, numero_documento, curso_ids):
+        setter = object.__setattr__
+        setter(self, 'id', id)
+        setter(self, 'role', role)
+        setter(self, 'activo', activo)
+        setter(self, 'nombres', nombres)
+        setter(self, 'apellidos', apellidos)
+        setter(self, 'email', email)
+        setter(self, 'numero_documento', numero_documento)
+        setter(self, 'curso_ids', tuple(curso_ids))
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError('UsuarioSesion es de solo lectura')
+
+    # Interfaz requerida por Flask-Login
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_active(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    def get_id(self):
+        return str(self.id)
+
+    @property
+    def nombre_completo(self):
+        return f"{self.nombres} {self.apellidos}"
+
+    @property
+    def es_admin(self):
+        return self.role == 'admin'
+
+    @property
+    def es_profesor(self):
+        return self.role == 'profesor'
+
+    @property
+    def es_estudiante(self):
+        return self.role == 'estudiante'
+
+    @property
+    def usuario(self):
+        """Usuario completo de la base de datos, cargado una vez por petición"""
+        cargados = g.setdefault('_usuarios_sesion', {})
+        usuario = cargados.get(self.id)
+        if usuario is None:
+            usuario = db.session.get(Usuario, self.id)
+            cargados[self.id] = usuario
+        return usuario
+
+    def __getattr__(self, nombre):
+        # Solo se llama para atributos que no están en la instantánea
+        if nombre.startswith('__'):
+            raise AttributeError(nombre)
+        return getattr(self.usuario, nombre)
+
+    def __eq__(self, otro):
+        if isinstance(otro, (UsuarioSesion, Usuario)):
+            return self.id == otro.id
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f'<UsuarioSesion {self.id} {self.role}>'
+
+
+def crear_instantanea(usuario):
+    """Construir la instantánea de sesión a partir de un Usuario"""
+    curso_ids = [fila[0] for fila in db.session.query(usuario_curso.c.curso_id).filter(
+        usuario_curso.c.usuario_id == usuario.id
+    ).order_by(usuario_curso.c.curso_id).all()]
+    return UsuarioSesion(
+        id=usuario.id,
+        role=usuario.role,
+        activo=usuario.activo,
+        nombres=usuario.nombres,
+        apellidos=usuario.apellidos,
+        email=usuario.email,
+        numero_documento=usuario.numero_documento,
+        curso_ids=curso_ids
+    )
+
+
+def cargar_usuario(user_id):
+    """user_loader de Flask-Login: sin consultas mientras la entrada esté en caché"""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    # La versión se lee antes que los datos: si cambia en medio, la entrada solo dura una petición
+    version = _version_usuarios()
+    instantanea = _vigente(_cache_usuarios, user_id, version)
+    if instantanea is not None:
+        return instantanea
+
+    usuario = db.session.get(Usuario, user_id)
+    if usuario is None:
+        return None
+
+    instantanea = crear_instantanea(usuario)
+    _cache_usuarios.set(user_id, (version, instantanea))
+    return instantanea
+
+
+def invalidar_usuario(user_id):
+    """Descartar la instantánea en caché de un usuario en este proceso (edición, eliminación, contraseña)"""
+    _cache_usuarios.invalidar(int(user_id))
+    _invalidar_credenciales_por_id(int(user_id))
+
+
+def invalidar_todos():
+    """Vaciar las cachés de usuarios de este proceso (cambios masivos)"""
+    _cache_usuarios.limpiar()
+    _cache_credenciales.limpiar()
+    with _lock_emails:
+        _emails_por_id.clear()
+
+
+# === VERIFICACIÓN DE CREDENCIALES ===
+
+class CuboTokens:
+    """Token bucket: `capacidad` intentos en ráfaga y `recarga` tokens por segundo"""
+    __slots__ = ('capacidad', 'recarga', 'tokens', 'actualizado')
+
+    def __init__(self, capacidad, recarga):
+        self.capacidad = capacidad
+        self.recarga = recarga
+        self.tokens = float(capacidad)
+        self.actualizado = time.monotonic()
+
+    def disponibles(self):
+        ahora = time.monotonic()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.actualizado) * self.recarga)
+        self.actualizado = ahora
+        return self.tokens
+
+    def consumir(self, cantidad=1):
+        if self.disponibles() >= cantidad:
+            self.tokens -= cantidad
+            return True
+        return False
+
+
+class LimitadorIntentos:
+    """Un cubo de tokens por clave (cuenta o IP), con número acotado de claves.
+
+    Los cubos viven en la memoria del proceso: con N workers (gunicorn -w N)
+    cada uno lleva su cuenta y el límite efectivo es N veces el configurado.
+    """
+
+    def __init__(self, capacidad, recarga, max_claves=100000):
+        self.capacidad = capacidad
+        self.recarga = recarga
+        # Un cubo inactivo se recarga por completo en capacidad/recarga segundos;
+        # pasado ese tiempo se puede descartar sin cambiar el comportamiento
+        self._cubos = CacheLRU(max_elementos=max_claves, ttl=capacidad / recarga)
+        self._lock = threading.Lock()
+
+    def permitir(self, clave):
+        with self._lock:
+            cubo = self._cubos.get(clave)
+            if cubo is None:
+                cubo = CuboTokens(self.capacidad, self.recarga)
+            permitido = cubo.consumir()
+            self._cubos.set(clave, cubo)
+            return permitido
+
+    def disponible(self, clave):
+        """Si a `clave` le queda al menos un intento, sin gastarlo"""
+        with self._lock:
+            cubo = self._cubos.get(clave)
+            return cubo is None or cubo.disponibles() >= 1
+
+
+class ServidorOcupado(Exception):
+    """La cola de verificación de contraseñas está llena o no respondió a tiempo"""
+
+
+class VerificadorContraseñas:
+    """Pool acotado de hilos para `check_password_hash`.
+
+    Limita cuántas derivaciones de clave corren a la vez (y la CPU que se
+    llevan), no aumenta el rendimiento: el hilo de la petición espera el
+    resultado en `futuro.result()` y su worker queda ocupado igual que si
+    hasheara él mismo. Si hay más verificaciones pendientes que
+    `max_pendientes` se rechaza de inmediato; una que tarda más de
+    `timeout` segundos también se rechaza.
+    """
+
+    def __init__(self, hilos=4, max_pendientes=64, timeout=10):
+        self.hilos = hilos
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='verificar-login')
+        self._cupos = threading.BoundedSemaphore(max_pendientes)
+
+    def verificar(self, password_hash, password):
+        if not self._cupos.acquire(blocking=False):
+            raise ServidorOcupado()
+        try:
+            futuro = self._executor.submit(check_password_hash, password_hash, password)
+            try:
+                return futuro.result(timeout=self.timeout)
+            except TiempoAgotado:
+                futuro.cancel()  # Si todavía esperaba turno, que no ocupe un hilo
+                raise ServidorOcupado()
+        finally:
+            self._cupos.release()
+
+
+_emails_por_id = {}
+_lock_emails = threading.Lock()
+_verificador = None
+_limite_cuenta = None
+_limite_ip = None
+
+
+def _invalidar_credenciales_por_id(user_id):
+    with _lock_emails:
+        email = _emails_por_id.pop(user_id, None)
+    if email:
+        _cache_credenciales.invalidar(email)
+
+
+def normalizar_email(email):
+    return (email or '').strip().lower()
+
+
+def _buscar_credenciales(email):
+    version = _version_usuarios()
+    credenciales = _vigente(_cache_credenciales, email, version)
+    if credenciales is None:
+        fila = db.session.query(Usuario.id, Usuario.password_hash, Usuario.activo).filter(
+            Usuario.email == email
+        ).first()
+        if fila is None:
+            return None
+        credenciales = (fila.id, fila.password_hash, fila.activo)
+        _cache_credenciales.set(email, (version, credenciales))
+        with _lock_emails:
+            _emails_por_id[fila.id] = email
+    return credenciales
+
+
+class ResultadoLogin:
+    """Resultado de `autenticar`: usuario (instantánea) o mensaje de error y código HTTP"""
+    __slots__ = ('usuario', 'error', 'status')
+
+    def __init__(self, usuario=None, error=None, status=200):
+        self.usuario = usuario
+        self.error = error
+        self.status = status
+
+
+def autenticar(email, password, ip=None):
+    """Validar credenciales aplicando límites por cuenta e IP antes de hashear.
+
+    El cubo de la cuenta se indexa por (email, ip) y solo gasta intentos
+    fallidos: quien conoce un email no puede bloquear desde su IP el acceso
+    del dueño desde otra, y los inicios de sesión correctos no cuentan.
+    """
+    email = normalizar_email(email)
+    if not email or not password:
+        return ResultadoLogin(error='Por favor completa todos los campos.', status=400)
+
+    cuenta = (email, ip)
+    if (ip and not _limite_ip.permitir(ip)) or not _limite_cuenta.disponible(cuenta):
+        return ResultadoLogin(error='Demasiados intentos de inicio de sesión. Espera un momento e inténtalo de nuevo.',
+                              status=429)
+
+    credenciales = _buscar_credenciales(email)
+    if credenciales is None:
+        _limite_cuenta.permitir(cuenta)
+        return ResultadoLogin(error='Email o contraseña incorrectos.', status=401)
+
+    user_id, password_hash, activo = credenciales
+    try:
+        valida = _verificador.verificar(password_hash, password)
+    except ServidorOcupado:
+        return ResultadoLogin(error='El servidor está atendiendo muchos inicios de sesión. Inténtalo en unos segundos.',
+                              status=503)
+
+    if not valida:
+        _limite_cuenta.permitir(cuenta)
+        return ResultadoLogin(error='Email o contraseña incorrectos.', status=401)
+    if not activo:
+        return ResultadoLogin(error='Tu cuenta está inactiva. Contacta al administrador.', status=403)
+
+    usuario = cargar_usuario(user_id)
+    if usuario is None:
+        return ResultadoLogin(error='Email o contraseña incorrectos.', status=401)
+    return ResultadoLogin(usuario=usuario)
+
+
+def init_app(app, login_manager):
+    """Configurar las cachés, los límites de intentos y registrar el user_loader"""
+    global _verificador, _limite_cuenta, _limite_ip
+
+    _cache_usuarios.max_elementos = app.config.get('CACHE_USUARIOS_MAX', 4096)
+    _cache_usuarios.ttl = app.config.get('CACHE_USUARIOS_TTL', 300)
+    _cache_credenciales.max_elementos = app.config.get('CACHE_USUARIOS_MAX', 4096)
+    _cache_credenciales.ttl = app.config.get('CACHE_USUARIOS_TTL', 300)
+
+    _verificador = VerificadorContraseñas(
+        hilos=app.config.get('LOGIN_HILOS_VERIFICACION', 4),
+        max_pendientes=app.config.get('LOGIN_MAX_PENDIENTES', 64)
+    )
+    _limite_cuenta = LimitadorIntentos(*app.config.get('LOGIN_LIMITE_CUENTA', (5, 0.1)))
+    _limite_ip = LimitadorIntentos(*app.config.get('LOGIN_LIMITE_IP', (300, 20)))
+
+    login_manager.user_loader(cargar_usuario)
@@ -0,0 +1,138 @@
+# bandeja.py - Bandeja de tareas precalculada por estudiante (tabla bandeja_tarea)
+from sqlalchemy import and_, bindparam, case, delete, event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+from models import Usuario, Asignatura, Tarea, Calificacion, BandejaTarea, usuario_curso
+
+# Estados guardados; "vencida" no se guarda: es una tarea pendiente con fecha_entrega pasada
+PENDIENTE = 'pendiente'
+ENTREGADA = 'entregada'
+CALIFICADA = 'calificada'
+
+_bandeja = BandejaTarea.__table__
+_tarea = Tarea.__table__
+_calificacion = Calificacion.__table__
+_COLUMNAS = ['estudiante_id', 'tarea_id', 'fecha_entrega', 'activa', 'estado', 'nota']
+
+# Máximo de ids por sentencia IN (límite de variables de SQLite)
+_BLOQUE = 500
+
+
+def _nota(estudiante_id, tarea_id):
+    """Subconsulta con la nota del estudiante en la tarea (NULL si no hay calificación)"""
+    return select(func.max(_calificacion.c.nota)).where(
+        _calificacion.c.estudiante_id == estudiante_id,
+        _calificacion.c.tarea_id == tarea_id
+    ).scalar_subquery()
+
+
+def _notas(condicion):
+    """Subconsulta (estudiante_id, tarea_id, nota) con la mayor nota de cada par calificado"""
+    return select(
+        _calificacion.c.estudiante_id, _calificacion.c.tarea_id, func.max(_calificacion.c.nota).label('nota')
+    ).where(condicion).group_by(_calificacion.c.estudiante_id, _calificacion.c.tarea_id).subquery()
+
+
+def _estado(nota):
+    # Convención de la aplicación: la entrega crea la calificación con nota 0.0
+    return case((nota > 0, CALIFICADA), (nota.isnot(None), ENTREGADA), else_=PENDIENTE)
+
+
+def _filas(condicion, condicion_notas=True):
+    """SELECT de las filas de bandeja: una por estudiante matriculado en el curso de cada tarea.
+
+    Las notas entran con un LEFT JOIN a su agregado (acotado por
+    `condicion_notas`), no con una subconsulta por fila: la reconstrucción
+    completa recorre las calificaciones una sola vez.
+    """
+    notas = _notas(condicion_notas)
+    return select(
+        usuario_curso.c.usuario_id, _tarea.c.id, _tarea.c.fecha_entrega,
+        _tarea.c.activa, _estado(notas.c.nota), notas.c.nota
+    ).select_from(
+        _tarea.join(Asignatura.__table__, Asignatura.id == _tarea.c.asignatura_id)
+        .join(usuario_curso, usuario_curso.c.curso_id == Asignatura.curso_id)
+        .join(Usuario.__table__, Usuario.id == usuario_curso.c.usuario_id)
+        .outerjoin(notas, and_(notas.c.estudiante_id == usuario_curso.c.usuario_id,
+                               notas.c.tarea_id == _tarea.c.id))
+    ).where(Usuario.role == 'estudiante', condicion)
+
+
+def _por_bloques(ids):
+    ids = sorted(set(ids))
+    for i in range(0, len(ids), _BLOQUE):
+        yield ids[i:i + _BLOQUE]
+
+
+def sincronizar_tareas(conexion, tarea_ids):
+    """Regenerar las filas de estas tareas (creación, cambio de fecha, curso o estado activo)"""
+    for bloque in _por_bloques(tarea_ids):
+        conexion.execute(delete(_bandeja).where(_bandeja.c.tarea_id.in_(bloque)))
+        conexion.execute(insert(_bandeja).from_select(
+            _COLUMNAS, _filas(_tarea.c.id.in_(bloque), _calificacion.c.tarea_id.in_(bloque))))
+
+
+def sincronizar_estudiantes(conexion, estudiante_ids):
+    """Regenerar la bandeja de estos estudiantes (matrículas nuevas o retiradas)"""
+    for bloque in _por_bloques(estudiante_ids):
+        conexion.execute(delete(_bandeja).where(_bandeja.c.estudiante_id.in_(bloque)))
+        conexion.execute(insert(_bandeja).from_select(
+            _COLUMNAS, _filas(usuario_curso.c.usuario_id.in_(bloque), _calificacion.c.estudiante_id.in_(bloque))))
+
+
+def actualizar_entregas(conexion, pares):
+    """Recalcular estado y nota de pares (estudiante_id, tarea_id) tras entregar o calificar"""
+    if not pares:
+        return
+    nota = _nota(_bandeja.c.estudiante_id, _bandeja.c.tarea_id)
+    conexion.execute(
+        update(_bandeja).where(and_(
+            _bandeja.c.estudiante_id == bindparam('e'),
+            _bandeja.c.tarea_id == bindparam('t')
+        )).values(estado=_estado(nota), nota=nota),
+        [{'e': estudiante_id, 't': tarea_id} for estudiante_id, tarea_id in sorted(pares)]
+    )
+
+
+def reconstruir(conexion):
+    """Regenerar la bandeja completa (cargas masivas que no pasan por la sesión)"""
+    conexion.execute(delete(_bandeja))
+    return conexion.execute(insert(_bandeja).from_select(_COLUMNAS, _filas(True))).rowcount
+
+
+def _cambio(objeto, *atributos):
+    estado = inspect(objeto)
+    return any(estado.attrs[a].history.has_changes() for a in atributos)
+
+
+def _al_escribir(session, contexto):
+    """after_flush: mantener la bandeja en la misma transacción que la escritura"""
+    tareas, estudiantes, entregas, asignaturas = set(), set(), set(), set()
+    for objeto in (*session.new, *session.dirty, *session.deleted):
+        nuevo_o_borrado = objeto in session.new or objeto in session.deleted
+        if isinstance(objeto, Tarea):
+            if nuevo_o_borrado or _cambio(objeto, 'fecha_entrega', 'activa', 'asignatura_id'):
+                tareas.add(objeto.id)
+        elif isinstance(objeto, Calificacion):
+            entregas.add((objeto.estudiante_id, objeto.tarea_id))
+        elif isinstance(objeto, Usuario):
+            if nuevo_o_borrado or _cambio(objeto, 'cursos', 'role'):
+                estudiantes.add(objeto.id)
+        elif isinstance(objeto, Asignatura):
+            if not nuevo_o_borrado and _cambio(objeto, 'curso_id'):
+                asignaturas.add(objeto.id)
+
+    if not (tareas or estudiantes or entregas or asignaturas):
+        return
+    conexion = session.connection()
+    if asignaturas:
+        tareas.update(conexion.execute(
+            select(_tarea.c.id).where(_tarea.c.asignatura_id.in_(asignaturas))).scalars())
+    sincronizar_tareas(conexion, tareas)
+    sincronizar_estudiantes(conexion, estudiantes)
+    actualizar_entregas(conexion, {(e, t) for e, t in entregas if t not in tareas and e not in estudiantes})
+
+
+def init_app(app):
+    """Registrar el evento que mantiene la bandeja al día con cada flush"""
+    if not event.contains(Session, 'after_flush', _al_escribir):
+        event.listen(Session, 'after_flush', _al_escribir)
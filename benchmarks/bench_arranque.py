@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Benchmark del arranque en frío de un worker (ver arranque.py).
+
+Cada medición corre en un proceso nuevo, como un worker recién creado:
+importa la aplicación, llama a create_app y atiende dos veces la misma
+petición con una sesión ya iniciada. La primera petición es la que paga
+la importación del módulo de rutas (con rutas perezosas) y la compilación
+de las plantillas; la segunda muestra el régimen normal. Se comparan tres
+modos:
+
+- normal: sin caché de bytecode ni rutas perezosas.
+- bytecode: plantillas precompiladas en disco (PLANTILLAS_BYTECODE).
+- rápido: bytecode y rutas perezosas desde el manifiesto (ARRANQUE_PEREZOSO).
+
+Uso:
+    python benchmarks/bench_arranque.py
+    python benchmarks/bench_arranque.py --repeticiones 10 --solo admin.dashboard
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Sin importar la aplicación aquí: el proceso hijo la importa dentro de la medición
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Un dataset pequeño: lo que se mide es el arranque, no las consultas
+DATASET = {
+    'semilla': 42,
+    'cursos': 4,
+    'estudiantes_por_curso': 20,
+    'profesores': 6,
+    'tareas_por_asignatura': 3,
+    'años': 1,
+}
+
+# (endpoint, rol o None para una petición anónima): una página de cada blueprint
+CASOS = [
+    ('main.login', None),
+    ('admin.dashboard', 'admin'),
+    ('profesor.asignaturas', 'profesor'),
+    ('estudiante.dashboard', 'estudiante'),
+    ('horario.tiempo_real', 'profesor'),
+    ('trabajos.recientes', 'admin'),
+]
+
+MODOS = {
+    'normal': {'PLANTILLAS_BYTECODE': False, 'ARRANQUE_PEREZOSO': False},
+    'bytecode': {'PLANTILLAS_BYTECODE': True, 'ARRANQUE_PEREZOSO': False},
+    'rápido': {'PLANTILLAS_BYTECODE': True, 'ARRANQUE_PEREZOSO': True},
+}
+
+
+def hijo(especificacion):
+    """Un worker nuevo: tiempos en ms de import, create_app y las dos peticiones"""
+    inicio = time.perf_counter()
+    sys.path.insert(0, RAIZ)
+    from app import create_app
+    importado = time.perf_counter()
+    app = create_app(especificacion['config'])
+    creado = time.perf_counter()
+
+    cliente = app.test_client()
+    if especificacion['cookie']:
+        cliente.set_cookie('session', especificacion['cookie'])
+    estado = cliente.get(especificacion['url']).status_code
+    primera = time.perf_counter()
+    cliente.get(especificacion['url'])
+    segunda = time.perf_counter()
+
+    print(json.dumps({
+        'import_ms': (importado - inicio) * 1000,
+        'app_ms': (creado - importado) * 1000,
+        'primera_ms': (primera - creado) * 1000,
+        'segunda_ms': (segunda - primera) * 1000,
+        'estado': estado,
+    }))
+    return 0
+
+
+def preparar(carpeta):
+    """Dataset, manifiesto y bytecode en `carpeta`; devuelve (config común, {rol: cookie}, {endpoint: url})"""
+    from comun import Cronometro
+    from flask import url_for
+    from bench_endpoints import preparar as preparar_dataset
+    from aprovisionamiento import CONTRASEÑAS_POR_ROL
+    import app as modulo_app
+    import arranque
+
+    print(f"⚙️  Generando dataset {DATASET}...")
+    with Cronometro() as c:
+        app, usuarios, conteos = preparar_dataset(DATASET)
+    print(f"   ✅ {sum(conteos.values()):,} filas en {c.segundos:.1f}s")
+
+    app.config['ARRANQUE_CARPETA'] = carpeta
+    arranque.configurar_plantillas(app)
+    manifiesto = arranque.generar_manifiesto(app, modulo_app.BLUEPRINTS)
+    plantillas = arranque.precompilar_plantillas(app)
+    print(f"🗺️  {sum(len(e['reglas']) for e in manifiesto.values())} rutas en el manifiesto, "
+          f"{plantillas} plantillas precompiladas")
+
+    cookies = {None: None}
+    for rol, (_, email) in usuarios.items():
+        cliente = app.test_client()
+        respuesta = cliente.post('/login', data={'email': email, 'password': CONTRASEÑAS_POR_ROL[rol]})
+        if respuesta.status_code != 302:
+            raise SystemExit(f'❌ No se pudo iniciar sesión como {rol} ({respuesta.status_code})')
+        cookies[rol] = cliente.get_cookie('session').value
+
+    with app.test_request_context():
+        urls = {endpoint: url_for(endpoint) for endpoint, _ in CASOS}
+
+    config = {
+        'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI'],
+        'UPLOAD_FOLDER': app.config['UPLOAD_FOLDER'],
+        'ARRANQUE_CARPETA': carpeta,
+        'SECRET_KEY': app.config['SECRET_KEY'],
+        'WTF_CSRF_ENABLED': False,
+        'TESTING': True,
+        'TRABAJOS_HILOS': 0,
+        'RECORDATORIOS': False,
+    }
+    return config, cookies, urls
+
+
+def medir(especificacion):
+    salida = subprocess.run([sys.executable, os.path.abspath(__file__), '--hijo', json.dumps(especificacion)],
+                            capture_output=True, text=True, cwd=RAIZ)
+    if salida.returncode != 0:
+        raise SystemExit(f'❌ Falló el proceso hijo:\n{salida.stderr}')
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def imprimir(resultados):
+    print(f"\n{'Endpoint':<24} {'modo':<9} {'import':>8} {'app':>8} {'1ª pet.':>8} "
+          f"{'total':>8} {'2ª pet.':>8}  estado")
+    for endpoint, modos in resultados.items():
+        for modo, r in modos.items():
+            print(f"{endpoint:<24} {modo:<9} {r['import_ms']:>8.1f} {r['app_ms']:>8.1f} {r['primera_ms']:>8.1f} "
+                  f"{r['total_ms']:>8.1f} {r['segunda_ms']:>8.1f}  {r['estado']}")
+
+    # El import de la aplicación es el mismo en todos los modos y es donde más varía la medición
+    print("\n⏱️  Hasta la primera respuesta (mediana de los endpoints, ms):")
+    print(f"   {'modo':<9} {'create_app + 1ª pet.':>21} {'con import':>12}")
+    base = {clave: statistics.median(m['normal'][clave] for m in resultados.values())
+            for clave in ('arranque_ms', 'total_ms')}
+    for modo in MODOS:
+        arranque, total = (statistics.median(m[modo][clave] for m in resultados.values())
+                           for clave in ('arranque_ms', 'total_ms'))
+        print(f"   {modo:<9} {arranque:>12.1f} ({base['arranque_ms'] / arranque:.2f}x) "
+              f"{total:>8.1f} ({base['total_ms'] / total:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=5, help='Procesos por endpoint y modo')
+    parser.add_argument('--solo', nargs='+', help='Medir solo estos endpoints (p. ej. admin.dashboard)')
+    parser.add_argument('--hijo', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.hijo:
+        return hijo(json.loads(args.hijo))
+
+    carpeta = tempfile.mkdtemp(prefix='colegio_arranque_')
+    config, cookies, urls = preparar(carpeta)
+    casos = [(e, rol) for e, rol in CASOS if not args.solo or e in args.solo]
+
+    print(f"⏱️  Midiendo ({args.repeticiones} procesos por endpoint y modo)...")
+    resultados = {}
+    for endpoint, rol in casos:
+        muestras = {modo: [] for modo in MODOS}
+        # Los modos se alternan: la carga de la máquina cambia entre procesos y afecta a todos por igual
+        for _ in range(args.repeticiones):
+            for modo, opciones in MODOS.items():
+                muestra = medir({'config': {**config, **opciones}, 'url': urls[endpoint], 'cookie': cookies[rol]})
+                muestra['arranque_ms'] = muestra['app_ms'] + muestra['primera_ms']
+                muestra['total_ms'] = muestra['import_ms'] + muestra['arranque_ms']
+                muestras[modo].append(muestra)
+        resultados[endpoint] = {}
+        for modo, lista in muestras.items():
+            resultados[endpoint][modo] = {
+                clave: statistics.median(m[clave] for m in lista)
+                for clave in ('import_ms', 'app_ms', 'primera_ms', 'segunda_ms', 'arranque_ms', 'total_ms')
+            }
+            resultados[endpoint][modo]['estado'] = lista[0]['estado']
+    imprimir(resultados)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
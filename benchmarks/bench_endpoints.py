@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los endpoints más usados con control de regresiones.
+
+Genera un dataset determinista (generar_datos.GeneradorDatos), inicia
+sesión con cada rol mediante el cliente de pruebas de Flask y mide para
+cada endpoint la latencia (p50, p95, máximo) y el número de consultas SQL
+por petición. Con --comparar, el resultado se compara con una línea base
+guardada y el proceso termina con código 1 si algún endpoint empeoró: más
+consultas que la línea base, o una latencia por encima de la tolerancia.
+
+Uso:
+    python benchmarks/bench_endpoints.py                              # Medir y comparar con linea_base.json
+    python benchmarks/bench_endpoints.py --guardar benchmarks/linea_base.json
+    python benchmarks/bench_endpoints.py --solo admin.reportes --repeticiones 50
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+
+from comun import crear_app_benchmark, percentil, Cronometro
+from flask import url_for
+from sqlalchemy import event
+from extensions import db
+from models import Usuario, Curso, Asignatura, usuario_curso
+from generar_datos import GeneradorDatos
+from aprovisionamiento import CONTRASEÑAS_POR_ROL
+
+LINEA_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'linea_base.json')
+
+# Dataset por defecto: un colegio mediano, suficiente para que aparezcan consultas N+1
+DATASET = {
+    'semilla': 42,
+    'cursos': 12,
+    'estudiantes_por_curso': 30,
+    'profesores': 14,
+    'tareas_por_asignatura': 8,
+    'años': 2,
+}
+
+
+def endpoints(ids):
+    """(endpoint, rol, método, argumentos de url_for, datos del formulario) de cada caso"""
+    return [
+        ('admin.dashboard', 'admin', 'GET', {}, None),
+        ('admin.reportes', 'admin', 'GET', {}, None),
+        ('admin.buscar_estudiantes', 'admin', 'GET', {}, None),
+        ('admin.buscar_estudiantes', 'admin', 'GET', {'busqueda': 'ana'}, None),
+        ('admin.reportar_ausencia', 'admin', 'GET', {}, None),
+        ('admin.reportar_ausencia', 'admin', 'POST', {},
+         {'profesor_id': ids['profesor'], 'fecha_ausencia': '2025-06-16', 'motivo': 'Benchmark'}),
+        ('estudiante.dashboard', 'estudiante', 'GET', {}, None),
+        ('estudiante.tareas', 'estudiante', 'GET', {}, None),
+        ('profesor.asignaturas', 'profesor', 'GET', {}, None),
+        ('horario.api_estado_actual', 'estudiante', 'GET', {}, None),
+    ]
+
+
+def nombre_caso(endpoint, metodo, argumentos):
+    nombre = endpoint if metodo == 'GET' else f'{endpoint} [{metodo}]'
+    if argumentos:
+        nombre += ' ?' + '&'.join(f'{k}={v}' for k, v in sorted(argumentos.items()))
+    return nombre
+
+
+def preparar(dataset, database_url=None):
+    app = crear_app_benchmark(database_url)
+    with app.app_context():
+        generador = GeneradorDatos(**dataset)
+        with db.engine.begin() as conexion:
+            generador.generar(conexion)
+
+        admin = Usuario.query.filter_by(role='admin').first()
+        # El profesor con más asignaturas y un estudiante del año actual: los casos más pesados
+        profesor = db.session.query(Usuario).join(Asignatura, Asignatura.profesor_id == Usuario.id).group_by(
+            Usuario.id).order_by(db.func.count(Asignatura.id).desc(), Usuario.id).first()
+        estudiante = db.session.query(Usuario).join(usuario_curso).join(Curso).filter(
+            Usuario.role == 'estudiante', Curso.activo == True).order_by(Usuario.id).first()
+        usuarios = {u.role: (u.id, u.email) for u in (admin, profesor, estudiante)}
+    return app, usuarios, generador.conteos
+
+
+def medir(app, usuarios, repeticiones, calentamiento, solo=None):
+    consultas = []
+    with app.app_context():
+        # Todos los motores: los reportes (@solo_lectura) consultan por el de lectura
+        for motor in db.engines.values():
+            event.listen(motor, 'before_cursor_execute', lambda *args: consultas.append(1))
+
+    clientes = {}
+    for rol, (_, email) in usuarios.items():
+        cliente = app.test_client()
+        respuesta = cliente.post('/login', data={'email': email, 'password': CONTRASEÑAS_POR_ROL[rol]})
+        if respuesta.status_code != 302:
+            raise SystemExit(f'❌ No se pudo iniciar sesión como {rol} ({respuesta.status_code})')
+        clientes[rol] = cliente
+
+    ids = {rol: uid for rol, (uid, _) in usuarios.items()}
+    resultados = {}
+    for endpoint, rol, metodo, argumentos, datos in endpoints(ids):
+        nombre = nombre_caso(endpoint, metodo, argumentos)
+        if solo and endpoint not in solo and nombre not in solo:
+            continue
+        with app.test_request_context():
+            url = url_for(endpoint, **argumentos)
+        cliente = clientes[rol]
+
+        latencias, conteos, estados = [], [], set()
+        for i in range(calentamiento + repeticiones):
+            consultas.clear()
+            with Cronometro() as c:
+                respuesta = cliente.open(url, method=metodo, data=datos)
+                respuesta.get_data()
+            if i >= calentamiento:
+                latencias.append(c.segundos * 1000)
+                conteos.append(len(consultas))
+                estados.add(respuesta.status_code)
+
+        resultados[nombre] = {
+            'p50_ms': round(percentil(latencias, 50), 2),
+            'p95_ms': round(percentil(latencias, 95), 2),
+            'max_ms': round(max(latencias), 2),
+            'consultas': max(conteos),
+            'estados': sorted(estados),
+        }
+    return resultados
+
+
+def comparar(resultados, base, tolerancia, margen_ms):
+    """Lista de regresiones respecto a la línea base"""
+    regresiones = []
+    for nombre, actual in resultados.items():
+        anterior = base.get(nombre)
+        if not anterior:
+            continue
+        if actual['consultas'] > anterior['consultas']:
+            regresiones.append(f"{nombre}: {anterior['consultas']} → {actual['consultas']} consultas")
+        for metrica in ('p50_ms', 'p95_ms'):
+            limite = anterior[metrica] * (1 + tolerancia) + margen_ms
+            if actual[metrica] > limite:
+                regresiones.append(f"{nombre}: {metrica} {anterior[metrica]} → {actual[metrica]} ms "
+                                   f"(límite {limite:.2f})")
+        if any(e >= 500 for e in actual['estados']) and not any(e >= 500 for e in anterior['estados']):
+            regresiones.append(f"{nombre}: respuestas con error {actual['estados']}")
+    return regresiones
+
+
+def imprimir(resultados, base):
+    print(f"\n{'Endpoint':<52} {'p50 ms':>9} {'p95 ms':>9} {'máx ms':>9} {'consultas':>10}  estado")
+    for nombre, r in resultados.items():
+        anterior = base.get(nombre, {})
+        consultas = str(r['consultas'])
+        if 'consultas' in anterior and anterior['consultas'] != r['consultas']:
+            consultas = f"{anterior['consultas']}→{r['consultas']}"
+        print(f"{nombre[:52]:<52} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['max_ms']:>9.2f} "
+              f"{consultas:>10}  {','.join(map(str, r['estados']))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--calentamiento', type=int, default=2)
+    parser.add_argument('--solo', nargs='+', help='Medir solo estos endpoints (p. ej. admin.reportes)')
+    parser.add_argument('--comparar', default=LINEA_BASE, help='Línea base JSON (por defecto benchmarks/linea_base.json)')
+    parser.add_argument('--guardar', help='Guardar el resultado como nueva línea base en esta ruta')
+    parser.add_argument('--tolerancia', type=float, default=0.5,
+                        help='Aumento relativo de latencia permitido (0.5 = 50%%)')
+    parser.add_argument('--margen-ms', type=float, default=2.0,
+                        help='Margen absoluto para endpoints muy rápidos, donde el ruido domina')
+    for clave, valor in DATASET.items():
+        parser.add_argument(f"--{clave.replace('_', '-')}", type=int, default=valor)
+    args = parser.parse_args()
+
+    dataset = {clave: getattr(args, clave) for clave in DATASET}
+    print(f"⚙️  Generando dataset {dataset}...")
+    with Cronometro() as c:
+        app, usuarios, conteos = preparar(dataset)
+    print(f"   ✅ {sum(conteos.values()):,} filas en {c.segundos:.1f}s "
+          f"({conteos['calificaciones']:,} calificaciones)")
+
+    print(f"⏱️  Midiendo ({args.repeticiones} repeticiones, {args.calentamiento} de calentamiento)...")
+    resultados = medir(app, usuarios, args.repeticiones, args.calentamiento, args.solo)
+
+    base = {}
+    if args.comparar and os.path.exists(args.comparar) and not args.guardar:
+        with open(args.comparar, encoding='utf-8') as f:
+            contenido = json.load(f)
+        if contenido.get('dataset') != dataset:
+            print(f"⚠️  La línea base usa otro dataset ({contenido.get('dataset')}); no se compara")
+        else:
+            base = contenido['endpoints']
+    imprimir(resultados, base)
+
+    if args.guardar:
+        with open(args.guardar, 'w', encoding='utf-8') as f:
+            json.dump({
+                'dataset': dataset,
+                'repeticiones': args.repeticiones,
+                'python': platform.python_version(),
+                'endpoints': resultados,
+            }, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"\n💾 Línea base guardada en {args.guardar}")
+        return 0
+
+    if not base:
+        return 0
+    regresiones = comparar(resultados, base, args.tolerancia, args.margen_ms)
+    if regresiones:
+        print(f"\n❌ {len(regresiones)} regresiones respecto a la línea base:")
+        for regresion in regresiones:
+            print(f"   - {regresion}")
+        return 1
+    print("\n✅ Sin regresiones respecto a la línea base")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark de inicio de sesión: inicios de sesión por segundo con la ruta
+original (consulta + check_password_hash en el hilo de la petición) y con
+el pipeline de autenticacion.autenticar (caché de credenciales, pool de
+verificación y límites por cuenta/IP).
+
+Uso: python benchmarks/bench_login.py [--usuarios 200] [--hilos 16]
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from comun import crear_app_benchmark, Cronometro
+from werkzeug.security import generate_password_hash
+from extensions import db
+from models import Usuario
+from aprovisionamiento import crear_usuarios_masivo
+import autenticacion
+
+PASSWORD = 'estudiante123'
+
+
+def preparar_usuarios(app, cantidad):
+    """Crear `cantidad` estudiantes con la misma contraseña (un solo hash)"""
+    password_hash = generate_password_hash(PASSWORD)
+    usuarios = [{
+        'nombres': f'Estudiante{i}',
+        'apellidos': 'Benchmark',
+        'email': f'estudiante{i}@bench.colegiocolombia.edu.co',
+        'tipo_documento': 'T.I.',
+        'numero_documento': f'9{i:09d}',
+        'role': 'estudiante',
+        'password_hash': password_hash
+    } for i in range(cantidad)]
+    with app.app_context():
+        crear_usuarios_masivo(usuarios)
+    return [u['email'] for u in usuarios]
+
+
+def login_original(app, email, password):
+    """Lógica de main.login antes del pipeline"""
+    with app.app_context():
+        usuario = Usuario.query.filter_by(email=email.strip().lower()).first()
+        ok = bool(usuario and usuario.activo and usuario.check_password(password))
+        db.session.remove()
+        return ok
+
+
+def login_pipeline(app, email, password, ip):
+    with app.app_context():
+        ok = autenticacion.autenticar(email, password, ip=ip).usuario is not None
+        db.session.remove()
+        return ok
+
+
+def medir(nombre, funcion, intentos, hilos):
+    with Cronometro() as c:
+        with ThreadPoolExecutor(max_workers=hilos) as executor:
+            resultados = list(executor.map(lambda args: funcion(*args), intentos))
+    exitosos = sum(resultados)
+    print(f"   {nombre:<42} {len(intentos) / c.segundos:8.1f} intentos/s "
+          f"({exitosos}/{len(intentos)} aceptados, {c.segundos:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--usuarios', type=int, default=200)
+    parser.add_argument('--hilos', type=int, default=16)
+    args = parser.parse_args()
+
+    app = crear_app_benchmark()
+    emails = preparar_usuarios(app, args.usuarios)
+    ips = [f'10.0.{i // 250}.{i % 250}' for i in range(args.hilos)]
+
+    print(f"🔑 BENCHMARK DE LOGIN ({args.usuarios} usuarios, {args.hilos} hilos)")
+    print("\n📈 Hora pico (cada estudiante inicia sesión una vez):")
+    medir('Antes: consulta + hash en el hilo', lambda e, p: login_original(app, e, p),
+          [(e, PASSWORD) for e in emails], args.hilos)
+    medir('Después: pipeline (caché fría)', lambda e, p, ip: login_pipeline(app, e, p, ip),
+          [(e, PASSWORD, ips[i % len(ips)]) for i, e in enumerate(emails)], args.hilos)
+
+    print("\n🚫 Fuerza bruta (contraseña errónea contra una cuenta):")
+    intentos = 100
+    medir('Antes: consulta + hash en el hilo', lambda e, p: login_original(app, e, p),
+          [(emails[0], 'incorrecta')] * intentos, args.hilos)
+    medir('Después: pipeline con límite por cuenta', lambda e, p, ip: login_pipeline(app, e, p, ip),
+          [(emails[1], 'incorrecta', ips[0])] * intentos, args.hilos)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Comparación de SQLite y PostgreSQL sobre los mismos endpoints.
+
+Para cada motor genera el mismo dataset (la carga masiva va por
+dialecto.copiar_desde: COPY en PostgreSQL, executemany en SQLite), mide
+la latencia de cada endpoint de bench_endpoints.py de a una petición y
+luego su rendimiento con varios hilos a la vez, cada uno con su sesión,
+durante unos segundos. Las escrituras concurrentes son donde SQLite se
+queda atrás: sus errores ("database is locked") aparecen como 5xx.
+
+La base de PostgreSQL se borra y se recrea: usar una base de pruebas.
+
+Uso:
+    python benchmarks/bench_motores.py --postgres postgresql+psycopg://colegio@localhost/colegio_bench
+    BENCH_POSTGRES_URL=... python benchmarks/bench_motores.py --hilos 16 --segundos 10
+    python benchmarks/bench_motores.py                      # Solo SQLite (sin --postgres)
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+from comun import Cronometro
+from flask import url_for
+from bench_endpoints import DATASET, endpoints, medir, nombre_caso, preparar
+from aprovisionamiento import CONTRASEÑAS_POR_ROL
+
+
+def rendimiento(app, usuarios, hilos, segundos):
+    """{caso: (peticiones/s, errores)} con `hilos` clientes concurrentes por endpoint"""
+    ids = {rol: uid for rol, (uid, _) in usuarios.items()}
+    # Un inicio de sesión por rol (el límite de intentos por cuenta frenaría uno por hilo);
+    # los hilos comparten la cookie de sesión
+    sesiones = {}
+    for rol, (_, email) in usuarios.items():
+        cliente = app.test_client()
+        respuesta = cliente.post('/login', data={'email': email, 'password': CONTRASEÑAS_POR_ROL[rol]})
+        if respuesta.status_code != 302:
+            raise SystemExit(f'❌ No se pudo iniciar sesión como {rol} ({respuesta.status_code})')
+        sesiones[rol] = cliente.get_cookie('session').value
+
+    resultados = {}
+    for endpoint, rol, metodo, argumentos, datos in endpoints(ids):
+        with app.test_request_context():
+            url = url_for(endpoint, **argumentos)
+        clientes = []
+        for _ in range(hilos):
+            cliente = app.test_client()
+            cliente.set_cookie('session', sesiones[rol])
+            clientes.append(cliente)
+
+        conteos = [[0, 0] for _ in clientes]  # [peticiones, errores] por hilo
+        fin = time.perf_counter() + segundos
+
+        def trabajar(i):
+            while time.perf_counter() < fin:
+                try:
+                    respuesta = clientes[i].open(url, method=metodo, data=datos)
+                    respuesta.get_data()
+                    error = respuesta.status_code >= 500
+                except Exception:
+                    error = True
+                conteos[i][0] += 1
+                conteos[i][1] += error
+
+        hebras = [threading.Thread(target=trabajar, args=(i,)) for i in range(hilos)]
+        for hebra in hebras:
+            hebra.start()
+        for hebra in hebras:
+            hebra.join()
+        peticiones = sum(c[0] for c in conteos)
+        resultados[nombre_caso(endpoint, metodo, argumentos)] = (peticiones / segundos, sum(c[1] for c in conteos))
+    return resultados
+
+
+def medir_motor(nombre, database_url, dataset, args):
+    print(f"\n🗄️  {nombre}: generando dataset...")
+    with Cronometro() as c:
+        app, usuarios, conteos = preparar(dataset, database_url)
+    filas = sum(conteos.values())
+    print(f"   ✅ {filas:,} filas en {c.segundos:.1f}s ({filas / c.segundos:,.0f} filas/s)")
+    print(f"⏱️  {nombre}: latencia ({args.repeticiones} repeticiones) y rendimiento "
+          f"({args.hilos} hilos, {args.segundos}s por endpoint)...")
+    latencias = medir(app, usuarios, args.repeticiones, args.calentamiento)
+    concurrencia = rendimiento(app, usuarios, args.hilos, args.segundos)
+    return {'carga_filas_s': filas / c.segundos, 'latencias': latencias, 'rendimiento': concurrencia}
+
+
+def imprimir(resultados):
+    motores = list(resultados)
+    print(f"\n{'Carga masiva (filas/s)':<52}" + ''.join(f"{m:>22}" for m in motores))
+    print(f"{'':<52}" + ''.join(f"{resultados[m]['carga_filas_s']:>22,.0f}" for m in motores))
+    print(f"\n{'Endpoint':<52}" + ''.join(f"{m + ' p50 ms':>22}{m + ' req/s':>22}" for m in motores))
+    for caso in resultados[motores[0]]['latencias']:
+        linea = f"{caso[:52]:<52}"
+        for m in motores:
+            p50 = resultados[m]['latencias'][caso]['p50_ms']
+            req_s, errores = resultados[m]['rendimiento'][caso]
+            linea += f"{p50:>22.2f}{req_s:>16.1f}" + (f" ({errores}❌)" if errores else f"{'':>6}")
+        print(linea)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--postgres', default=os.environ.get('BENCH_POSTGRES_URL'),
+                        help='URL de una base PostgreSQL de pruebas (se borra); por defecto BENCH_POSTGRES_URL')
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--calentamiento', type=int, default=2)
+    parser.add_argument('--hilos', type=int, default=8, help='Clientes concurrentes por endpoint')
+    parser.add_argument('--segundos', type=float, default=5, help='Duración de la prueba concurrente por endpoint')
+    for clave, valor in DATASET.items():
+        parser.add_argument(f"--{clave.replace('_', '-')}", type=int, default=valor)
+    args = parser.parse_args()
+
+    dataset = {clave: getattr(args, clave) for clave in DATASET}
+    motores = {'SQLite': None}
+    if args.postgres:
+        motores['PostgreSQL'] = args.postgres
+    else:
+        print("⚠️  Sin --postgres ni BENCH_POSTGRES_URL: solo se mide SQLite")
+
+    resultados = {nombre: medir_motor(nombre, url, dataset, args) for nombre, url in motores.items()}
+    imprimir(resultados)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
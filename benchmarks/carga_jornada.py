@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga: una jornada escolar comprimida contra un servidor local.
+
+Levanta la aplicación sobre un dataset determinista (generar_datos) en un
+servidor HTTP con un número fijo de hilos (como los workers/hilos de
+gunicorn) y reproduce las fases de un día con usuarios virtuales
+concurrentes que siguen recorridos por rol:
+
+  1. Llegada (7:00)    estudiantes, profesores y administrativos inician sesión y abren su panel
+  2. Clases            consulta del horario cada 30 s, tareas y horario; los administrativos
+                       abren reportes, buscan estudiantes y su perfil, horarios y ausencias
+  3. Entregas          los estudiantes entregan justo antes de la fecha límite
+  4. Calificación      los profesores revisan entregas y califican
+
+Los tiempos de espera reales se multiplican por --escala (0.01: un minuto
+simulado dura 0.6 s). Al final se informa, por fase y por ruta, el
+rendimiento (peticiones/s), la tasa de error y la latencia de cola.
+
+Uso:
+    python benchmarks/carga_jornada.py --estudiantes 300 --profesores 14 --administrativos 4 \
+        --trabajadores 64 --hilos-servidor 8
+"""
+
+import argparse
+import http.client
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from comun import crear_app_benchmark, percentil
+from werkzeug.serving import BaseWSGIServer
+from extensions import db
+from models import Usuario, Curso, Asignatura, Tarea, Calificacion, usuario_curso
+from generar_datos import GeneradorDatos
+from aprovisionamiento import CONTRASEÑAS_POR_ROL
+
+
+class ServidorLocal(BaseWSGIServer):
+    """Servidor WSGI con un pool fijo de hilos, para dimensionar workers como en producción"""
+
+    request_queue_size = 1024
+
+    def __init__(self, app, hilos):
+        super().__init__('127.0.0.1', 0, app)
+        self.pool = ThreadPoolExecutor(max_workers=hilos)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._atender, request, client_address)
+
+    def _atender(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class Metricas:
+    """Latencias y errores por (fase, ruta), seguras entre hilos"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(int)
+        self.duracion_fase = {}
+
+    def registrar(self, fase, ruta, segundos, ok):
+        with self._lock:
+            self.latencias[(fase, ruta)].append(segundos * 1000)
+            if not ok:
+                self.errores[(fase, ruta)] += 1
+
+
+class Navegador:
+    """Cliente HTTP mínimo de un usuario virtual (mantiene la cookie de sesión)"""
+
+    def __init__(self, puerto, metricas):
+        self.puerto = puerto
+        self.metricas = metricas
+        self.cookies = {}
+        self.fase = None
+
+    def pedir(self, ruta, url, metodo='GET', datos=None, archivo=None, esperado=(200, 302)):
+        headers = {}
+        cuerpo = None
+        if archivo:
+            cuerpo, tipo = self._multipart(datos or {}, archivo)
+            headers['Content-Type'] = tipo
+        elif datos is not None:
+            cuerpo = urlencode(datos).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+
+        inicio = time.perf_counter()
+        try:
+            conexion = http.client.HTTPConnection('127.0.0.1', self.puerto, timeout=60)
+            conexion.request(metodo, url, body=cuerpo, headers=headers)
+            respuesta = conexion.getresponse()
+            respuesta.read()
+            conexion.close()
+            ok = respuesta.status in esperado
+        except (OSError, http.client.HTTPException):
+            respuesta, ok = None, False
+        self.metricas.registrar(self.fase, ruta, time.perf_counter() - inicio, ok)
+
+        if respuesta is not None:
+            for cabecera in respuesta.headers.get_all('Set-Cookie') or []:
+                for nombre, morsel in SimpleCookie(cabecera).items():
+                    self.cookies[nombre] = morsel.value
+        return ok
+
+    @staticmethod
+    def _multipart(campos, archivo):
+        campo, nombre, contenido = archivo
+        limite = uuid.uuid4().hex
+        partes = [f'--{limite}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode()
+                  for k, v in campos.items()]
+        partes.append(f'--{limite}\r\nContent-Disposition: form-data; name="{campo}"; filename="{nombre}"\r\n'
+                      f'Content-Type: application/octet-stream\r\n\r\n'.encode() + contenido + b'\r\n')
+        partes.append(f'--{limite}--\r\n'.encode())
+        return b''.join(partes), f'multipart/form-data; boundary={limite}'
+
+
+# --- Recorridos por rol ---
+
+def iniciar_sesion(nav, usuario):
+    return nav.pedir('main.login', '/login', 'POST',
+                     {'email': usuario['email'], 'password': CONTRASEÑAS_POR_ROL[usuario['role']]},
+                     esperado=(302,))
+
+
+def llegada(nav, usuario, rng, escala):
+    time.sleep(rng.uniform(0, 15 * 60) * escala)  # Todos llegan entre 7:00 y 7:15
+    if not iniciar_sesion(nav, usuario):
+        return
+    nav.pedir(f"{usuario['role']}.dashboard", f"/{usuario['role']}/dashboard")
+    nav.pedir('horario.api_estado_actual', '/horario/api/estado_actual')
+
+
+def clases(nav, usuario, rng, escala, minutos=10):
+    if usuario['role'] == 'admin':
+        return administracion(nav, usuario, rng, escala)
+    time.sleep(rng.uniform(0, 30) * escala)
+    for minuto in range(minutos * 2):  # Sondeo cada 30 s
+        nav.pedir('horario.api_estado_actual', '/horario/api/estado_actual')
+        if minuto % 6 == 0:
+            if usuario['role'] == 'estudiante':
+                nav.pedir('estudiante.tareas', '/estudiante/tareas')
+            else:
+                nav.pedir('profesor.horario', '/profesor/horario')
+        time.sleep(30 * escala)
+
+
+def administracion(nav, usuario, rng, escala, consultas=4):
+    """Secretaría y coordinación durante las clases: reportes, fichas de estudiantes, horarios y ausencias"""
+    time.sleep(rng.uniform(0, 10 * 60) * escala)
+    nav.pedir('admin.reportes', '/admin/reportes')
+    for _ in range(consultas):
+        estudiante_id, documento = rng.choice(usuario['estudiantes'])
+        nav.pedir('admin.buscar_estudiantes', '/admin/estudiantes/buscar?' + urlencode({'busqueda': documento}))
+        nav.pedir('admin.perfil_estudiante', f'/admin/estudiantes/{estudiante_id}/perfil')
+        time.sleep(rng.uniform(60, 180) * escala)
+    nav.pedir('admin.horarios', '/admin/horarios')
+    nav.pedir('admin.reportar_ausencia', '/admin/reportar-ausencia')
+
+
+def entregas(nav, usuario, rng, escala):
+    if not usuario.get('tarea_id'):
+        return
+    # Pico antes de la fecha límite: la mayoría entrega en los últimos minutos de una ventana de 20
+    time.sleep(rng.triangular(0, 20 * 60, 20 * 60) * escala)
+    url = f"/estudiante/tarea/{usuario['tarea_id']}/entregar"
+    nav.pedir('estudiante.entregar_tarea', url)
+    nav.pedir('estudiante.entregar_tarea [POST]', url, 'POST', {'comentarios': 'Entrega de prueba'},
+              archivo=('archivo_entrega', 'entrega.pdf', rng.randbytes(rng.randint(20, 400) * 1024)),
+              esperado=(302,))
+
+
+def calificacion(nav, usuario, rng, escala, por_profesor=10):
+    time.sleep(rng.uniform(0, 60 * 60) * escala)  # A lo largo de la tarde
+    nav.pedir('profesor.tareas', '/profesor/tareas')
+    tarea_id = usuario.get('tarea_id')
+    if not tarea_id:
+        return
+    nav.pedir('profesor.calificar_tarea', f'/profesor/tarea/{tarea_id}/calificar')
+    for estudiante_id in usuario['estudiantes'][:por_profesor]:
+        url = f'/profesor/calificacion/{tarea_id}/{estudiante_id}'
+        nav.pedir('profesor.calificacion_individual', url)
+        time.sleep(rng.uniform(20, 90) * escala)
+        nav.pedir('profesor.calificacion_individual [POST]', url, 'POST',
+                  {'nota': f'{rng.uniform(2.0, 5.0):.1f}', 'comentarios': '', 'periodo': 'Segundo Periodo'},
+                  esperado=(302,))
+
+
+FASES = [
+    ('1. Llegada (7:00)', llegada, ('estudiante', 'profesor', 'admin')),
+    ('2. Clases', clases, ('estudiante', 'profesor', 'admin')),
+    ('3. Entregas', entregas, ('estudiante',)),
+    ('4. Calificación', calificacion, ('profesor',)),
+]
+
+
+def preparar(args):
+    """Dataset, usuarios virtuales y la tarea que cada uno entrega o califica"""
+    app = crear_app_benchmark(
+        # Todos los usuarios virtuales salen por 127.0.0.1: el límite por IP no aplica aquí
+        LOGIN_LIMITE_IP=(10 ** 6, 10 ** 6),
+    )
+    with app.app_context():
+        generador = GeneradorDatos(semilla=args.semilla, cursos=args.cursos,
+                                   estudiantes_por_curso=args.estudiantes_por_curso, profesores=args.profesores)
+        with db.engine.begin() as conexion:
+            generador.generar(conexion)
+
+        estudiantes = db.session.query(Usuario.id, Usuario.email, Usuario.role, usuario_curso.c.curso_id,
+                                       Usuario.numero_documento).join(
+            usuario_curso).join(Curso).filter(Usuario.role == 'estudiante', Curso.activo == True).order_by(
+            Usuario.id).limit(args.estudiantes).all()
+        profesores = Usuario.query.filter_by(role='profesor').order_by(Usuario.id).all()
+        administrador = Usuario.query.filter_by(role='admin').order_by(Usuario.id).first()
+
+        # Tareas del curso que aún no tienen calificaciones (posteriores a la fecha de referencia)
+        pendientes = db.session.query(Tarea.id, Asignatura.curso_id, Tarea.profesor_id).join(Asignatura).outerjoin(
+            Calificacion).filter(Tarea.activa == True, Calificacion.id.is_(None)).order_by(Tarea.id).all()
+        tarea_por_curso, profesor_de_tarea = {}, {}
+        for tarea_id, curso_id, profesor_id in pendientes:
+            tarea_por_curso.setdefault(curso_id, tarea_id)
+            profesor_de_tarea[tarea_id] = profesor_id
+
+        alumnos = [{'id': uid, 'email': email, 'role': role, 'tarea_id': tarea_por_curso.get(curso_id)}
+                   for uid, email, role, curso_id, _ in estudiantes]
+        # Cada profesor califica una de las tareas que entregan los estudiantes virtuales
+        tarea_del_profesor = {}
+        for alumno in alumnos:
+            if alumno['tarea_id']:
+                tarea_del_profesor.setdefault(profesor_de_tarea[alumno['tarea_id']], alumno['tarea_id'])
+        docentes = [{
+            'id': profesor.id, 'email': profesor.email, 'role': 'profesor',
+            'tarea_id': tarea_del_profesor.get(profesor.id),
+            'estudiantes': [a['id'] for a in alumnos
+                            if a['tarea_id'] and a['tarea_id'] == tarea_del_profesor.get(profesor.id)]
+        } for profesor in profesores]
+        # El dataset tiene una cuenta de administrador: cada administrativo abre su propia sesión con ella
+        fichas = [(uid, documento) for uid, _, _, _, documento in estudiantes]
+        administrativos = [{
+            'id': f'admin:{i}', 'email': administrador.email, 'role': 'admin', 'estudiantes': fichas
+        } for i in range(args.administrativos)]
+    return app, alumnos + docentes + administrativos
+
+
+def informe(metricas):
+    print(f"\n{'Fase / ruta':<46} {'pet.':>6} {'pet/s':>8} {'error':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'máx ms':>8}")
+    for fase, _, _ in FASES:
+        claves = sorted(k for k in metricas.latencias if k[0] == fase)
+        if not claves:
+            continue
+        duracion = metricas.duracion_fase[fase]
+        todas = [l for k in claves for l in metricas.latencias[k]]
+        errores = sum(metricas.errores[k] for k in claves)
+        print(f"\n{fase:<46} {len(todas):>6} {len(todas) / duracion:>8.1f} {100 * errores / len(todas):>6.1f}% "
+              f"{percentil(todas, 50):>8.1f} {percentil(todas, 95):>8.1f} {percentil(todas, 99):>8.1f} {max(todas):>8.1f}")
+        for clave in claves:
+            latencias = metricas.latencias[clave]
+            print(f"  {clave[1][:44]:<44} {len(latencias):>6} {len(latencias) / duracion:>8.1f} "
+                  f"{100 * metricas.errores[clave] / len(latencias):>6.1f}% {percentil(latencias, 50):>8.1f} "
+                  f"{percentil(latencias, 95):>8.1f} {percentil(latencias, 99):>8.1f} {max(latencias):>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--estudiantes', type=int, default=300, help='Estudiantes virtuales')
+    parser.add_argument('--administrativos', type=int, default=4,
+                        help='Administrativos virtuales (secretaría, coordinación) en la jornada')
+    parser.add_argument('--trabajadores', type=int, default=64, help='Usuarios virtuales concurrentes')
+    parser.add_argument('--hilos-servidor', type=int, default=8, help='Hilos del servidor (workers x hilos)')
+    parser.add_argument('--escala', type=float, default=0.01, help='Segundos reales por segundo simulado')
+    parser.add_argument('--fases', nargs='+', type=int, help='Ejecutar solo estas fases (1-4)')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--cursos', type=int, default=12)
+    parser.add_argument('--estudiantes-por-curso', type=int, default=30)
+    parser.add_argument('--profesores', type=int, default=14)
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # Sin una línea de log por petición
+    print("⚙️  Preparando dataset...")
+    app, usuarios = preparar(args)
+    servidor = ServidorLocal(app, args.hilos_servidor)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    puerto = servidor.server_address[1]
+    print(f"🚀 Servidor en 127.0.0.1:{puerto} ({args.hilos_servidor} hilos), "
+          f"{len(usuarios)} usuarios virtuales, {args.trabajadores} concurrentes")
+
+    metricas = Metricas()
+    navegadores = {u['id']: Navegador(puerto, metricas) for u in usuarios}
+    # Las fases 2-4 necesitan sesión iniciada aunque se omita la llegada
+    fases = [f for i, f in enumerate(FASES, 1) if not args.fases or i in args.fases or i == 1]
+
+    try:
+        for fase, recorrido, roles in fases:
+            participantes = [u for u in usuarios if u['role'] in roles]
+            print(f"   ▶️  {fase}: {len(participantes)} usuarios")
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.trabajadores) as executor:
+                futuros = []
+                for usuario in participantes:
+                    nav = navegadores[usuario['id']]
+                    nav.fase = fase
+                    rng = random.Random(f"{args.semilla}:{fase}:{usuario['id']}")
+                    futuros.append(executor.submit(recorrido, nav, usuario, rng, args.escala))
+            metricas.duracion_fase[fase] = time.perf_counter() - inicio
+            for futuro in futuros:
+                futuro.result()  # Propagar fallos del propio recorrido (no de la aplicación)
+    finally:
+        servidor.shutdown()
+
+    informe(metricas)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# benchmarks/comun.py - Utilidades compartidas por los benchmarks
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from extensions import db
+
+
+def crear_app_benchmark(database_url=None, **config):
+    """Crear la aplicación sobre una base de datos temporal (o la indicada)"""
+    directorio = tempfile.mkdtemp(prefix='colegio_bench_')
+    if database_url is None:
+        database_url = 'sqlite:///' + os.path.join(directorio, 'benchmark.db')
+
+    opciones = {
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'UPLOAD_FOLDER': os.path.join(directorio, 'uploads'),
+        'WTF_CSRF_ENABLED': False,
+        'TESTING': True,
+    }
+    opciones.update(config)
+    app = create_app(opciones)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) por interpolación lineal"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p / 100
+    inferior = int(k)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (k - inferior)
+
+
+class Cronometro:
+    """Medir un bloque con `with Cronometro() as c:` y leer `c.segundos`"""
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.segundos = time.perf_counter() - self.inicio
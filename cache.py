@@ -0,0 +1,73 @@
+# cache.py - Caché en memoria compartida por los módulos de la aplicación
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """Caché LRU con expiración por tiempo (TTL), segura entre hilos.
+
+    Cada proceso (worker) tiene su propia instancia; las invalidaciones
+    explícitas sólo afectan al proceso actual y el TTL acota el tiempo
+    que un dato puede quedar desactualizado en los demás.
+
+    Con `max_bytes` también se limita la memoria: cada valor pesa lo que
+    devuelve `medir(valor)` y se desalojan los menos usados hasta caber.
+    """
+
+    def __init__(self, max_elementos=1024, ttl=300, max_bytes=None, medir=len):
+        self.max_elementos = max_elementos
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._medir = medir
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+
+    def get(self, clave, default=None):
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return default
+            valor, expira, tamaño = entrada
+            if expira < ahora:
+                del self._datos[clave]
+                self.bytes -= tamaño
+                self.fallos += 1
+                return default
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def set(self, clave, valor, ttl=None):
+        expira = time.monotonic() + (self.ttl if ttl is None else ttl)
+        tamaño = self._medir(valor) if self.max_bytes else 0
+        if self.max_bytes and tamaño > self.max_bytes:
+            return  # Nunca cabría: no desalojar todo lo demás por él
+        with self._lock:
+            anterior = self._datos.pop(clave, None)
+            if anterior:
+                self.bytes -= anterior[2]
+            self._datos[clave] = (valor, expira, tamaño)
+            self.bytes += tamaño
+            while len(self._datos) > self.max_elementos or (self.max_bytes and self.bytes > self.max_bytes):
+                _, (_, _, liberado) = self._datos.popitem(last=False)
+                self.bytes -= liberado
+
+    def invalidar(self, clave):
+        with self._lock:
+            entrada = self._datos.pop(clave, None)
+            if entrada:
+                self.bytes -= entrada[2]
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._datos)
@@ -0,0 +1,174 @@
+# cargas.py - Subida de archivos por bloques, reanudable (entregas de estudiantes)
+import hashlib
+import os
+import secrets
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from extensions import db
+from models import SesionCarga, BloqueCarga
+import almacenamiento
+
+
+class ErrorCarga(Exception):
+    """Error del protocolo de carga; `status` es el código HTTP a devolver"""
+
+    def __init__(self, mensaje, status=400):
+        super().__init__(mensaje)
+        self.mensaje = mensaje
+        self.status = status
+
+
+def _ruta_parcial(sesion_id):
+    directorio = os.path.join(current_app.config['UPLOAD_FOLDER'], 'cargas')
+    os.makedirs(directorio, exist_ok=True)
+    return os.path.join(directorio, f'{sesion_id}.part')
+
+
+def crear_sesion(estudiante_id, tarea_id, nombre, tamaño, sha256=None):
+    """Abrir una sesión de carga y reservar el archivo de destino.
+
+    Cada estudiante tiene a lo sumo una sesión abierta por tarea: si ya hay
+    una para el mismo archivo se devuelve esa (el cliente reanuda), y si es
+    de otro archivo se descarta. Las sesiones abiertas de un estudiante no
+    pueden sumar más de CARGA_PENDIENTE_MAXIMO bytes reservados en disco.
+    """
+    extension = nombre.rsplit('.', 1)[-1].lower() if '.' in nombre else ''
+    if extension not in current_app.config['ALLOWED_EXTENSIONS']:
+        raise ErrorCarga('Solo se permiten archivos PDF, DOCX, DOC y TXT')
+    if tamaño <= 0 or tamaño > current_app.config['CARGA_TAMAÑO_MAXIMO']:
+        raise ErrorCarga('El tamaño del archivo no es válido', 413)
+    sha256 = sha256.lower() if sha256 else None
+
+    limpiar_sesiones_vencidas()
+
+    for anterior in SesionCarga.query.filter_by(estudiante_id=estudiante_id, tarea_id=tarea_id).all():
+        if (anterior.nombre, anterior.tamaño, anterior.sha256) == (nombre[:200], tamaño, sha256):
+            return anterior
+        _eliminar_sesion(anterior.id)
+    pendiente = db.session.query(func.coalesce(func.sum(SesionCarga.tamaño), 0)).filter(
+        SesionCarga.estudiante_id == estudiante_id).scalar()
+    if pendiente + tamaño > current_app.config['CARGA_PENDIENTE_MAXIMO']:
+        db.session.commit()
+        raise ErrorCarga('Tienes demasiadas cargas sin terminar: complétalas o espera a que venzan', 413)
+
+    sesion = SesionCarga(
+        id=secrets.token_hex(16),
+        estudiante_id=estudiante_id,
+        tarea_id=tarea_id,
+        nombre=nombre[:200],
+        tamaño=tamaño,
+        tamaño_bloque=current_app.config['CARGA_TAMAÑO_BLOQUE'],
+        sha256=sha256
+    )
+    # El archivo final se crea con su tamaño definitivo; cada bloque se escribe en su posición
+    with open(_ruta_parcial(sesion.id), 'wb') as destino:
+        destino.truncate(tamaño)
+
+    db.session.add(sesion)
+    db.session.commit()
+    return sesion
+
+
+def bloques_recibidos(sesion):
+    return [fila[0] for fila in db.session.query(BloqueCarga.indice).filter_by(
+        sesion_id=sesion.id).order_by(BloqueCarga.indice).all()]
+
+
+def estado(sesion):
+    recibidos = set(bloques_recibidos(sesion))
+    return {
+        'id': sesion.id,
+        'nombre': sesion.nombre,
+        'tamaño': sesion.tamaño,
+        'tamaño_bloque': sesion.tamaño_bloque,
+        'total_bloques': sesion.total_bloques,
+        'recibidos': sorted(recibidos),
+        'faltantes': [i for i in range(sesion.total_bloques) if i not in recibidos]
+    }
+
+
+def recibir_bloque(sesion, indice, datos, sha256=None):
+    """Verificar y escribir un bloque en su posición del archivo final.
+
+    Repetir un bloque ya recibido es inofensivo, así que el cliente puede
+    reintentar sin consultar antes el estado. El checksum del bloque es
+    obligatorio.
+    """
+    if not sha256:
+        raise ErrorCarga('Falta el checksum del bloque (cabecera X-Chunk-SHA256)')
+    if indice < 0 or indice >= sesion.total_bloques:
+        raise ErrorCarga('Índice de bloque fuera de rango')
+
+    esperado = min(sesion.tamaño_bloque, sesion.tamaño - indice * sesion.tamaño_bloque)
+    if len(datos) != esperado:
+        raise ErrorCarga(f'El bloque {indice} debe tener {esperado} bytes')
+
+    digest = hashlib.sha256(datos).hexdigest()
+    if sha256.lower() != digest:
+        raise ErrorCarga(f'Checksum incorrecto en el bloque {indice}', 422)
+
+    with open(_ruta_parcial(sesion.id), 'r+b') as destino:
+        destino.seek(indice * sesion.tamaño_bloque)
+        destino.write(datos)
+        destino.flush()
+        os.fsync(destino.fileno())
+
+    if not db.session.get(BloqueCarga, (sesion.id, indice)):
+        db.session.add(BloqueCarga(sesion_id=sesion.id, indice=indice, sha256=digest))
+    sesion.fecha_actualizacion = datetime.utcnow()
+    db.session.commit()
+
+
+def completar(sesion):
+    """Mover el archivo ensamblado al almacenamiento por contenido y devolver su clave.
+
+    Si no coincide con el checksum declarado, la sesión se descarta: no se
+    sabe qué bloque está mal y el cliente tiene que empezar de nuevo.
+    """
+    faltantes = estado(sesion)['faltantes']
+    if faltantes:
+        raise ErrorCarga(f'Faltan {len(faltantes)} bloques por subir', 409)
+
+    ruta = _ruta_parcial(sesion.id)
+    try:
+        huella = almacenamiento.hash_archivo(ruta)
+    except FileNotFoundError:
+        # Otra petición completó (o descartó) la misma sesión
+        raise ErrorCarga('La carga ya no está disponible', 409)
+    if sesion.sha256 and huella[0] != sesion.sha256:
+        _eliminar_sesion(sesion.id)
+        db.session.commit()
+        raise ErrorCarga('El archivo completo no coincide con el checksum declarado; vuelve a subirlo', 422)
+
+    clave = almacenamiento.guardar_ruta(ruta, sesion.nombre, huella)
+    BloqueCarga.query.filter_by(sesion_id=sesion.id).delete()
+    db.session.delete(sesion)
+    return clave
+
+
+def _eliminar_sesion(sesion_id):
+    """Borrar el archivo parcial y los registros de una sesión (el commit queda a cargo de quien llama)"""
+    try:
+        os.unlink(_ruta_parcial(sesion_id))
+    except FileNotFoundError:
+        pass
+    BloqueCarga.query.filter_by(sesion_id=sesion_id).delete(synchronize_session=False)
+    SesionCarga.query.filter_by(id=sesion_id).delete(synchronize_session=False)
+
+
+def limpiar_sesiones_vencidas():
+    """Eliminar sesiones abandonadas y sus archivos parciales"""
+    limite = datetime.utcnow() - timedelta(hours=current_app.config['CARGA_HORAS_VIGENCIA'])
+    vencidas = [s.id for s in SesionCarga.query.filter(SesionCarga.fecha_actualizacion < limite).all()]
+    if not vencidas:
+        return 0
+    for sesion_id in vencidas:
+        try:
+            os.unlink(_ruta_parcial(sesion_id))
+        except FileNotFoundError:
+            pass
+    BloqueCarga.query.filter(BloqueCarga.sesion_id.in_(vencidas)).delete(synchronize_session=False)
+    SesionCarga.query.filter(SesionCarga.id.in_(vencidas)).delete(synchronize_session=False)
+    db.session.commit()
+    return len(vencidas)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Contadores de entregas y calificaciones guardados en cada Tarea.
+
+Las vistas de entrega y calificación los ajustan con un UPDATE atómico
+(`total = total + 1`) en la misma transacción que la escritura, así las
+listas del profesor muestran el avance sin consultas agregadas por tarea.
+reconciliar() los recalcula desde las tablas de origen; sirve para
+corregir desvíos (ediciones concurrentes, cargas masivas, cambios de
+matrícula) y se puede programar como tarea periódica:
+
+    python contadores.py              # Todas las tareas
+    python contadores.py --activas    # Solo las tareas activas
+"""
+
+import argparse
+import sys
+
+from sqlalchemy import case, func, select, update
+
+from models import Usuario, Asignatura, Tarea, Calificacion, usuario_curso
+
+_tarea = Tarea.__table__
+_calificacion = Calificacion.__table__
+
+
+def _sumar(sesion, tarea_id, **incrementos):
+    """UPDATE atómico de los contadores indicados (sin leer el valor actual)"""
+    valores = {nombre: getattr(_tarea.c, nombre) + cantidad for nombre, cantidad in incrementos.items()}
+    sesion.execute(update(_tarea).where(_tarea.c.id == tarea_id).values(**valores))
+
+
+def registrar_entrega(sesion, tarea_id):
+    _sumar(sesion, tarea_id, total_entregas=1)
+
+
+def registrar_calificacion(sesion, tarea_id, cantidad=1):
+    """cantidad=-1 si una nota positiva vuelve a 0 (entrega sin calificar)"""
+    _sumar(sesion, tarea_id, total_calificadas=cantidad)
+
+
+def estudiantes_esperados(asignatura_id):
+    """Subconsulta: estudiantes matriculados en el curso de la asignatura"""
+    return select(func.count()).select_from(
+        usuario_curso.join(Usuario.__table__, Usuario.id == usuario_curso.c.usuario_id)
+        .join(Asignatura.__table__, Asignatura.curso_id == usuario_curso.c.curso_id)
+    ).where(Asignatura.id == asignatura_id, Usuario.role == 'estudiante').scalar_subquery()
+
+
+def reconciliar(conexion, tarea_ids=None, solo_activas=False):
+    """Recalcular los tres contadores; devuelve las tareas actualizadas.
+
+    Los totales salen de un GROUP BY por tarea (y por asignatura para los
+    estudiantes) que se cruza con tarea en un UPDATE ... FROM: cada tabla
+    se recorre una vez, sin una subconsulta por tarea. Las tareas que no
+    aparecen en los agregados quedan en cero por el primer UPDATE.
+    """
+    filtros = []
+    if tarea_ids is not None:
+        filtros.append(_tarea.c.id.in_(list(tarea_ids)))
+    if solo_activas:
+        filtros.append(_tarea.c.activa == True)
+
+    total = conexion.execute(update(_tarea).where(*filtros).values(
+        total_entregas=0, total_calificadas=0, total_estudiantes=0)).rowcount
+
+    calificaciones = select(
+        _calificacion.c.tarea_id,
+        func.count(_calificacion.c.archivo_entrega).label('entregas'),
+        func.count(case((_calificacion.c.nota > 0, 1))).label('calificadas'),
+    ).group_by(_calificacion.c.tarea_id)
+    if tarea_ids is not None:
+        calificaciones = calificaciones.where(_calificacion.c.tarea_id.in_(list(tarea_ids)))
+    calificaciones = calificaciones.subquery()
+    conexion.execute(update(_tarea).where(_tarea.c.id == calificaciones.c.tarea_id, *filtros).values(
+        total_entregas=calificaciones.c.entregas, total_calificadas=calificaciones.c.calificadas))
+
+    estudiantes = select(Asignatura.id.label('asignatura_id'), func.count().label('total')).select_from(
+        usuario_curso.join(Usuario.__table__, Usuario.id == usuario_curso.c.usuario_id)
+        .join(Asignatura.__table__, Asignatura.curso_id == usuario_curso.c.curso_id)
+    ).where(Usuario.role == 'estudiante').group_by(Asignatura.id).subquery()
+    conexion.execute(update(_tarea).where(_tarea.c.asignatura_id == estudiantes.c.asignatura_id, *filtros).values(
+        total_estudiantes=estudiantes.c.total))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--activas', action='store_true', help='Reconciliar solo las tareas activas')
+    args = parser.parse_args()
+
+    from app import create_app
+    from extensions import db
+    app = create_app()
+    with app.app_context():
+        with db.engine.begin() as conexion:
+            total = reconciliar(conexion, solo_activas=args.activas)
+    print(f"✅ Contadores recalculados en {total:,} tareas")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+Diferencias entre motores de base de datos (SQLite y PostgreSQL) en un
+solo lugar.
+
+El resto del código escribe SQL de SQLAlchemy portable y usa este módulo
+para lo que cada motor resuelve a su manera:
+
+- mes(columna): agrupar fechas por mes ('AAAA-MM');
+- upsert(): INSERT ... ON CONFLICT, con la construcción de cada dialecto;
+- copiar_desde() / copiar_a(): carga y exportación masivas; en PostgreSQL
+  van por COPY (un solo flujo, sin una sentencia por fila) y en SQLite
+  por executemany y un cursor;
+- ajustar_secuencias(): tras insertar ids explícitos, PostgreSQL necesita
+  mover sus secuencias;
+- tamaño_base(): tamaño de la base en bytes.
+"""
+
+import csv
+import importlib
+import io
+from itertools import islice
+
+from sqlalchemy import String, func, select, text
+from sqlalchemy.exc import CompileError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+TAMAÑO_BLOQUE = 50000
+
+# Dialectos con INSERT ... ON CONFLICT; se importan al usarlos (el de PostgreSQL tarda en
+# cargar y alargaría el arranque de cada worker que usa SQLite)
+_CON_UPSERT = {'sqlite', 'postgresql'}
+
+
+def es_postgresql(conexion):
+    return conexion.dialect.name == 'postgresql'
+
+
+class mes(FunctionElement):
+    """'AAAA-MM' de una fecha u hora, para agrupar por mes"""
+    type = String()
+    name = 'mes'
+    inherit_cache = True
+
+
+@compiles(mes)
+def _mes_generico(elemento, compilador, **kw):
+    return f"SUBSTRING(CAST({compilador.process(elemento.clauses, **kw)} AS VARCHAR(32)) FROM 1 FOR 7)"
+
+
+@compiles(mes, 'sqlite')
+def _mes_sqlite(elemento, compilador, **kw):
+    return f"strftime('%Y-%m', {compilador.process(elemento.clauses, **kw)})"
+
+
+@compiles(mes, 'postgresql')
+def _mes_postgresql(elemento, compilador, **kw):
+    return f"to_char({compilador.process(elemento.clauses, **kw)}, 'YYYY-MM')"
+
+
+def upsert(conexion, tabla, filas, claves, actualizar=None):
+    """INSERT de `filas`; si ya hay una fila con las mismas `claves`, aplicar `actualizar`.
+
+    `actualizar` es {columna: expresión} (las expresiones sobre `tabla`
+    leen la fila existente) o None para dejar la fila existente como está.
+    Devuelve las filas afectadas.
+    """
+    if not filas:
+        return 0
+    if conexion.dialect.name not in _CON_UPSERT:
+        raise NotImplementedError(f'upsert no está disponible para {conexion.dialect.name}')
+    sentencia = importlib.import_module(f'sqlalchemy.dialects.{conexion.dialect.name}').insert(tabla)
+    if actualizar:
+        sentencia = sentencia.on_conflict_do_update(index_elements=claves, set_=actualizar)
+    else:
+        sentencia = sentencia.on_conflict_do_nothing(index_elements=claves)
+    return conexion.execute(sentencia, filas).rowcount
+
+
+def _valor_copy(valor):
+    """Valor de una fila en el CSV que recibe COPY (vacío sin comillas = NULL)"""
+    if valor is None:
+        return None
+    if isinstance(valor, bool):
+        return 't' if valor else 'f'
+    if isinstance(valor, (bytes, bytearray, memoryview)):
+        return '\\x' + bytes(valor).hex()
+    return valor
+
+
+def _copy_postgresql(conexion, sql, entrada=None, salida=None):
+    """COPY con el driver en uso (psycopg 3 o psycopg2)"""
+    cursor = conexion.connection.cursor()
+    try:
+        if conexion.dialect.driver == 'psycopg':
+            with cursor.copy(sql) as copia:
+                if entrada is not None:
+                    copia.write(entrada.getvalue())
+                else:
+                    for bloque in copia:
+                        salida.write(bytes(bloque).decode('utf-8'))
+        else:
+            cursor.copy_expert(sql, entrada if entrada is not None else salida)
+    finally:
+        cursor.close()
+
+
+def copiar_desde(conexion, tabla, filas, tamaño_bloque=TAMAÑO_BLOQUE):
+    """Cargar un iterable de diccionarios en `tabla`; devuelve cuántas filas.
+
+    En PostgreSQL cada bloque viaja en un COPY ... FROM STDIN en formato
+    CSV; en los demás motores, como INSERT en modo executemany.
+    """
+    filas = iter(filas)
+    total = 0
+    columnas = None
+    while True:
+        bloque = list(islice(filas, tamaño_bloque))
+        if not bloque:
+            return total
+        if not es_postgresql(conexion):
+            conexion.execute(tabla.insert(), bloque)
+        else:
+            columnas = columnas or list(bloque[0])
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer)
+            for fila in bloque:
+                escritor.writerow([_valor_copy(fila.get(c)) for c in columnas])
+            buffer.seek(0)
+            lista = ', '.join(conexion.dialect.identifier_preparer.quote(c) for c in columnas)
+            nombre = conexion.dialect.identifier_preparer.format_table(tabla)
+            _copy_postgresql(conexion, f'COPY {nombre} ({lista}) FROM STDIN WITH (FORMAT csv)', entrada=buffer)
+        total += len(bloque)
+
+
+def copiar_a(conexion, consulta, archivo):
+    """Escribir el resultado de `consulta` como CSV en `archivo` (texto); devuelve cuántas filas.
+
+    En PostgreSQL, COPY (consulta) TO STDOUT: el servidor produce el CSV y
+    no se crea un objeto por fila. Si la consulta no se puede compilar con
+    sus valores en línea, o en otros motores, se recorre con un cursor.
+    """
+    if es_postgresql(conexion):
+        try:
+            sql = str(consulta.compile(dialect=conexion.dialect, compile_kwargs={'literal_binds': True}))
+        except CompileError:
+            sql = None
+        if sql:
+            contador = _ContadorLineas(archivo)
+            _copy_postgresql(conexion, f'COPY ({sql}) TO STDOUT WITH (FORMAT csv)', salida=contador)
+            return contador.lineas
+    escritor = csv.writer(archivo)
+    total = 0
+    for fila in conexion.execute(consulta, execution_options={'stream_results': True}):
+        escritor.writerow(fila)
+        total += 1
+    return total
+
+
+class _ContadorLineas:
+    """Archivo que cuenta las líneas que recibe (filas del COPY)"""
+
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self.lineas = 0
+
+    def write(self, datos):
+        self.lineas += datos.count('\n')
+        return self.archivo.write(datos)
+
+
+def ajustar_secuencias(conexion, tablas):
+    """PostgreSQL: llevar las secuencias de ids al máximo actual tras insertar ids explícitos"""
+    if not es_postgresql(conexion):
+        return
+    for tabla in tablas:
+        columna = tabla.autoincrement_column
+        if columna is None:
+            continue
+        nombre = conexion.dialect.identifier_preparer.format_table(tabla)
+        conexion.execute(select(func.setval(
+            func.pg_get_serial_sequence(nombre, columna.name),
+            select(func.coalesce(func.max(columna), 0) + 1).scalar_subquery(),
+            False)))
+
+
+def tamaño_base(conexion):
+    """Tamaño de la base de datos en bytes (None si el motor no lo informa)"""
+    if conexion.dialect.name == 'sqlite':
+        paginas = conexion.exec_driver_sql('PRAGMA page_count').scalar()
+        return paginas * conexion.exec_driver_sql('PRAGMA page_size').scalar()
+    if es_postgresql(conexion):
+        return conexion.execute(text('SELECT pg_database_size(current_database())')).scalar()
+    return None
@@ -0,0 +1,170 @@
+# estado_horario.py - Horario del día en memoria para las APIs de horario (WSGI y ASGI)
+"""
+Las APIs de horario se consultan cada pocos segundos desde todas las
+pantallas abiertas y siempre preguntan lo mismo: qué clase hay ahora, cuál
+sigue y qué reemplazos hay hoy. En vez de consultar la base en cada
+petición, el proceso guarda una instantánea del día (clases, reemplazos
+confirmados y nombres de cursos) y la reconstruye solo cuando cambia la
+fecha o la versión de los modelos de los que depende (ver fragmentos.py).
+Con la instantánea, estado_actual() y notificaciones_curso() no consultan
+la base.
+
+La usan las vistas de routes/horario_routes.py y el servidor ASGI
+(asgi.py), así ambos responden exactamente lo mismo.
+"""
+import threading
+from datetime import date, datetime
+
+from sqlalchemy.orm import joinedload
+
+from models import Horario, Curso, NotificacionReemplazo
+import fragmentos
+
+DIAS = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes']
+
+# Modelos cuyos cambios invalidan la instantánea
+_ETIQUETAS = ('Horario', 'NotificacionReemplazo', 'Usuario', 'Curso', 'Asignatura')
+
+_actual = None
+_cerrojo = threading.Lock()
+
+
+class Instantanea:
+    """Horario de un día, inmutable una vez construido"""
+    __slots__ = ('fecha', 'clave', 'clases', 'reemplazos', 'cambios', 'cursos')
+
+    def __init__(self, fecha, clave, clases, reemplazos, cambios, cursos):
+        self.fecha = fecha
+        self.clave = clave
+        self.clases = clases          # Clases activas del día, por (hora_inicio, id)
+        self.reemplazos = reemplazos  # horario_id -> profesor de reemplazo confirmado
+        self.cambios = cambios        # Reemplazos confirmados del día, con su curso
+        self.cursos = cursos          # curso_id -> nombre completo
+
+
+def _clase(horario):
+    return {
+        'id': horario.id,
+        'inicio': horario.hora_inicio,
+        'fin': horario.hora_fin,
+        'datos': {
+            'asignatura': horario.asignatura.nombre,
+            'profesor': horario.profesor.nombre_completo,
+            'curso': horario.curso.nombre_completo,
+            'aula': horario.aula,
+            'hora_inicio': horario.hora_inicio.strftime('%H:%M'),
+            'hora_fin': horario.hora_fin.strftime('%H:%M')
+        }
+    }
+
+
+def _cambio(notificacion):
+    horario = notificacion.horario_original
+    inicio, fin = horario.hora_inicio.strftime('%H:%M'), horario.hora_fin.strftime('%H:%M')
+    ausente = notificacion.profesor_ausente.nombre_completo
+    reemplazo = notificacion.profesor_reemplazo.nombre_completo
+    return {
+        'curso_id': horario.curso_id,
+        'datos': {
+            'clase': {
+                'asignatura': horario.asignatura.nombre,
+                'hora_inicio': inicio,
+                'hora_fin': fin,
+                'aula': horario.aula
+            },
+            'profesor_ausente': ausente,
+            'profesor_reemplazo': reemplazo,
+            'mensaje': f"CAMBIO DE PROFESOR: La clase de {horario.asignatura.nombre} de {inicio} a {fin} "
+                       f"será dictada por {reemplazo} debido a la ausencia de {ausente}."
+        }
+    }
+
+
+def cargar(fecha, clave=None):
+    """Construir la instantánea de `fecha` desde la base de datos"""
+    horarios = []
+    if fecha.weekday() <= 4:
+        horarios = Horario.query.options(
+            joinedload(Horario.asignatura), joinedload(Horario.profesor), joinedload(Horario.curso)
+        ).filter(
+            Horario.dia_semana == fecha.weekday(),
+            Horario.activo == True
+        ).all()
+    confirmadas = NotificacionReemplazo.query.options(
+        joinedload(NotificacionReemplazo.horario_original).joinedload(Horario.asignatura),
+        joinedload(NotificacionReemplazo.profesor_ausente),
+        joinedload(NotificacionReemplazo.profesor_reemplazo)
+    ).filter(
+        NotificacionReemplazo.fecha_ausencia == fecha,
+        NotificacionReemplazo.estado == 'confirmado'
+    ).order_by(NotificacionReemplazo.id).all()
+
+    reemplazos = {}
+    for notificacion in confirmadas:
+        reemplazos.setdefault(notificacion.horario_id, notificacion.profesor_reemplazo.nombre_completo)
+    return Instantanea(
+        fecha=fecha,
+        clave=clave,
+        clases=sorted((_clase(h) for h in horarios), key=lambda c: (c['inicio'], c['id'])),
+        reemplazos=reemplazos,
+        cambios=[_cambio(n) for n in confirmadas],
+        cursos={c.id: c.nombre_completo for c in Curso.query.all()}
+    )
+
+
+def instantanea(fecha=None):
+    """Instantánea vigente del día; se reconstruye si cambió la fecha o los datos"""
+    global _actual
+    fecha = fecha or date.today()
+    versiones = fragmentos.versiones()
+    clave = (fecha, tuple(versiones.get(e, 0) for e in _ETIQUETAS))
+    actual = _actual
+    if actual is not None and actual.clave == clave:
+        return actual
+    with _cerrojo:
+        if _actual is None or _actual.clave != clave:
+            _actual = cargar(fecha, clave)
+        return _actual
+
+
+def estado_actual(inst, ahora=None):
+    """Clase en curso, siguiente clase y cambios confirmados (respuesta de /horario/api/estado_actual)"""
+    ahora = ahora or datetime.now()
+    dia_semana = inst.fecha.weekday()
+    if dia_semana > 4:
+        return {'error': 'No hay clases en fines de semana'}
+
+    hora_actual = ahora.time()
+    # Varias clases a la vez: la de menor id, como el .first() original sin orden
+    en_curso = [c for c in inst.clases if c['inicio'] <= hora_actual <= c['fin']]
+    clase_actual = min(en_curso, key=lambda c: c['id']) if en_curso else None
+    proxima_clase = next((c for c in inst.clases if c['inicio'] > hora_actual), None)
+
+    resultado = {
+        'fecha': inst.fecha.isoformat(),
+        'hora_actual': hora_actual.strftime('%H:%M'),
+        'dia_semana': DIAS[dia_semana],
+        'clase_actual': None,
+        'proxima_clase': None,
+        'cambios_confirmados': len(inst.cambios)
+    }
+    if clase_actual:
+        resultado['clase_actual'] = dict(clase_actual['datos'])
+        if clase_actual['id'] in inst.reemplazos:
+            resultado['clase_actual']['profesor_reemplazo'] = inst.reemplazos[clase_actual['id']]
+            resultado['clase_actual']['tiene_reemplazo'] = True
+    if proxima_clase:
+        resultado['proxima_clase'] = dict(proxima_clase['datos'])
+    return resultado
+
+
+def notificaciones_curso(inst, curso_id):
+    """Cambios confirmados del día para un curso, o None si el curso no existe"""
+    if curso_id not in inst.cursos:
+        return None
+    notificaciones = [c['datos'] for c in inst.cambios if c['curso_id'] == curso_id]
+    return {
+        'curso': inst.cursos[curso_id],
+        'notificaciones': notificaciones,
+        'total': len(notificaciones)
+    }
@@ -1,9 +1,26 @@
 # extensions.py - Instancias de extensiones Flask
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
 
+
+class Sesion(Session):
+    """Sesión que envía las lecturas al bind 'lectura' dentro de lectura.modo_lectura().
+
+    El flush y las sentencias INSERT/UPDATE/DELETE siguen yendo a la base
+    principal, así una escritura ocasional dentro de un reporte no falla.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and has_app_context() and g.get('solo_lectura')
+                and not getattr(clause, 'is_dml', False) and 'lectura' in self._db.engines):
+            return self._db.engines['lectura']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
 # Inicializar extensiones
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': Sesion})
 login_manager = LoginManager()
-csrf = CSRFProtect()
\ No newline at end of file
+csrf = CSRFProtect()
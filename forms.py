@@ -55,6 +55,13 @@ class RegistroUsuarioForm(FlaskForm):
     activo = BooleanField('Usuario Activo', default=True)
     submit = SubmitField('Guardar Usuario')
 
+class ImportarUsuariosForm(FlaskForm):
+    """Formulario para importar usuarios desde un archivo CSV"""
+    archivo = FileField('Archivo CSV', validators=[
+        DataRequired(), FileAllowed(['csv'], 'Solo se permiten archivos CSV')
+    ])
+    submit = SubmitField('Importar Usuarios')
+
 class CursoForm(FlaskForm):
     """Formulario para crear/editar cursos"""
     grado = SelectField('Grado', 
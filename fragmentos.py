@@ -0,0 +1,199 @@
+# fragmentos.py - Caché de fragmentos de plantillas invalidada por escrituras en los modelos
+from flask import current_app, g, has_request_context
+from flask_login import current_user
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from cache import CacheLRU
+from extensions import db
+from models import VersionDatos
+import dialecto
+
+# HTML renderizado por (fragmento, usuario, versiones de sus etiquetas); se configura en init_app
+_cache = CacheLRU(max_elementos=100000)
+
+# Modelos cuyas escrituras no cambian lo que muestran las plantillas: registros internos,
+# tablas que se escriben a cada rato (estado de los trabajos, recordatorios enviados) y
+# la bandeja, que ningún fragmento lee (sus cambios llegan con los de Tarea y Calificacion)
+_SIN_VERSION = {'VersionDatos', 'SesionCarga', 'BloqueCarga', 'ArchivoContenido', 'FirmaContenido',
+                'Trabajo', 'RecordatorioEnviado', 'BandejaTarea'}
+
+
+class Perezoso:
+    """Valor que se calcula la primera vez que la plantilla lo usa.
+
+    Las vistas pasan así los resultados de sus consultas: si el fragmento
+    que los muestra está en caché, la consulta nunca se ejecuta.
+    """
+    __slots__ = ('_funcion', '_valor', '_calculado')
+
+    def __init__(self, funcion):
+        self._funcion = funcion
+        self._calculado = False
+
+    @property
+    def valor(self):
+        if not self._calculado:
+            self._valor = self._funcion()
+            self._calculado = True
+        return self._valor
+
+    def __getattr__(self, nombre):
+        return getattr(self.valor, nombre)
+
+    def __getitem__(self, clave):
+        return self.valor[clave]
+
+    def __iter__(self):
+        return iter(self.valor)
+
+    def __len__(self):
+        return len(self.valor)
+
+    def __bool__(self):
+        return bool(self.valor)
+
+    def __str__(self):
+        return str(self.valor)
+
+    def __int__(self):
+        return int(self.valor)
+
+    def __float__(self):
+        return float(self.valor)
+
+    def __round__(self, digitos=None):
+        return round(self.valor, digitos)
+
+    def __eq__(self, otro):
+        return self.valor == otro
+
+    def __lt__(self, otro):
+        return self.valor < otro
+
+    def __le__(self, otro):
+        return self.valor <= otro
+
+    def __gt__(self, otro):
+        return self.valor > otro
+
+    def __ge__(self, otro):
+        return self.valor >= otro
+
+    __hash__ = None
+
+
+def perezoso(funcion):
+    return Perezoso(funcion)
+
+
+def versiones():
+    """Versión actual de cada etiqueta (una sola consulta por petición)"""
+    if has_request_context() and '_versiones_datos' in g:
+        return g._versiones_datos
+    filas = dict(db.session.execute(select(VersionDatos.etiqueta, VersionDatos.version)).all())
+    if has_request_context():
+        g._versiones_datos = filas
+    return filas
+
+
+def tocar(etiquetas):
+    """Subir la versión de las etiquetas en una transacción corta propia.
+
+    Se llama después del commit de la escritura, nunca dentro: la fila de
+    cada modelo solo queda bloqueada lo que dura esta sentencia, así que dos
+    escrituras del mismo modelo no se esperan la una a la otra. Entre el
+    commit y este upsert otros procesos pueden ver los datos nuevos con la
+    versión anterior; lo que guarden en ese momento se descarta al subir la
+    versión. Si el proceso muere justo ahí, sus cachés vencen por TTL.
+    """
+    tabla = VersionDatos.__table__
+    # Una sola sentencia: crea la fila en la primera escritura del modelo o la sube
+    with db.engine.begin() as conexion:
+        dialecto.upsert(conexion, tabla, [{'etiqueta': e, 'version': 1} for e in sorted(etiquetas)],
+                        ['etiqueta'], {'version': tabla.c.version + 1})
+    if has_request_context():
+        g.pop('_versiones_datos', None)
+
+
+def tocar_al_confirmar(session, etiquetas):
+    """Versionar las etiquetas cuando `session` haga commit (escrituras con Core en la sesión)"""
+    session.info.setdefault('etiquetas_pendientes', set()).update(etiquetas)
+
+
+def _al_escribir(session, contexto):
+    """after_flush: versionar los modelos con filas nuevas, modificadas o eliminadas"""
+    objetos = [*session.new, *session.deleted, *(o for o in session.dirty if session.is_modified(o))]
+    etiquetas = {type(o).__name__ for o in objetos} - _SIN_VERSION
+    if etiquetas:
+        tocar_al_confirmar(session, etiquetas)
+
+
+def _al_ejecutar(estado):
+    """do_orm_execute: las actualizaciones y borrados masivos no pasan por el flush"""
+    if (estado.is_update or estado.is_delete) and estado.bind_mapper is not None:
+        etiqueta = estado.bind_mapper.class_.__name__
+        if etiqueta not in _SIN_VERSION:
+            tocar_al_confirmar(estado.session, {etiqueta})
+
+
+def _al_confirmar(session):
+    """after_commit: subir las versiones de lo que escribió la transacción"""
+    etiquetas = session.info.pop('etiquetas_pendientes', None)
+    if etiquetas:
+        tocar(etiquetas)
+
+
+def _al_terminar(session, transaccion):
+    """after_transaction_end: una transacción revertida no cambia ninguna versión"""
+    if transaccion.parent is None:
+        session.info.pop('etiquetas_pendientes', None)
+
+
+def clave_fragmento(nombre, etiquetas):
+    usuario_id = current_user.id if current_user.is_authenticated else None
+    actuales = versiones()
+    return (nombre, usuario_id, tuple((e, actuales.get(e, 0)) for e in etiquetas))
+
+
+class ExtensionCache(Extension):
+    """Etiqueta {% cache "nombre", "Modelo", ... %} ... {% endcache %}.
+
+    El contenido se guarda por usuario y se vuelve a renderizar cuando
+    cambia la versión de alguno de los modelos indicados (o vence el TTL).
+    """
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        argumentos = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            argumentos.append(parser.parse_expression())
+        cuerpo = parser.parse_statements(['name:endcache'], drop_needle=True)
+        llamada = self.call_method('_renderizar', [nodes.List(argumentos)])
+        return nodes.CallBlock(llamada, [], [], cuerpo).set_lineno(lineno)
+
+    def _renderizar(self, argumentos, caller):
+        if not current_app.config.get('CACHE_FRAGMENTOS', True):
+            return caller()
+        clave = clave_fragmento(argumentos[0], argumentos[1:])
+        html = _cache.get(clave)
+        if html is None:
+            html = str(caller())
+            _cache.set(clave, html)
+        return Markup(html)
+
+
+def init_app(app):
+    """Registrar la etiqueta {% cache %} y los eventos que versionan las escrituras"""
+    _cache.ttl = app.config.get('CACHE_FRAGMENTOS_TTL', 300)
+    _cache.max_bytes = app.config.get('CACHE_FRAGMENTOS_MAX_BYTES', 32 * 1024 * 1024)
+    app.jinja_env.add_extension(ExtensionCache)
+
+    if not event.contains(Session, 'after_flush', _al_escribir):
+        event.listen(Session, 'after_flush', _al_escribir)
+        event.listen(Session, 'do_orm_execute', _al_ejecutar)
+        event.listen(Session, 'after_commit', _al_confirmar)
+        event.listen(Session, 'after_transaction_end', _al_terminar)
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Generador de datos sintéticos del Colegio Colombia para pruebas de carga
+y benchmarks.
+
+A diferencia de poblar_colegio.py, todo se deriva de la semilla y de los
+parámetros (nada depende de la hora actual ni de `random` global), así que
+dos ejecuciones iguales producen exactamente los mismos datos. Las filas se
+escriben por bloques y dentro de una sola transacción con
+dialecto.copiar_desde() (COPY en PostgreSQL, executemany en SQLite); los
+ids se asignan aquí para no tener que leerlos de vuelta.
+
+Cada año histórico tiene sus propios cursos, asignaturas y tareas; los
+estudiantes avanzan un grado por año (misma sección) y quedan matriculados
+en el curso de cada año. Los años anteriores quedan inactivos.
+
+Uso:
+    python generar_datos.py --reiniciar                       # Escala de un colegio real
+    python generar_datos.py --reiniciar --cursos 24 --estudiantes-por-curso 35 \\
+        --tareas-por-asignatura 12 --años 10                  # ~1M calificaciones
+"""
+
+import argparse
+import hashlib
+import random
+import string
+import time
+from datetime import date, datetime, time as hora, timedelta
+
+from sqlalchemy import func, select
+
+from app import create_app
+from extensions import db
+from models import Usuario, Curso, Asignatura, Tarea, Calificacion, Horario, usuario_curso
+from config import Config
+from poblar_colegio import (NOMBRES_ESTUDIANTES, NOMBRES_PROFESORES, APELLIDOS,
+                            MATERIAS_POR_GRADO, normalizar_texto)
+from aprovisionamiento import CONTRASEÑAS_POR_ROL
+import bandeja
+import dialecto
+import contadores
+
+TAMAÑO_BLOQUE = 50000
+ESPECIALIDADES = sorted({m for materias in MATERIAS_POR_GRADO.values() for m in materias})
+HORAS_INICIO = [hora(7, 0), hora(8, 0), hora(9, 15), hora(10, 15), hora(11, 15), hora(14, 0), hora(15, 0)]
+
+
+def hash_determinista(password, sal):
+    """Hash en el formato de werkzeug (pbkdf2) con sal fija, para que el dataset sea reproducible"""
+    iteraciones = 600000
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), sal.encode(), iteraciones).hex()
+    return f'pbkdf2:sha256:{iteraciones}${sal}${digest}'
+
+
+def periodo_de(fecha):
+    """Periodo académico según el mes (año escolar de febrero a noviembre)"""
+    indice = min(max(fecha.month - 2, 0) * 4 // 10, 3)
+    return Config.PERIODOS_ACADEMICOS[indice]
+
+
+def insertar(conexion, tabla, filas, tamaño_bloque=TAMAÑO_BLOQUE):
+    """Insertar un iterable de diccionarios por bloques; devuelve cuántas filas"""
+    return dialecto.copiar_desde(conexion, tabla, filas, tamaño_bloque)
+
+
+class GeneradorDatos:
+    """Genera e inserta un colegio completo a partir de una semilla"""
+
+    def __init__(self, semilla=42, cursos=12, estudiantes_por_curso=30, profesores=14,
+                 tareas_por_asignatura=8, calificaciones_por_tarea=None, años=1,
+                 año_actual=2025, fecha_referencia=None):
+        self.semilla = semilla
+        self.cursos = cursos
+        self.estudiantes_por_curso = estudiantes_por_curso
+        self.profesores = profesores
+        self.tareas_por_asignatura = tareas_por_asignatura
+        # None = todos los estudiantes del curso tienen calificación en cada tarea vencida
+        self.calificaciones_por_tarea = calificaciones_por_tarea
+        self.años = list(range(año_actual - años + 1, año_actual + 1))
+        self.año_actual = año_actual
+        # Las tareas del año actual posteriores a esta fecha aún no tienen calificaciones
+        self.fecha_referencia = fecha_referencia or datetime(año_actual, 6, 15)
+        self.conteos = {}
+
+    def _rng(self, *clave):
+        """Generador independiente por entidad: cambiar un parámetro no altera el resto"""
+        return random.Random(f'{self.semilla}:' + ':'.join(map(str, clave)))
+
+    def _siguiente_id(self, conexion, modelo):
+        return (conexion.execute(select(func.max(modelo.id))).scalar() or 0) + 1
+
+    def _hashes(self):
+        return {rol: hash_determinista(password, f'{self.semilla}{rol}'[:16])
+                for rol, password in CONTRASEÑAS_POR_ROL.items()}
+
+    def _cursos_del_año(self):
+        """(grado, sección) de los cursos de un año: primero la sección A de todos los grados, etc."""
+        grados = Config.GRADOS_DISPONIBLES
+        return [(grados[i % len(grados)], string.ascii_uppercase[i // len(grados)])
+                for i in range(self.cursos)]
+
+    def generar(self, conexion):
+        inicio = time.perf_counter()
+        hashes = self._hashes()
+        fecha_creacion = datetime(self.años[0], 1, 15)
+        grados = Config.GRADOS_DISPONIBLES
+
+        # Administrador por defecto (el de init_db.py) si la base está vacía
+        if conexion.execute(select(Usuario.id).where(Usuario.role == 'admin')).first() is None:
+            self.conteos['administradores'] = insertar(conexion, Usuario.__table__, [{
+                'nombres': 'Administrador', 'apellidos': 'Sistema', 'email': 'admin@colegiocolombia.edu.co',
+                'tipo_documento': 'C.C.', 'numero_documento': '12345678', 'password_hash': hashes['admin'],
+                'role': 'admin', 'activo': True, 'fecha_creacion': fecha_creacion
+            }])
+
+        # Profesores
+        id_profesor = self._siguiente_id(conexion, Usuario)
+        profesores = []
+        filas = []
+        for n in range(self.profesores):
+            rng = self._rng('profesor', n)
+            uid = id_profesor + n
+            nombre = rng.choice(NOMBRES_PROFESORES)
+            apellidos = f'{rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}'
+            filas.append({
+                'id': uid, 'nombres': nombre, 'apellidos': apellidos,
+                'email': f'{normalizar_texto(nombre)}.{normalizar_texto(apellidos.split()[0])}.{uid}@colegiocolombia.edu.co',
+                'tipo_documento': 'C.C.', 'numero_documento': f'7{uid:09d}',
+                'telefono': f'300{rng.randrange(10 ** 7):07d}', 'password_hash': hashes['profesor'],
+                'role': 'profesor', 'materia_especialidad': ESPECIALIDADES[n % len(ESPECIALIDADES)],
+                'activo': True, 'fecha_creacion': fecha_creacion
+            })
+            profesores.append(uid)
+        self.conteos['profesores'] = insertar(conexion, Usuario.__table__, filas)
+
+        # Estudiantes: una cohorte por (año de ingreso a 6º, sección)
+        cohortes = sorted({(año - grados.index(grado), seccion)
+                           for año in self.años for grado, seccion in self._cursos_del_año()})
+        id_estudiante = id_profesor + self.profesores
+        estudiantes_por_cohorte = {}
+        filas = []
+        for cohorte in cohortes:
+            ids = []
+            for k in range(self.estudiantes_por_curso):
+                rng = self._rng('estudiante', *cohorte, k)
+                uid = id_estudiante + len(filas)
+                nombre = rng.choice(NOMBRES_ESTUDIANTES)
+                apellidos = f'{rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}'
+                filas.append({
+                    'id': uid, 'nombres': nombre, 'apellidos': apellidos,
+                    'email': f'{normalizar_texto(nombre)}.{normalizar_texto(apellidos.split()[0])}.{uid}@estudiante.colegiocolombia.edu.co',
+                    'tipo_documento': 'T.I.', 'numero_documento': f'1{uid:09d}',
+                    'telefono': f'301{rng.randrange(10 ** 7):07d}', 'password_hash': hashes['estudiante'],
+                    'role': 'estudiante',
+                    'fecha_nacimiento': date(cohorte[0] - 11, rng.randint(1, 12), rng.randint(1, 28)),
+                    # Los egresados (terminaron 11º antes del año actual) quedan inactivos
+                    'activo': cohorte[0] + len(grados) - 1 >= self.año_actual,
+                    'fecha_creacion': datetime(max(cohorte[0], self.años[0]), 1, 15)
+                })
+                ids.append(uid)
+            estudiantes_por_cohorte[cohorte] = ids
+        self.conteos['estudiantes'] = insertar(conexion, Usuario.__table__, filas)
+
+        # Cursos, matrículas y asignaturas de cada año
+        id_curso = self._siguiente_id(conexion, Curso)
+        id_asignatura = self._siguiente_id(conexion, Asignatura)
+        cursos, matriculas, asignaturas = [], [], []
+        estudiantes_del_curso = {}
+        for año in self.años:
+            for grado, seccion in self._cursos_del_año():
+                cid = id_curso + len(cursos)
+                cursos.append({'id': cid, 'grado': grado, 'seccion': seccion,
+                               'año_academico': año, 'activo': año == self.año_actual})
+                ids = estudiantes_por_cohorte[(año - grados.index(grado), seccion)]
+                estudiantes_del_curso[cid] = ids
+                matriculas.extend({'usuario_id': uid, 'curso_id': cid} for uid in ids)
+                for materia in MATERIAS_POR_GRADO[grado]:
+                    aid = id_asignatura + len(asignaturas)
+                    asignaturas.append({
+                        'id': aid, 'nombre': materia, 'descripcion': f'{materia} para {grado}',
+                        'curso_id': cid, 'profesor_id': profesores[aid % len(profesores)],
+                        'activa': año == self.año_actual, '_año': año
+                    })
+        self.conteos['cursos'] = insertar(conexion, Curso.__table__, cursos)
+        self.conteos['matriculas'] = insertar(conexion, usuario_curso, matriculas)
+        self.conteos['asignaturas'] = insertar(
+            conexion, Asignatura.__table__,
+            ({k: v for k, v in a.items() if k != '_año'} for a in asignaturas))
+
+        # Horarios (solo el año actual: los anteriores no se consultan)
+        id_horario = self._siguiente_id(conexion, Horario)
+        horarios = []
+        for asignatura in asignaturas:
+            if asignatura['_año'] != self.año_actual:
+                continue
+            rng = self._rng('horario', asignatura['id'])
+            for _ in range(rng.randint(2, 3)):
+                inicio_clase = rng.choice(HORAS_INICIO)
+                horarios.append({
+                    'id': id_horario + len(horarios), 'dia_semana': rng.randint(0, 4),
+                    'hora_inicio': inicio_clase, 'hora_fin': hora(inicio_clase.hour + 1, inicio_clase.minute),
+                    'curso_id': asignatura['curso_id'], 'asignatura_id': asignatura['id'],
+                    'profesor_id': asignatura['profesor_id'], 'aula': f'Aula {rng.randint(101, 320)}',
+                    'activo': True
+                })
+        self.conteos['horarios'] = insertar(conexion, Horario.__table__, horarios)
+
+        # Tareas repartidas a lo largo del año escolar (febrero a noviembre)
+        id_tarea = self._siguiente_id(conexion, Tarea)
+        tareas = []
+        for asignatura in asignaturas:
+            rng = self._rng('tareas', asignatura['id'])
+            año = asignatura['_año']
+            inicio_año = datetime(año, 2, 1, 8, 0)
+            paso = 300 / max(self.tareas_por_asignatura, 1)
+            for n in range(self.tareas_por_asignatura):
+                asignacion = inicio_año + timedelta(days=int(n * paso) + rng.randint(0, 3))
+                tareas.append({
+                    'id': id_tarea + len(tareas), 'titulo': f'Tarea {n + 1} - {asignatura["nombre"]}',
+                    'descripcion': f'Actividad {n + 1} de {asignatura["nombre"]} ({año}).',
+                    'fecha_asignacion': asignacion,
+                    'fecha_entrega': asignacion + timedelta(days=rng.randint(5, 15), hours=15),
+                    'asignatura_id': asignatura['id'], 'profesor_id': asignatura['profesor_id'],
+                    'activa': año == self.año_actual, '_curso_id': asignatura['curso_id']
+                })
+        self.conteos['tareas'] = insertar(
+            conexion, Tarea.__table__,
+            ({k: v for k, v in t.items() if k != '_curso_id'} for t in tareas))
+
+        # Calificaciones: el grueso del volumen, generado perezosamente
+        id_calificacion = self._siguiente_id(conexion, Calificacion)
+        self.conteos['calificaciones'] = insertar(
+            conexion, Calificacion.__table__,
+            self._calificaciones(tareas, estudiantes_del_curso, id_calificacion))
+
+        # Los ids se asignaron aquí: las secuencias de PostgreSQL deben continuar desde el máximo
+        dialecto.ajustar_secuencias(conexion, [Usuario.__table__, Curso.__table__, Asignatura.__table__,
+                                               Horario.__table__, Tarea.__table__, Calificacion.__table__])
+
+        # Bandeja de tareas por estudiante (la carga masiva no pasa por los eventos de la sesión)
+        self.conteos['bandeja'] = bandeja.reconstruir(conexion)
+        contadores.reconciliar(conexion)
+
+        self.segundos = time.perf_counter() - inicio
+        return self.conteos
+
+    def _calificaciones(self, tareas, estudiantes_del_curso, primer_id):
+        siguiente = primer_id
+        for tarea in tareas:
+            if tarea['fecha_entrega'] > self.fecha_referencia:
+                continue  # Aún no se puede calificar
+            rng = self._rng('calificaciones', tarea['id'])
+            estudiantes = estudiantes_del_curso[tarea['_curso_id']]
+            if self.calificaciones_por_tarea is not None and self.calificaciones_por_tarea < len(estudiantes):
+                estudiantes = rng.sample(estudiantes, self.calificaciones_por_tarea)
+            periodo = periodo_de(tarea['fecha_entrega'])
+            fecha = tarea['fecha_entrega'] + timedelta(days=3)
+            for estudiante_id in estudiantes:
+                yield {
+                    'id': siguiente, 'estudiante_id': estudiante_id, 'tarea_id': tarea['id'],
+                    # Distribución aproximada de notas de 1.0 a 5.0, aprobación desde 3.0
+                    'nota': round(min(5.0, max(1.0, rng.gauss(3.7, 0.7))), 1),
+                    'comentarios': None, 'fecha_calificacion': fecha,
+                    'archivo_entrega': None, 'periodo': periodo
+                }
+                siguiente += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--cursos', type=int, default=12, help='Cursos por año (se reparten entre los grados)')
+    parser.add_argument('--estudiantes-por-curso', type=int, default=30)
+    parser.add_argument('--profesores', type=int, default=14)
+    parser.add_argument('--tareas-por-asignatura', type=int, default=8)
+    parser.add_argument('--calificaciones-por-tarea', type=int, default=None,
+                        help='Por defecto, todos los estudiantes del curso')
+    parser.add_argument('--años', type=int, default=1, help='Años académicos, incluido el actual')
+    parser.add_argument('--año-actual', type=int, default=2025)
+    parser.add_argument('--database-url', help='Base de datos destino (por defecto la de config.py)')
+    parser.add_argument('--reiniciar', action='store_true',
+                        help='Borrar y recrear todas las tablas antes de generar')
+    args = parser.parse_args()
+
+    if args.cursos > len(Config.GRADOS_DISPONIBLES) * len(string.ascii_uppercase):
+        parser.error('Demasiados cursos por año')
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database_url} if args.database_url else None)
+    generador = GeneradorDatos(
+        semilla=args.semilla, cursos=args.cursos, estudiantes_por_curso=args.estudiantes_por_curso,
+        profesores=args.profesores, tareas_por_asignatura=args.tareas_por_asignatura,
+        calificaciones_por_tarea=args.calificaciones_por_tarea, años=args.años, año_actual=args.año_actual
+    )
+
+    with app.app_context():
+        if args.reiniciar:
+            print("🗄️  Recreando tablas...")
+            db.drop_all()
+            db.create_all()
+
+        print(f"🎲 GENERANDO DATOS (semilla {args.semilla}, años {generador.años[0]}-{generador.año_actual})")
+        with db.engine.begin() as conexion:
+            if conexion.dialect.name == 'sqlite':
+                # Carga inicial: sin fsync por sentencia (todo va en una transacción)
+                conexion.exec_driver_sql('PRAGMA synchronous = OFF')
+            conteos = generador.generar(conexion)
+
+    for nombre, cantidad in conteos.items():
+        print(f"   ✅ {cantidad:>10,} {nombre}")
+    total = sum(conteos.values())
+    print(f"\n⏱️  {total:,} filas en {generador.segundos:.1f}s ({total / generador.segundos:,.0f} filas/s)")
+    print(f"🔑 Contraseñas: las de cada rol ({', '.join(f'{r}: {p}' for r, p in CONTRASEÑAS_POR_ROL.items())})")
+
+
+if __name__ == '__main__':
+    main()
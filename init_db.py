@@ -6,6 +6,7 @@ Crea las tablas y datos iniciales necesarios para el funcionamiento del sistema
 
 from app import create_app, db
 from models import Usuario, Curso, Asignatura, Horario
+from aprovisionamiento import crear_usuarios_masivo
 from datetime import datetime, time
 import os
 
@@ -27,18 +28,17 @@ def init_database():
         print("\n👤 Creando usuarios por defecto...")
         
         # Administrador
-        admin = Usuario(
-            nombres="Administrador",
-            apellidos="Sistema",
-            email="admin@colegiocolombia.edu.co",
-            tipo_documento="C.C.",
-            numero_documento="12345678",
-            telefono="3001234567",
-            direccion="Cra 10 # 20-30, Bogotá",
-            role="admin"
-        )
-        admin.set_password("admin123")
-        db.session.add(admin)
+        usuarios = [{
+            "nombres": "Administrador",
+            "apellidos": "Sistema",
+            "email": "admin@colegiocolombia.edu.co",
+            "tipo_documento": "C.C.",
+            "numero_documento": "12345678",
+            "telefono": "3001234567",
+            "direccion": "Cra 10 # 20-30, Bogotá",
+            "role": "admin",
+            "password": "admin123"
+        }]
         
         # Profesores de ejemplo
         profesores = [
@@ -69,21 +69,18 @@ def init_database():
             }
         ]
         
-        profesores_objs = []
         for prof_data in profesores:
-            profesor = Usuario(
-                nombres=prof_data["nombre"],
-                apellidos=prof_data["apellido"],
-                email=prof_data["email"],
-                tipo_documento="C.C.",
-                numero_documento=prof_data["documento"],
-                telefono=prof_data["telefono"],
-                direccion="Dirección de ejemplo",
-                role="profesor"
-            )
-            profesor.set_password("profesor123")
-            profesores_objs.append(profesor)
-            db.session.add(profesor)
+            usuarios.append({
+                "nombres": prof_data["nombre"],
+                "apellidos": prof_data["apellido"],
+                "email": prof_data["email"],
+                "tipo_documento": "C.C.",
+                "numero_documento": prof_data["documento"],
+                "telefono": prof_data["telefono"],
+                "direccion": "Dirección de ejemplo",
+                "role": "profesor",
+                "password": "profesor123"
+            })
         
         # Estudiantes de ejemplo
         estudiantes_data = [
@@ -119,21 +116,22 @@ def init_database():
         ]
         
         for est_data in estudiantes_data:
-            estudiante = Usuario(
-                nombres=est_data["nombre"],
-                apellidos=est_data["apellido"],
-                email=f"{est_data['nombre'].lower()}.{est_data['apellido'].lower()}@estudiante.colegiocolombia.edu.co",
-                tipo_documento="T.I.",
-                numero_documento=est_data["documento"],
-                telefono="3001111111",
-                direccion="Dirección de ejemplo",
-                role="estudiante"
-            )
-            estudiante.set_password("estudiante123")
-            db.session.add(estudiante)
+            usuarios.append({
+                "nombres": est_data["nombre"],
+                "apellidos": est_data["apellido"],
+                "email": f"{est_data['nombre'].lower()}.{est_data['apellido'].lower()}@estudiante.colegiocolombia.edu.co",
+                "tipo_documento": "T.I.",
+                "numero_documento": est_data["documento"],
+                "telefono": "3001111111",
+                "direccion": "Dirección de ejemplo",
+                "role": "estudiante",
+                "password": "estudiante123"
+            })
         
-        db.session.commit()
-        print(f"✅ Creados {len(profesores)} profesores y {len(estudiantes_data)} estudiantes")
+        # Hash de contraseñas en paralelo e inserción en bloque
+        resultado = crear_usuarios_masivo(usuarios)
+        profesores_objs = Usuario.query.filter_by(role='profesor').order_by(Usuario.id).all()
+        print(f"✅ Creados {len(profesores)} profesores y {len(estudiantes_data)} estudiantes ({resultado})")
         
         # Crear cursos
         print("\n📚 Creando cursos...")
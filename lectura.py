@@ -0,0 +1,91 @@
+# lectura.py - Conexión de solo lectura para reportes y exportaciones
+"""
+Los reportes (admin.reportes, búsqueda y perfil de estudiantes) y las
+exportaciones recorren tablas completas. Con @solo_lectura o dentro de
+modo_lectura() sus consultas van por un bind aparte, 'lectura', con su
+propio pool:
+
+- DATABASE_URL_LECTURA si está definida (una réplica);
+- si no, la misma base abierta en modo lectura: en SQLite una URI con
+  mode=ro, en PostgreSQL transacciones READ ONLY.
+
+Así un reporte largo no ocupa conexiones del pool de las vistas
+interactivas. En SQLite además la base pasa a modo WAL, donde los
+lectores no bloquean a quien escribe (ni al revés). Las lecturas en modo
+lectura no ven lo que la misma petición escribió sin confirmar.
+"""
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from extensions import db
+
+
+def url_lectura(app):
+    """URL del bind de lectura, o None si no se puede separar (SQLite en memoria)"""
+    if app.config.get('DATABASE_URL_LECTURA'):
+        return app.config['DATABASE_URL_LECTURA']
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() != 'sqlite':
+        return url.render_as_string(hide_password=False)
+    if not url.database or url.database == ':memory:' or url.query.get('uri'):
+        return None
+    return url.set(database=f'file:{url.database}', query={'mode': 'ro', 'uri': 'true'}).render_as_string()
+
+
+def configurar(app):
+    """Registrar el bind 'lectura'; va antes de db.init_app, que crea los motores"""
+    if not app.config.get('REPORTES_SOLO_LECTURA', True):
+        return
+    url = url_lectura(app)
+    if url is None:
+        return
+    opciones = {'url': url, 'pool_size': app.config.get('LECTURA_POOL_SIZE', 5)}
+    if make_url(url).get_backend_name() == 'postgresql':
+        opciones['execution_options'] = {'postgresql_readonly': True}
+    app.config['SQLALCHEMY_BINDS'] = {**(app.config.get('SQLALCHEMY_BINDS') or {}), 'lectura': opciones}
+
+
+def _modo_wal(conexion_dbapi, registro):
+    # Persistente en el archivo; repetirlo en cada conexión es inmediato
+    cursor = conexion_dbapi.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.close()
+
+
+def init_app(app):
+    configurar_wal = 'lectura' in (app.config.get('SQLALCHEMY_BINDS') or {}) and \
+        not app.config.get('DATABASE_URL_LECTURA')
+    with app.app_context():
+        principal = db.engines[None]
+        if configurar_wal and principal.dialect.name == 'sqlite' and \
+                not event.contains(principal, 'connect', _modo_wal):
+            event.listen(principal, 'connect', _modo_wal)
+
+
+def motor():
+    """Motor para lecturas pesadas fuera de la sesión (el principal si no hay bind de lectura)"""
+    return db.engines.get('lectura', db.engine)
+
+
+@contextmanager
+def modo_lectura():
+    """Las consultas de db.session dentro del bloque van al bind de lectura"""
+    anterior = g.get('solo_lectura', False)
+    g.solo_lectura = True
+    try:
+        yield
+    finally:
+        g.solo_lectura = anterior
+
+
+def solo_lectura(f):
+    """Decorador para vistas de reportes: sus consultas usan el bind de lectura"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with modo_lectura():
+            return f(*args, **kwargs)
+    return decorated_function
@@ -33,8 +33,17 @@ class Usuario(UserMixin, db.Model):
     calificaciones = db.relationship('Calificacion', backref='estudiante', lazy='dynamic')
     horarios = db.relationship('Horario', backref='profesor', lazy='dynamic', foreign_keys='Horario.profesor_id')
     
+    # Índices para la paginación por clave (ver paginacion.py)
+    __table_args__ = (
+        db.Index('ix_usuario_apellidos_nombres_id', 'apellidos', 'nombres', 'id'),
+    )
+    
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
+        if self.id is not None:
+            # La sesión en caché del usuario deja de ser válida
+            from autenticacion import invalidar_usuario
+            invalidar_usuario(self.id)
     
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -57,9 +66,10 @@ class Usuario(UserMixin, db.Model):
     
     @property
     def curso(self):
-        """Devuelve el curso principal del estudiante"""
+        """Devuelve el curso principal del estudiante (el del año más reciente)"""
         if self.es_estudiante and self.cursos:
-            return self.cursos[0]  # Los estudiantes tienen un solo curso
+            # Un estudiante tiene un curso por año académico
+            return max(self.cursos, key=lambda c: (bool(c.activo), c.año_academico))
         return None
     
     def __repr__(self):
@@ -119,6 +129,10 @@ class Asignatura(db.Model):
     tareas = db.relationship('Tarea', backref='asignatura', lazy='dynamic')
     horarios = db.relationship('Horario', backref='asignatura', lazy='dynamic')
     
+    __table_args__ = (
+        db.Index('ix_asignatura_nombre_id', 'nombre', 'id'),
+    )
+    
     def __repr__(self):
         return f'<Asignatura {self.nombre}>'
 
@@ -132,11 +146,21 @@ class Tarea(db.Model):
     asignatura_id = db.Column(db.Integer, db.ForeignKey('asignatura.id'), nullable=False)
     profesor_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
     activa = db.Column(db.Boolean, default=True)
-    archivo_adjunto = db.Column(db.String(255))  # Ruta del archivo
+    archivo_adjunto = db.Column(db.String(255))  # Clave de contenido '<sha256>/<nombre>' 
+    
+    # Contadores desnormalizados (ver contadores.py)
+    total_entregas = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_calificadas = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_estudiantes = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Relaciones
     calificaciones = db.relationship('Calificacion', backref='tarea', lazy='dynamic')
     
+    __table_args__ = (
+        db.Index('ix_tarea_profesor_fecha_entrega', 'profesor_id', 'fecha_entrega', 'id'),
+        db.Index('ix_tarea_asignatura_fecha_entrega', 'asignatura_id', 'fecha_entrega', 'id'),
+    )
+    
     @property
     def esta_vencida(self):
         return datetime.utcnow() > self.fecha_entrega
@@ -144,6 +168,57 @@ class Tarea(db.Model):
     def __repr__(self):
         return f'<Tarea {self.titulo}>'
 
+class ArchivoContenido(db.Model):
+    """Contenido de un archivo subido, identificado por su SHA-256 (ver almacenamiento.py)"""
+    sha256 = db.Column(db.String(64), primary_key=True)
+    tamaño = db.Column(db.Integer, nullable=False)
+    referencias = db.Column(db.Integer, nullable=False, default=0)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ArchivoContenido {self.sha256[:12]} ({self.referencias} ref.)>'
+
+class FirmaContenido(db.Model):
+    """Firma MinHash del texto de un archivo subido, para encontrar entregas parecidas (ver similitud.py)"""
+    sha256 = db.Column(db.String(64), primary_key=True)  # Mismo hash que ArchivoContenido
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')  # pendiente, firmada, sin_texto
+    firma = db.Column(db.LargeBinary)  # array('I') con el mínimo de cada permutación
+    palabras = db.Column(db.Integer, nullable=False, default=0)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<FirmaContenido {self.sha256[:12]} ({self.estado})>'
+
+class VersionDatos(db.Model):
+    """Versión de los datos de cada modelo; sube con cada escritura (ver fragmentos.py)"""
+    etiqueta = db.Column(db.String(50), primary_key=True)  # Nombre del modelo
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class SesionCarga(db.Model):
+    """Subida por bloques en curso de una entrega (ver cargas.py)"""
+    id = db.Column(db.String(32), primary_key=True)  # Token aleatorio
+    estudiante_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False, index=True)
+    tarea_id = db.Column(db.Integer, db.ForeignKey('tarea.id'), nullable=False)
+    nombre = db.Column(db.String(200), nullable=False)  # Nombre original del archivo
+    tamaño = db.Column(db.Integer, nullable=False)
+    tamaño_bloque = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64))  # Checksum del archivo completo, si el cliente lo envía
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    @property
+    def total_bloques(self):
+        return (self.tamaño + self.tamaño_bloque - 1) // self.tamaño_bloque
+
+    def __repr__(self):
+        return f'<SesionCarga {self.id} ({self.nombre})>'
+
+class BloqueCarga(db.Model):
+    """Bloque ya recibido y verificado de una sesión de carga"""
+    sesion_id = db.Column(db.String(32), db.ForeignKey('sesion_carga.id'), primary_key=True)
+    indice = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False)
+
 class Calificacion(db.Model):
     """Modelo para calificaciones de estudiantes"""
     id = db.Column(db.Integer, primary_key=True)
@@ -152,12 +227,108 @@ class Calificacion(db.Model):
     nota = db.Column(db.Float, nullable=False)  # Nota de 0.0 a 5.0
     comentarios = db.Column(db.Text)
     fecha_calificacion = db.Column(db.DateTime, default=datetime.utcnow)
-    archivo_entrega = db.Column(db.String(255))  # Archivo entregado por el estudiante
+    archivo_entrega = db.Column(db.String(255))  # Clave de contenido del archivo entregado
     periodo = db.Column(db.String(50), nullable=False)  # Periodo académico
     
+    __table_args__ = (
+        db.Index('ix_calificacion_estudiante_fecha', 'estudiante_id', 'fecha_calificacion', 'id'),
+        # Nota de un estudiante en una tarea (bandeja) y calificaciones de una tarea
+        db.Index('ix_calificacion_tarea_estudiante', 'tarea_id', 'estudiante_id', 'nota'),
+    )
+    
     def __repr__(self):
         return f'<Calificacion {self.nota}>'
 
+class BandejaTarea(db.Model):
+    """Estado de cada tarea para cada estudiante del curso, precalculado (ver bandeja.py)"""
+    estudiante_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), primary_key=True)
+    tarea_id = db.Column(db.Integer, db.ForeignKey('tarea.id'), primary_key=True)
+    fecha_entrega = db.Column(db.DateTime, nullable=False)  # Copia de Tarea.fecha_entrega
+    activa = db.Column(db.Boolean, nullable=False, default=True)  # Copia de Tarea.activa
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')  # pendiente, entregada, calificada
+    nota = db.Column(db.Float)
+    
+    # Relaciones
+    tarea = db.relationship('Tarea')
+    
+    __table_args__ = (
+        db.Index('ix_bandeja_estudiante_fecha', 'estudiante_id', 'activa', 'fecha_entrega', 'tarea_id'),
+        db.Index('ix_bandeja_tarea', 'tarea_id'),
+    )
+    
+    @property
+    def entregada(self):
+        return self.estado != 'pendiente'
+    
+    @property
+    def vencida(self):
+        return self.estado == 'pendiente' and datetime.utcnow() > self.fecha_entrega
+
+class Notificacion(db.Model):
+    """Aviso para un usuario (p. ej. recordatorios de entrega, ver recordatorios.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
+    tipo = db.Column(db.String(30), nullable=False)  # recordatorio
+    mensaje = db.Column(db.Text, nullable=False)
+    leida = db.Column(db.Boolean, nullable=False, default=False)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_notificacion_usuario_leida', 'usuario_id', 'leida', 'id'),
+    )
+    
+    def __repr__(self):
+        return f'<Notificacion {self.tipo} ({self.usuario_id})>'
+
+class RecordatorioEnviado(db.Model):
+    """Recordatorio ya enviado: evita duplicados entre reinicios y entre procesos"""
+    tarea_id = db.Column(db.Integer, db.ForeignKey('tarea.id'), primary_key=True)
+    estudiante_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), primary_key=True)
+    horas = db.Column(db.Integer, primary_key=True)  # Anticipación del recordatorio
+    fecha_envio = db.Column(db.DateTime, default=datetime.utcnow)
+
+class AñoArchivado(db.Model):
+    """Año académico cerrado cuyas filas viven en un archivo aparte (ver archivo_historico.py)"""
+    año = db.Column(db.Integer, primary_key=True)
+    ruta = db.Column(db.String(255), nullable=False)
+    filas = db.Column(db.Integer, nullable=False, default=0)  # Filas movidas fuera de la base en uso
+    fecha_archivo = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<AñoArchivado {self.año}>'
+
+class Trabajo(db.Model):
+    """Trabajo en segundo plano de la cola persistente (ver trabajos.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)  # Nombre registrado con @trabajos.registrar
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')  # pendiente, en_curso, terminado, fallido
+    prioridad = db.Column(db.Integer, nullable=False, default=5)  # Menor = se atiende antes
+    argumentos = db.Column(db.Text)  # JSON
+    resultado = db.Column(db.Text)   # JSON
+    error = db.Column(db.Text)
+    progreso = db.Column(db.Integer, nullable=False, default=0)  # 0 a 100
+    mensaje = db.Column(db.String(200))
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    max_intentos = db.Column(db.Integer, nullable=False, default=3)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'))
+    trabajador = db.Column(db.String(100))  # Proceso e hilo que lo ejecuta
+    disponible_desde = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Espera antes de reintentar
+    latido = db.Column(db.DateTime)  # Última señal de vida del trabajador
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_inicio = db.Column(db.DateTime)
+    fecha_fin = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_trabajo_cola', 'estado', 'prioridad', 'id'),
+    )
+    
+    @property
+    def terminado(self):
+        return self.estado in ('terminado', 'fallido')
+    
+    def __repr__(self):
+        return f'<Trabajo {self.id} {self.tipo} ({self.estado})>'
+
 class Horario(db.Model):
     """Modelo para horarios de clases"""
     id = db.Column(db.Integer, primary_key=True)
@@ -181,6 +352,45 @@ class Horario(db.Model):
     def __repr__(self):
         return f'<Horario {self.dia_nombre} {self.hora_inicio}-{self.hora_fin}>'
 
+class ListaCurso(db.Model):
+    """Lista de estudiantes de un curso en un momento dado (ver asistencia.py)
+
+    Cada bit de una Asistencia corresponde a una posición de esta lista;
+    cuando la matrícula del curso cambia se crea una lista nueva y las
+    asistencias anteriores siguen apuntando a la suya.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    curso_id = db.Column(db.Integer, db.ForeignKey('curso.id'), nullable=False, index=True)
+    estudiantes = db.Column(db.LargeBinary, nullable=False)  # Ids ordenados, 4 bytes cada uno
+    tamaño = db.Column(db.Integer, nullable=False)
+    huella = db.Column(db.String(40), unique=True, nullable=False)  # SHA-1 de curso + estudiantes
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ListaCurso {self.id} curso={self.curso_id} ({self.tamaño})>'
+
+class Asistencia(db.Model):
+    """Asistencia de una clase en una fecha: un bit por estudiante de la lista del curso"""
+    horario_id = db.Column(db.Integer, db.ForeignKey('horario.id'), primary_key=True)
+    fecha = db.Column(db.Date, primary_key=True)
+    curso_id = db.Column(db.Integer, db.ForeignKey('curso.id'), nullable=False)
+    lista_id = db.Column(db.Integer, db.ForeignKey('lista_curso.id'), nullable=False)
+    ausentes = db.Column(db.LargeBinary, nullable=False)  # Bit i = estudiante i de la lista ausente
+    total_ausentes = db.Column(db.Integer, nullable=False, default=0)
+    profesor_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)  # Quien la tomó
+    fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relaciones
+    horario = db.relationship('Horario')
+    lista = db.relationship('ListaCurso')
+    
+    __table_args__ = (
+        db.Index('ix_asistencia_curso_fecha', 'curso_id', 'fecha'),
+    )
+    
+    def __repr__(self):
+        return f'<Asistencia horario={self.horario_id} {self.fecha} ({self.total_ausentes} ausentes)>'
+
 class NotificacionReemplazo(db.Model):
     """Modelo para notificaciones del sistema de reemplazo de profesores"""
     id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,169 @@
+# paginacion.py - Paginación por clave (keyset) con cursores opacos
+from datetime import date, datetime, time
+
+from flask import current_app
+from itsdangerous import BadData, URLSafeSerializer
+from sqlalchemy import and_, func, or_, select, tuple_
+from sqlalchemy.sql import operators
+
+# Dirección del cursor: páginas siguientes o anteriores a la clave guardada
+SIGUIENTE = 's'
+ANTERIOR = 'a'
+
+
+class Pagina:
+    """Una página de resultados y los cursores para moverse desde ella.
+
+    Se puede iterar como la lista de elementos. `total` solo se calcula si
+    se pide (ver paginar) y puede ser una cota: `total_exacto` indica si
+    hay más filas de las contadas.
+    """
+
+    def __init__(self, items, por_pagina, siguiente=None, anterior=None, total=None, total_exacto=True):
+        self.items = items
+        self.por_pagina = por_pagina
+        self.siguiente = siguiente
+        self.anterior = anterior
+        self.total = total
+        self.total_exacto = total_exacto
+
+    @property
+    def has_next(self):
+        return self.siguiente is not None
+
+    @property
+    def has_prev(self):
+        return self.anterior is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def _serializador():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='paginacion')
+
+
+def _codificar_valor(valor):
+    if isinstance(valor, datetime):
+        return ['dt', valor.isoformat()]
+    if isinstance(valor, date):
+        return ['d', valor.isoformat()]
+    if isinstance(valor, time):
+        return ['t', valor.isoformat()]
+    return valor
+
+
+def _decodificar_valor(valor):
+    if isinstance(valor, list):
+        tipo, texto = valor
+        return {'dt': datetime.fromisoformat, 'd': date.fromisoformat, 't': time.fromisoformat}[tipo](texto)
+    return valor
+
+
+def codificar_cursor(direccion, valores):
+    """Cursor firmado para la URL: el cliente lo trata como opaco y no puede alterarlo"""
+    return _serializador().dumps([direccion, [_codificar_valor(v) for v in valores]])
+
+
+def decodificar_cursor(cursor, columnas):
+    """(dirección, valores) del cursor, o None si falta, está alterado o no corresponde al orden"""
+    if not cursor:
+        return None
+    try:
+        direccion, valores = _serializador().loads(cursor)
+        valores = [_decodificar_valor(v) for v in valores]
+    except (BadData, ValueError, TypeError, KeyError):
+        return None
+    if direccion not in (SIGUIENTE, ANTERIOR) or len(valores) != len(columnas):
+        return None
+    return direccion, valores
+
+
+def _columnas_de_orden(orden):
+    """[(columna, descendente)] a partir de expresiones de order_by (columna o columna.desc())"""
+    columnas = []
+    for expresion in orden:
+        modificador = getattr(expresion, 'modifier', None)
+        if modificador in (operators.desc_op, operators.asc_op):
+            columnas.append((expresion.element, modificador is operators.desc_op))
+        else:
+            columnas.append((expresion, False))
+    return columnas
+
+
+def _despues_de(columnas, valores, invertir):
+    """Condición "la fila va después de `valores`" según el orden (o antes, si se invierte)"""
+    descendentes = {desc != invertir for _, desc in columnas}
+    if len(descendentes) == 1:
+        # Todas en el mismo sentido: comparación de tuplas, que aprovecha el índice compuesto
+        izquierda = tuple_(*[c for c, _ in columnas])
+        derecha = tuple_(*valores)
+        return izquierda < derecha if descendentes.pop() else izquierda > derecha
+    condiciones = []
+    for i, (columna, desc) in enumerate(columnas):
+        iguales = [c == v for (c, _), v in zip(columnas[:i], valores)]
+        comparacion = columna < valores[i] if desc != invertir else columna > valores[i]
+        condiciones.append(and_(*iguales, comparacion))
+    return or_(*condiciones)
+
+
+def _invertir(columna, desc):
+    return columna.asc() if desc else columna.desc()
+
+
+def contar_acotado(query, limite):
+    """(total, exacto): cuenta como máximo `limite` filas, así el costo no crece con el historial"""
+    subconsulta = query.order_by(None).limit(limite + 1).subquery()
+    total = query.session.execute(select(func.count()).select_from(subconsulta)).scalar()
+    return min(total, limite), total <= limite
+
+
+def paginar(query, orden, cursor=None, por_pagina=10, contar=None):
+    """Página de `query` ordenada por `orden` a partir de un cursor opaco.
+
+    `orden` son las columnas de ordenamiento (pueden llevar .desc()) y la
+    última debe hacer la clave única, normalmente el id. Las columnas no
+    deben admitir NULL. En lugar de OFFSET se filtra por la clave de la
+    última fila vista, de modo que la página 500 cuesta lo mismo que la
+    primera si hay un índice sobre esas columnas. Con `contar=N` también se
+    calcula el total, acotado a N filas (ver contar_acotado).
+    """
+    columnas = _columnas_de_orden(orden)
+    posicion = decodificar_cursor(cursor, columnas)
+    hacia_atras = posicion is not None and posicion[0] == ANTERIOR
+
+    consulta = query
+    if posicion is not None:
+        consulta = consulta.filter(_despues_de(columnas, posicion[1], invertir=hacia_atras))
+    if hacia_atras:
+        consulta = consulta.order_by(*[_invertir(c, desc) for c, desc in columnas])
+    else:
+        consulta = consulta.order_by(*orden)
+
+    filas = consulta.limit(por_pagina + 1).all()
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+    if hacia_atras:
+        filas.reverse()
+
+    def clave(fila):
+        return [getattr(fila, columna.key) for columna, _ in columnas]
+
+    siguiente = anterior = None
+    if filas:
+        # Hacia atrás siempre hay página siguiente (de ella venimos) y viceversa
+        if hay_mas or hacia_atras:
+            siguiente = codificar_cursor(SIGUIENTE, clave(filas[-1]))
+        if (hay_mas and hacia_atras) or (posicion is not None and not hacia_atras):
+            anterior = codificar_cursor(ANTERIOR, clave(filas[0]))
+
+    pagina = Pagina(filas, por_pagina, siguiente, anterior)
+    if contar:
+        pagina.total, pagina.total_exacto = contar_acotado(query, contar)
+    return pagina
@@ -9,9 +9,10 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app
-from models import db, Usuario, Curso, Asignatura, Tarea, Horario, Calificacion
+from models import db, Usuario, Curso, Asignatura, Tarea, Horario, Calificacion, BandejaTarea
 from datetime import datetime, date, time, timedelta
-from werkzeug.security import generate_password_hash
+from aprovisionamiento import crear_usuarios_masivo
+import contadores
 import random
 
 # Datos para generar estudiantes y profesores
@@ -72,6 +73,7 @@ def reiniciar_base_datos():
         
         # Eliminar relaciones primero
         db.session.execute(db.text("DELETE FROM usuario_curso"))
+        BandejaTarea.query.delete()
         
         # Eliminar registros
         Calificacion.query.delete()
@@ -126,7 +128,7 @@ def crear_profesores(app):
         ]
         
         emails_usados = set()
-        profesores_creados = 0
+        profesores = []
         
         for i in range(len(especialidades)):
             # Generar combinación única de nombre y apellido
@@ -149,25 +151,22 @@ def crear_profesores(app):
             if email in emails_usados:
                 email = f"{nombre_email}.{apellido_email}{i}@colegiocolombia.edu.co"
             
-            profesor = Usuario(
-                nombres=nombre,
-                apellidos=apellidos,
-                email=email,
-                password_hash=generate_password_hash('profesor123'),
-                role='profesor',
-                tipo_documento='C.C.',
-                numero_documento=f"1234567{80 + i:02d}",
-                telefono=f"300123456{i:02d}",
-                activo=True,
-                fecha_creacion=datetime.now()
-            )
-            
-            db.session.add(profesor)
-            profesores_creados += 1
+            profesores.append({
+                'nombres': nombre,
+                'apellidos': apellidos,
+                'email': email,
+                'password': 'profesor123',
+                'role': 'profesor',
+                'tipo_documento': 'C.C.',
+                'numero_documento': f"1234567{80 + i:02d}",
+                'telefono': f"300123456{i:02d}",
+                'activo': True,
+                'fecha_creacion': datetime.now()
+            })
             print(f"   👨‍🏫 Profesor creado: {nombre} {apellidos} - Especialidad: {especialidades[i]}")
         
-        db.session.commit()
-        print(f"   ✅ {profesores_creados} profesores creados")
+        resultado = crear_usuarios_masivo(profesores)
+        print(f"   ✅ {len(profesores)} profesores creados ({resultado})")
 
 def crear_estudiantes(app, num_estudiantes=50):
     """Crear estudiantes distribuidos en cursos"""
@@ -178,6 +177,7 @@ def crear_estudiantes(app, num_estudiantes=50):
         estudiantes_por_curso = num_estudiantes // len(cursos)
         
         emails_usados = set()
+        estudiantes = []
         estudiante_num = 1
         
         for curso in cursos:
@@ -204,25 +204,23 @@ def crear_estudiantes(app, num_estudiantes=50):
                 if email in emails_usados:
                     email = f"{nombre_email}.{apellido_email}{estudiante_num}@estudiante.colegiocolombia.edu.co"
                 
-                estudiante = Usuario(
-                    nombres=nombre,
-                    apellidos=apellidos,
-                    email=email,
-                    password_hash=generate_password_hash('estudiante123'),
-                    role='estudiante',
-                    tipo_documento='T.I.',
-                    numero_documento=f"9876543{estudiante_num:02d}",
-                    telefono=f"301987654{estudiante_num:02d}",
-                    activo=True,
-                    fecha_creacion=datetime.now()
-                )
-                
-                db.session.add(estudiante)
-                estudiante.cursos.append(curso)
+                estudiantes.append({
+                    'nombres': nombre,
+                    'apellidos': apellidos,
+                    'email': email,
+                    'password': 'estudiante123',
+                    'role': 'estudiante',
+                    'tipo_documento': 'T.I.',
+                    'numero_documento': f"9876543{estudiante_num:02d}",
+                    'telefono': f"301987654{estudiante_num:02d}",
+                    'activo': True,
+                    'fecha_creacion': datetime.now(),
+                    'curso_id': curso.id
+                })
                 estudiante_num += 1
         
-        db.session.commit()
-        print(f"   ✅ {num_estudiantes} estudiantes creados y distribuidos")
+        resultado = crear_usuarios_masivo(estudiantes)
+        print(f"   ✅ {len(estudiantes)} estudiantes creados y distribuidos ({resultado})")
 
 def crear_asignaturas(app):
     """Crear asignaturas por curso con profesores asignados"""
@@ -313,6 +311,8 @@ def crear_tareas_muestra(app):
                 db.session.add(tarea)
                 tareas_creadas += 1
         
+        db.session.flush()
+        contadores.reconciliar(db.session.connection())
         db.session.commit()
         print(f"   ✅ {tareas_creadas} tareas de muestra creadas")
 
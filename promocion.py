@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Cambio de año académico con sentencias sobre conjuntos.
+
+Copia al año nuevo los cursos, asignaturas y horarios activos del año
+anterior, matricula a cada estudiante activo en el curso del grado
+siguiente (misma sección), deja inactivos a los egresados de 11º y
+desactiva las filas del año anterior. Todo son INSERT … SELECT y UPDATE
+en una sola transacción: el costo no depende de recorrer filas en Python.
+
+Con `simular` se ejecuta lo mismo y se revierte, de modo que el resumen
+es exactamente lo que haría la promoción real:
+
+    python promocion.py 2025 2026 --simular   # Ver el resumen sin cambiar nada
+    python promocion.py 2025 2026             # Aplicar
+
+previsualizar() calcula el mismo resumen solo con SELECT (sin bloquear la
+base para escribir), para mostrarlo en la página del administrador.
+"""
+
+import argparse
+import sys
+import time
+
+from sqlalchemy import and_, case, exists, func, insert, literal, or_, select, union_all, update
+
+from config import Config
+from models import Usuario, Curso, Asignatura, Tarea, Horario, BandejaTarea, usuario_curso
+import fragmentos
+
+_curso = Curso.__table__
+_asignatura = Asignatura.__table__
+_horario = Horario.__table__
+_tarea = Tarea.__table__
+_usuario = Usuario.__table__
+_bandeja = BandejaTarea.__table__
+
+# Lo que cambia de versión para la caché de fragmentos
+_ETIQUETAS = {'Curso', 'Asignatura', 'Horario', 'Tarea', 'Usuario'}
+
+
+def _siguiente_grado(grado):
+    """Grado del año siguiente (NULL para el último: egresa)"""
+    grados = Config.GRADOS_DISPONIBLES
+    return case({actual: siguiente for actual, siguiente in zip(grados, grados[1:])}, value=grado, else_=None)
+
+
+def _cursos_origen(origen, curso=_curso):
+    return and_(curso.c.año_academico == origen, curso.c.activo == True)
+
+
+def _habra_curso(origen, destino, grado, seccion):
+    """El año destino tendrá el curso (grado, sección): ya existe o se copia de uno activo del origen"""
+    existente, copiado = _curso.alias(), _curso.alias()
+    return or_(
+        exists().where(existente.c.grado == grado, existente.c.seccion == seccion,
+                       existente.c.año_academico == destino),
+        exists().where(copiado.c.grado == grado, copiado.c.seccion == seccion, _cursos_origen(origen, copiado)),
+    )
+
+
+def _cursos_por_copiar(origen, destino):
+    nuevo = _curso.alias('nuevo')
+    return and_(
+        _cursos_origen(origen),
+        ~exists().where(nuevo.c.grado == _curso.c.grado, nuevo.c.seccion == _curso.c.seccion,
+                        nuevo.c.año_academico == destino)
+    )
+
+
+def _copiar_cursos(conexion, origen, destino):
+    seleccion = select(_curso.c.grado, _curso.c.seccion, literal(destino), literal(True)).where(
+        _cursos_por_copiar(origen, destino))
+    return conexion.execute(insert(_curso).from_select(
+        ['grado', 'seccion', 'año_academico', 'activo'], seleccion)).rowcount
+
+
+def _curso_destino(origen_curso, destino, grado=None):
+    """Alias del curso del año destino con la misma sección (y el grado indicado o el mismo)"""
+    nuevo = _curso.alias()
+    condicion = and_(nuevo.c.seccion == origen_curso.c.seccion,
+                     nuevo.c.grado == (origen_curso.c.grado if grado is None else grado),
+                     nuevo.c.año_academico == destino)
+    return nuevo, condicion
+
+
+def _copiar_asignaturas(conexion, origen, destino):
+    nuevo, mismo_curso = _curso_destino(_curso, destino)
+    existente = _asignatura.alias('existente')
+    seleccion = select(
+        _asignatura.c.nombre, _asignatura.c.descripcion, nuevo.c.id, _asignatura.c.profesor_id, literal(True)
+    ).select_from(
+        _asignatura.join(_curso, _curso.c.id == _asignatura.c.curso_id).join(nuevo, mismo_curso)
+    ).where(
+        _cursos_origen(origen),
+        _asignatura.c.activa == True,
+        ~exists().where(existente.c.curso_id == nuevo.c.id, existente.c.nombre == _asignatura.c.nombre)
+    )
+    return conexion.execute(insert(_asignatura).from_select(
+        ['nombre', 'descripcion', 'curso_id', 'profesor_id', 'activa'], seleccion)).rowcount
+
+
+def _copiar_horarios(conexion, origen, destino):
+    nuevo, mismo_curso = _curso_destino(_curso, destino)
+    nueva_asignatura = _asignatura.alias('nueva_asignatura')
+    existente = _horario.alias('existente')
+    seleccion = select(
+        _horario.c.dia_semana, _horario.c.hora_inicio, _horario.c.hora_fin, nuevo.c.id,
+        nueva_asignatura.c.id, _horario.c.profesor_id, _horario.c.aula, literal(True)
+    ).select_from(
+        _horario.join(_asignatura, _asignatura.c.id == _horario.c.asignatura_id)
+        .join(_curso, _curso.c.id == _horario.c.curso_id)
+        .join(nuevo, mismo_curso)
+        .join(nueva_asignatura, and_(nueva_asignatura.c.curso_id == nuevo.c.id,
+                                     nueva_asignatura.c.nombre == _asignatura.c.nombre))
+    ).where(
+        _cursos_origen(origen),
+        _horario.c.activo == True,
+        ~exists().where(existente.c.curso_id == nuevo.c.id, existente.c.dia_semana == _horario.c.dia_semana,
+                        existente.c.hora_inicio == _horario.c.hora_inicio)
+    )
+    return conexion.execute(insert(_horario).from_select(
+        ['dia_semana', 'hora_inicio', 'hora_fin', 'curso_id', 'asignatura_id', 'profesor_id', 'aula', 'activo'],
+        seleccion)).rowcount
+
+
+def _estudiantes_origen(origen):
+    """FROM/WHERE de las matrículas de estudiantes activos en los cursos del año origen"""
+    return (usuario_curso.join(_curso, _curso.c.id == usuario_curso.c.curso_id)
+            .join(_usuario, _usuario.c.id == usuario_curso.c.usuario_id),
+            and_(_cursos_origen(origen), _usuario.c.role == 'estudiante', _usuario.c.activo == True))
+
+
+def _por_promover(origen, destino, repitentes):
+    """(FROM, WHERE, grado destino) de las matrículas del origen que pasan a un curso del año destino"""
+    desde, condicion = _estudiantes_origen(origen)
+    grado = _siguiente_grado(_curso.c.grado)
+    if repitentes:
+        grado = case((usuario_curso.c.usuario_id.in_(repitentes), _curso.c.grado), else_=grado)
+    matricula = usuario_curso.alias('matricula')
+    curso_matricula = _curso.alias('curso_matricula')
+    ya_matriculado = exists().where(
+        matricula.c.usuario_id == usuario_curso.c.usuario_id,
+        matricula.c.curso_id == curso_matricula.c.id,
+        curso_matricula.c.año_academico == destino
+    )
+    return desde, and_(condicion, ~ya_matriculado), grado
+
+
+def _promover(conexion, origen, destino, repitentes):
+    """Matricular en el grado siguiente (o en el mismo, si repite); devuelve las matrículas nuevas"""
+    desde, condicion, grado = _por_promover(origen, destino, repitentes)
+    nuevo, curso_siguiente = _curso_destino(_curso, destino, grado)
+    seleccion = select(usuario_curso.c.usuario_id, nuevo.c.id).select_from(
+        desde.join(nuevo, curso_siguiente)).where(condicion)
+    return conexion.execute(insert(usuario_curso).from_select(['usuario_id', 'curso_id'], seleccion)).rowcount
+
+
+def _egresados(origen, repitentes):
+    desde, condicion = _estudiantes_origen(origen)
+    egresados = select(usuario_curso.c.usuario_id).select_from(desde).where(
+        condicion, _curso.c.grado == Config.GRADOS_DISPONIBLES[-1])
+    if repitentes:
+        egresados = egresados.where(usuario_curso.c.usuario_id.notin_(repitentes))
+    return _usuario.c.id.in_(egresados)
+
+
+def _egresar(conexion, origen, repitentes):
+    """Dejar inactivos a los estudiantes que terminan el último grado"""
+    return conexion.execute(update(_usuario).where(_egresados(origen, repitentes)).values(activo=False)).rowcount
+
+
+def _por_desactivar(origen):
+    """(clave del resumen, tabla, condición, columna) en el orden en que se desactivan"""
+    cursos = select(_curso.c.id).where(_cursos_origen(origen))
+    asignaturas = select(_asignatura.c.id).where(_asignatura.c.curso_id.in_(cursos))
+    tareas = select(_tarea.c.id).where(_tarea.c.asignatura_id.in_(asignaturas), _tarea.c.activa == True)
+    # Del más dependiente al menos: cada paso usa los cursos todavía activos
+    return [
+        ('bandeja_desactivada', _bandeja, and_(_bandeja.c.tarea_id.in_(tareas), _bandeja.c.activa == True), 'activa'),
+        ('tareas_desactivadas', _tarea, _tarea.c.id.in_(tareas), 'activa'),
+        ('horarios_desactivados', _horario, and_(_horario.c.curso_id.in_(cursos), _horario.c.activo == True), 'activo'),
+        ('asignaturas_desactivadas', _asignatura,
+         and_(_asignatura.c.id.in_(asignaturas), _asignatura.c.activa == True), 'activa'),
+        ('cursos_desactivados', _curso, _cursos_origen(origen), 'activo'),
+    ]
+
+
+def _desactivar_origen(conexion, origen):
+    return {clave: conexion.execute(update(tabla).where(condicion).values({columna: False})).rowcount
+            for clave, tabla, condicion, columna in _por_desactivar(origen)}
+
+
+def _matriculas_destino(origen, destino):
+    """(curso, curso anterior) de cada matrícula del año destino de alguien que estaba en el origen"""
+    anterior = _curso.alias('anterior')
+    matricula_anterior = usuario_curso.alias('matricula_anterior')
+    return select(_curso.c.grado, _curso.c.seccion, anterior.c.grado.label('grado_anterior'),
+                  anterior.c.seccion.label('seccion_anterior')).select_from(
+        _curso.join(usuario_curso, usuario_curso.c.curso_id == _curso.c.id)
+        .join(matricula_anterior, matricula_anterior.c.usuario_id == usuario_curso.c.usuario_id)
+        .join(anterior, and_(anterior.c.id == matricula_anterior.c.curso_id, anterior.c.año_academico == origen))
+    ).where(_curso.c.año_academico == destino)
+
+
+def _detalle(conexion, *matriculas):
+    """Estudiantes por curso del año destino y de qué curso del año origen vienen"""
+    m = (matriculas[0] if len(matriculas) == 1 else union_all(*matriculas)).subquery()
+    filas = conexion.execute(
+        select(m.c.grado, m.c.seccion, m.c.grado_anterior, m.c.seccion_anterior, func.count())
+        .group_by(m.c.grado, m.c.seccion, m.c.grado_anterior, m.c.seccion_anterior)
+    ).all()
+    orden = {grado: i for i, grado in enumerate(Config.GRADOS_DISPONIBLES)}
+    filas = sorted(filas, key=lambda f: (orden.get(f[0], len(orden)), f[1], orden.get(f[2], len(orden)), f[3]))
+    return [{'curso': grado + seccion, 'desde': grado_ant + seccion_ant, 'estudiantes': total}
+            for grado, seccion, grado_ant, seccion_ant, total in filas]
+
+
+def promover(conexion, origen, destino, repitentes=(), simular=False):
+    """Pasar del año `origen` al año `destino` en una transacción; devuelve el resumen.
+
+    `conexion` no debe tener una transacción abierta: la promoción abre la
+    suya y la confirma, o la revierte si `simular` es verdadero o algo falla.
+    Es idempotente: volver a ejecutarla no duplica cursos ni matrículas.
+    """
+    if destino <= origen:
+        raise ValueError('El año destino debe ser posterior al año origen')
+    repitentes = sorted(set(repitentes))
+    inicio = time.perf_counter()
+
+    transaccion = conexion.begin()
+    try:
+        activos = conexion.execute(select(func.count()).select_from(_curso).where(_cursos_origen(origen))).scalar()
+        if not activos:
+            raise ValueError(f'No hay cursos activos en {origen}')
+        resumen = {
+            'origen': origen,
+            'destino': destino,
+            'simulacion': simular,
+            'cursos_creados': _copiar_cursos(conexion, origen, destino),
+            'asignaturas_creadas': _copiar_asignaturas(conexion, origen, destino),
+            'horarios_creados': _copiar_horarios(conexion, origen, destino),
+            'matriculas_creadas': _promover(conexion, origen, destino, repitentes),
+            'egresados': _egresar(conexion, origen, repitentes),
+            'repitentes': len(repitentes),
+        }
+        resumen.update(_desactivar_origen(conexion, origen))
+        resumen['detalle'] = _detalle(conexion, _matriculas_destino(origen, destino))
+    except Exception:
+        transaccion.rollback()
+        raise
+    if simular:
+        transaccion.rollback()
+    else:
+        transaccion.commit()
+        fragmentos.tocar(_ETIQUETAS)
+    resumen['segundos'] = round(time.perf_counter() - inicio, 2)
+    return resumen
+
+
+def _contar(conexion, desde, *condiciones):
+    return conexion.execute(select(func.count()).select_from(desde).where(*condiciones)).scalar()
+
+
+def previsualizar(conexion, origen, destino, repitentes=()):
+    """El resumen de promover(..., simular=True) calculado solo con SELECT.
+
+    Lo que los pasos anteriores habrían insertado (los cursos de las
+    asignaturas y matrículas, las asignaturas de los horarios) se deduce de
+    las filas activas del origen, así que no se toma el bloqueo de escritura
+    ni cambia la versión de los datos y puede ir a la réplica de lectura.
+    Coincide con la simulación mientras el año destino no tenga dos cursos
+    con el mismo grado y sección.
+    """
+    if destino <= origen:
+        raise ValueError('El año destino debe ser posterior al año origen')
+    repitentes = sorted(set(repitentes))
+    inicio = time.perf_counter()
+    if not _contar(conexion, _curso, _cursos_origen(origen)):
+        raise ValueError(f'No hay cursos activos en {origen}')
+
+    # Asignaturas: las activas del origen cuyo curso destino no tiene ya una con ese nombre
+    curso_existente, mismo_curso = _curso_destino(_curso, destino)
+    existente = _asignatura.alias('existente')
+    asignaturas = _contar(
+        conexion, _asignatura.join(_curso, _curso.c.id == _asignatura.c.curso_id),
+        _cursos_origen(origen), _asignatura.c.activa == True,
+        ~exists().where(existente.c.curso_id == curso_existente.c.id, existente.c.nombre == _asignatura.c.nombre,
+                        mismo_curso)
+    )
+
+    # Horarios: la asignatura de destino existe o se copia de una activa del mismo curso del origen
+    curso_asignatura, mismo_curso_asignatura = _curso_destino(_curso, destino)
+    asignatura_destino = _asignatura.alias('asignatura_destino')
+    curso_copiado = _curso.alias('curso_copiado')
+    asignatura_copiada = _asignatura.alias('asignatura_copiada')
+    curso_horario, mismo_curso_horario = _curso_destino(_curso, destino)
+    horario_existente = _horario.alias('horario_existente')
+    horarios = _contar(
+        conexion,
+        _horario.join(_asignatura, _asignatura.c.id == _horario.c.asignatura_id)
+        .join(_curso, _curso.c.id == _horario.c.curso_id),
+        _cursos_origen(origen), _horario.c.activo == True,
+        or_(
+            exists().where(asignatura_destino.c.curso_id == curso_asignatura.c.id,
+                           asignatura_destino.c.nombre == _asignatura.c.nombre, mismo_curso_asignatura),
+            exists().where(asignatura_copiada.c.curso_id == curso_copiado.c.id,
+                           asignatura_copiada.c.nombre == _asignatura.c.nombre, asignatura_copiada.c.activa == True,
+                           curso_copiado.c.grado == _curso.c.grado, curso_copiado.c.seccion == _curso.c.seccion,
+                           _cursos_origen(origen, curso_copiado)),
+        ),
+        ~exists().where(horario_existente.c.curso_id == curso_horario.c.id, mismo_curso_horario,
+                        horario_existente.c.dia_semana == _horario.c.dia_semana,
+                        horario_existente.c.hora_inicio == _horario.c.hora_inicio)
+    )
+
+    desde, condicion, grado = _por_promover(origen, destino, repitentes)
+    promovidos = and_(condicion, _habra_curso(origen, destino, grado, _curso.c.seccion))
+    nuevas = select(grado.label('grado'), _curso.c.seccion, _curso.c.grado.label('grado_anterior'),
+                    _curso.c.seccion.label('seccion_anterior')).select_from(desde).where(promovidos)
+
+    resumen = {
+        'origen': origen,
+        'destino': destino,
+        'simulacion': True,
+        'cursos_creados': _contar(conexion, _curso, _cursos_por_copiar(origen, destino)),
+        'asignaturas_creadas': asignaturas,
+        'horarios_creados': horarios,
+        'matriculas_creadas': _contar(conexion, desde, promovidos),
+        'egresados': _contar(conexion, _usuario, _egresados(origen, repitentes)),
+        'repitentes': len(repitentes),
+    }
+    resumen.update({clave: _contar(conexion, tabla, condicion)
+                    for clave, tabla, condicion, _ in _por_desactivar(origen)})
+    resumen['detalle'] = _detalle(conexion, _matriculas_destino(origen, destino), nuevas)
+    resumen['segundos'] = round(time.perf_counter() - inicio, 2)
+    return resumen
+
+
+def imprimir_resumen(resumen):
+    titulo = 'SIMULACIÓN' if resumen['simulacion'] else 'PROMOCIÓN'
+    print(f"\n📅 {titulo} {resumen['origen']} → {resumen['destino']}")
+    print("=" * 50)
+    for clave in ('cursos_creados', 'asignaturas_creadas', 'horarios_creados', 'matriculas_creadas',
+                  'egresados', 'repitentes', 'cursos_desactivados', 'asignaturas_desactivadas',
+                  'horarios_desactivados', 'tareas_desactivadas', 'bandeja_desactivada'):
+        print(f"   {clave.replace('_', ' ').capitalize():<28} {resumen[clave]:>8,}")
+    if resumen['detalle']:
+        print("\n   Curso nuevo   ← Curso anterior   Estudiantes")
+        for fila in resumen['detalle']:
+            print(f"   {fila['curso']:<13} ← {fila['desde']:<16} {fila['estudiantes']:>11,}")
+    print(f"\n⏱️  {resumen['segundos']}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('origen', type=int, help='Año académico que termina')
+    parser.add_argument('destino', type=int, help='Año académico que empieza')
+    parser.add_argument('--simular', action='store_true', help='Mostrar el resumen sin aplicar cambios')
+    parser.add_argument('--repitente', type=int, action='append', default=[], metavar='ID',
+                        help='Id de un estudiante que repite el grado (se puede repetir la opción)')
+    args = parser.parse_args()
+
+    from app import create_app
+    from extensions import db
+    app = create_app()
+    with app.app_context():
+        # Sin invalidar cachés aquí: las de la aplicación están en otros procesos y
+        # descartan sus usuarios al ver la nueva versión de 'Usuario' (ver _ETIQUETAS)
+        try:
+            with db.engine.connect() as conexion:
+                resumen = promover(conexion, args.origen, args.destino, args.repitente, simular=args.simular)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 1
+    imprimir_resumen(resumen)
+    if args.simular:
+        print("ℹ️  Simulación: no se guardó ningún cambio")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
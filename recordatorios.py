@@ -0,0 +1,232 @@
+# recordatorios.py - Recordatorios de fechas de entrega programados en memoria
+import heapq
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from extensions import db
+from models import Tarea, BandejaTarea, Notificacion, RecordatorioEnviado
+import fragmentos
+
+# Programador del proceso actual (se inicia con la primera petición, ver init_app)
+_programador = None
+_lock_inicio = threading.Lock()
+
+
+class ProgramadorRecordatorios:
+    """Montículo de recordatorios pendientes atendido por un hilo.
+
+    Las fechas de entrega se leen una sola vez al iniciar; después cada
+    commit que crea, cambia o desactiva una tarea la reprograma (ver
+    _al_escribir). Las entradas viejas no se buscan en el montículo: al
+    salir se descartan si la fecha ya no es la vigente. Los recordatorios
+    que vencen dentro de la misma ventana se agrupan en un solo aviso por
+    estudiante, y RecordatorioEnviado evita repetirlos entre reinicios o si
+    hay varios procesos.
+    """
+
+    def __init__(self, app, horas=(24, 1), ventana=60):
+        self.app = app
+        self.horas = tuple(sorted(set(horas), reverse=True))
+        self.ventana = timedelta(seconds=ventana)
+        self._monticulo = []  # (momento de disparo, tarea_id, horas, fecha_entrega)
+        self._vigentes = {}   # tarea_id -> fecha_entrega actual de las tareas activas
+        self._condicion = threading.Condition()
+        self._hilo = None
+        self._detener = False
+
+    def cargar(self):
+        """Programar todas las tareas activas con entrega futura"""
+        with self.app.app_context():
+            filas = db.session.execute(select(Tarea.id, Tarea.fecha_entrega).where(
+                Tarea.activa == True,
+                Tarea.fecha_entrega > datetime.utcnow()
+            )).all()
+        for tarea_id, fecha_entrega in filas:
+            self.programar(tarea_id, fecha_entrega, True)
+        return len(filas)
+
+    def programar(self, tarea_id, fecha_entrega, activa):
+        """Reprogramar una tarea; con activa=False sus recordatorios se descartan"""
+        with self._condicion:
+            if not activa or fecha_entrega is None:
+                self._vigentes.pop(tarea_id, None)
+                return
+            if self._vigentes.get(tarea_id) == fecha_entrega:
+                return
+            self._vigentes[tarea_id] = fecha_entrega
+            for horas in self.horas:
+                heapq.heappush(self._monticulo,
+                               (fecha_entrega - timedelta(hours=horas), tarea_id, horas, fecha_entrega))
+            self._condicion.notify()
+
+    def iniciar(self):
+        self.cargar()
+        self._hilo = threading.Thread(target=self._ejecutar, name='recordatorios', daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        with self._condicion:
+            self._detener = True
+            self._condicion.notify()
+        if self._hilo:
+            self._hilo.join()
+
+    def _ejecutar(self):
+        while True:
+            with self._condicion:
+                if self._detener:
+                    return
+                espera = 300.0
+                if self._monticulo:
+                    proximo = self._monticulo[0][0] - self.ventana
+                    espera = min(espera, (proximo - datetime.utcnow()).total_seconds())
+                if espera > 0:
+                    self._condicion.wait(espera)
+                    continue
+            try:
+                self.procesar()
+            except Exception:
+                self.app.logger.exception('Error enviando recordatorios de entrega')
+
+    def procesar(self, ahora=None):
+        """Enviar los recordatorios que vencen dentro de la ventana; devuelve cuántos avisos se crearon"""
+        ahora = ahora or datetime.utcnow()
+        limite = ahora + self.ventana
+        vencidos = {}  # tarea_id -> (fecha_entrega, horas que tocan)
+        with self._condicion:
+            while self._monticulo and self._monticulo[0][0] <= limite:
+                _, tarea_id, horas, fecha_entrega = heapq.heappop(self._monticulo)
+                if self._vigentes.get(tarea_id) != fecha_entrega or fecha_entrega <= ahora:
+                    continue  # Tarea editada, desactivada o ya vencida
+                vencidos.setdefault(tarea_id, (fecha_entrega, set()))[1].add(horas)
+        if not vencidos:
+            return 0
+        with self.app.app_context():
+            try:
+                return _enviar(vencidos, self.programar)
+            except IntegrityError:
+                # Otro proceso envió los mismos recordatorios al mismo tiempo
+                return 0
+
+
+def _enviar(vencidos, programar=None):
+    """Crear un aviso por estudiante con todas sus tareas por vencer (una transacción).
+
+    El montículo es de cada proceso y solo se reprograma en el que hizo el
+    commit: antes de enviar se compara la fecha con la de la base. Una tarea
+    que otro proceso cambió o desactivó no se avisa (ni se marca como
+    enviada) y se reprograma con `programar` según lo que dice la base.
+    """
+    with db.engine.begin() as conexion:
+        actuales = {tarea_id: (fecha_entrega, activa) for tarea_id, fecha_entrega, activa in conexion.execute(
+            select(Tarea.id, Tarea.fecha_entrega, Tarea.activa).where(Tarea.id.in_(list(vencidos)))
+        )}
+        for tarea_id in list(vencidos):
+            fecha_entrega, activa = actuales.get(tarea_id, (None, False))
+            if not activa or fecha_entrega != vencidos[tarea_id][0]:
+                del vencidos[tarea_id]
+                if programar is not None:
+                    programar(tarea_id, fecha_entrega, bool(activa))
+        if not vencidos:
+            return 0
+        tarea_ids = list(vencidos)
+
+        pendientes = conexion.execute(
+            select(BandejaTarea.estudiante_id, BandejaTarea.tarea_id, Tarea.titulo)
+            .join(Tarea, Tarea.id == BandejaTarea.tarea_id)
+            .where(BandejaTarea.tarea_id.in_(tarea_ids),
+                   BandejaTarea.activa == True,
+                   BandejaTarea.estado == 'pendiente')
+            .order_by(BandejaTarea.estudiante_id, Tarea.fecha_entrega)
+        ).all()
+        enviados = set(conexion.execute(
+            select(RecordatorioEnviado.tarea_id, RecordatorioEnviado.estudiante_id, RecordatorioEnviado.horas)
+            .where(RecordatorioEnviado.tarea_id.in_(tarea_ids))
+        ).all())
+
+        por_estudiante, registros = {}, []
+        for estudiante_id, tarea_id, titulo in pendientes:
+            fecha_entrega, horas = vencidos[tarea_id]
+            nuevas = [h for h in horas if (tarea_id, estudiante_id, h) not in enviados]
+            if not nuevas:
+                continue
+            registros.extend({'tarea_id': tarea_id, 'estudiante_id': estudiante_id, 'horas': h} for h in nuevas)
+            # Si coinciden varios (p. ej. 24 h y 1 h tras un reinicio) se avisa solo el más cercano
+            if min(horas) in nuevas:
+                por_estudiante.setdefault(estudiante_id, []).append((titulo, fecha_entrega))
+
+        if registros:
+            conexion.execute(insert(RecordatorioEnviado.__table__), registros)
+        if por_estudiante:
+            conexion.execute(insert(Notificacion.__table__), [
+                {'usuario_id': estudiante_id, 'tipo': 'recordatorio', 'mensaje': _mensaje(tareas),
+                 'leida': False, 'fecha_creacion': datetime.utcnow()}
+                for estudiante_id, tareas in por_estudiante.items()
+            ])
+    if por_estudiante:
+        fragmentos.tocar({'Notificacion'})
+    return len(por_estudiante)
+
+
+def _mensaje(tareas):
+    if len(tareas) == 1:
+        titulo, fecha = tareas[0]
+        return f'La tarea "{titulo}" vence el {fecha.strftime("%d/%m/%Y a las %H:%M")}.'
+    lineas = [f'Tienes {len(tareas)} tareas por entregar pronto:']
+    lineas.extend(f'- {titulo} (vence el {fecha.strftime("%d/%m/%Y a las %H:%M")})' for titulo, fecha in tareas)
+    return '\n'.join(lineas)
+
+
+def _al_escribir(session, contexto):
+    """after_flush: anotar las tareas cuya fecha o estado cambió, para reprogramarlas al confirmar"""
+    cambios = session.info.setdefault('recordatorios', {})
+    for tarea in session.deleted:
+        if isinstance(tarea, Tarea):
+            cambios[tarea.id] = (None, False)
+    for tarea in (*session.new, *session.dirty):
+        if isinstance(tarea, Tarea) and tarea not in session.deleted:
+            cambios[tarea.id] = (tarea.fecha_entrega, bool(tarea.activa))
+
+
+def _al_confirmar(session):
+    cambios = session.info.pop('recordatorios', None)
+    if cambios and _programador is not None:
+        for tarea_id, (fecha_entrega, activa) in cambios.items():
+            _programador.programar(tarea_id, fecha_entrega, activa)
+
+
+def _al_revertir(session):
+    session.info.pop('recordatorios', None)
+
+
+def iniciar(app):
+    """Crear y arrancar el programador de este proceso (una sola vez)"""
+    global _programador
+    with _lock_inicio:
+        if _programador is None:
+            programador = ProgramadorRecordatorios(
+                app,
+                horas=app.config.get('RECORDATORIOS_HORAS', (24, 1)),
+                ventana=app.config.get('RECORDATORIOS_VENTANA', 60)
+            )
+            programador.iniciar()
+            _programador = programador
+    return _programador
+
+
+def init_app(app):
+    """Arrancar el programador con la primera petición (los scripts no lo inician)"""
+    if not event.contains(Session, 'after_flush', _al_escribir):
+        event.listen(Session, 'after_flush', _al_escribir)
+        event.listen(Session, 'after_commit', _al_confirmar)
+        event.listen(Session, 'after_rollback', _al_revertir)
+
+    if not app.config.get('RECORDATORIOS', True) or app.testing:
+        return
+
+    @app.before_request
+    def iniciar_recordatorios():
+        if _programador is None:
+            iniciar(app)
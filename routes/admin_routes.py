@@ -1,9 +1,21 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort, send_file, Response, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
 from flask_login import login_required, current_user
 from functools import wraps
-from models import Usuario, Curso, Asignatura, Tarea, Calificacion, Horario, NotificacionReemplazo, usuario_curso
-from forms import RegistroUsuarioForm, CursoForm, AsignaturaForm, HorarioForm, AusenciaProfesorForm, FiltroProfesorForm
+from models import Usuario, Curso, Asignatura, Tarea, Calificacion, Horario, NotificacionReemplazo, Trabajo, usuario_curso
+from forms import RegistroUsuarioForm, ImportarUsuariosForm, CursoForm, AsignaturaForm, HorarioForm, AusenciaProfesorForm, FiltroProfesorForm
 from extensions import db
+from autenticacion import invalidar_usuario, invalidar_todos
+from almacenamiento import liberar
+from lectura import solo_lectura
+from fragmentos import perezoso
+from paginacion import paginar
+from routes.trabajos_routes import respuesta_encolado
+import trabajos
+import promocion
+import archivo_historico
+import contadores
+import dialecto
+import lectura
 from datetime import datetime, date
 import os
 
@@ -24,30 +36,31 @@ def admin_required(f):
 @admin_required
 def dashboard():
     """Dashboard principal del administrador"""
-    total_usuarios = Usuario.query.count()
-    total_estudiantes = Usuario.query.filter_by(role='estudiante').count()
-    total_profesores = Usuario.query.filter_by(role='profesor').count()
-    total_cursos = Curso.query.count()
-    total_asignaturas = Asignatura.query.count()
-    total_tareas = Tarea.query.count()
+    # Los datos se consultan solo si el fragmento de la plantilla no está en caché
+    total_usuarios = perezoso(lambda: Usuario.query.count())
+    total_estudiantes = perezoso(lambda: Usuario.query.filter_by(role='estudiante').count())
+    total_profesores = perezoso(lambda: Usuario.query.filter_by(role='profesor').count())
+    total_cursos = perezoso(lambda: Curso.query.count())
+    total_asignaturas = perezoso(lambda: Asignatura.query.count())
+    total_tareas = perezoso(lambda: Tarea.query.count())
     
     # Obtener estadísticas recientes
-    usuarios_recientes = Usuario.query.order_by(Usuario.id.desc()).limit(5).all()
-    ausencias_hoy = NotificacionReemplazo.query.filter(
+    usuarios_recientes = perezoso(lambda: Usuario.query.order_by(Usuario.id.desc()).limit(5).all())
+    ausencias_hoy = perezoso(lambda: NotificacionReemplazo.query.filter(
         NotificacionReemplazo.fecha_ausencia >= datetime.now().date()
-    ).count()
+    ).count())
     
     # Notificaciones pendientes de reemplazo
-    notificaciones_pendientes = NotificacionReemplazo.query.filter(
+    notificaciones_pendientes = perezoso(lambda: NotificacionReemplazo.query.filter(
         NotificacionReemplazo.estado == 'pendiente',
         NotificacionReemplazo.fecha_ausencia >= datetime.now().date()
-    ).count()
+    ).count())
     
     # Profesores activos disponibles para reemplazo
-    profesores_disponibles = Usuario.query.filter(
+    profesores_disponibles = perezoso(lambda: Usuario.query.filter(
         Usuario.role == 'profesor',
         Usuario.activo == True
-    ).count()
+    ).count())
     
     return render_template('admin/dashboard.html', 
                          total_usuarios=total_usuarios,
@@ -66,7 +79,7 @@ def dashboard():
 @admin_required
 def usuarios():
     """Listar todos los usuarios con paginación y filtros"""
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     per_page = 10
     
     # Filtros
@@ -85,9 +98,8 @@ def usuarios():
             (Usuario.email.contains(search))
         )
     
-    usuarios_paginados = query.order_by(Usuario.apellidos, Usuario.nombres).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    usuarios_paginados = paginar(query, (Usuario.apellidos, Usuario.nombres, Usuario.id),
+                                 cursor=cursor, por_pagina=per_page, contar=1000)
     
     return render_template('admin/usuarios.html', 
                          usuarios=usuarios_paginados,
@@ -150,6 +162,61 @@ def nuevo_usuario():
     
     return render_template('admin/usuario_form.html', form=form, title="Nuevo Usuario")
 
+@admin_bp.route('/usuarios/importar', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def importar_usuarios():
+    """Importar usuarios en bloque desde un CSV"""
+    from aprovisionamiento import leer_usuarios_csv, crear_usuarios_masivo
+    
+    form = ImportarUsuariosForm()
+    
+    if form.validate_on_submit():
+        try:
+            usuarios = leer_usuarios_csv(form.archivo.data.read())
+        except (UnicodeDecodeError, ValueError) as e:
+            flash(f'No se pudo leer el archivo: {str(e)}', 'error')
+            return render_template('admin/importar_usuarios.html', form=form)
+        
+        # Validar campos obligatorios, cursos y duplicados antes de insertar
+        # (la contraseña también: una por defecto sería conocida por cualquiera)
+        obligatorios = ('nombres', 'apellidos', 'email', 'tipo_documento', 'numero_documento', 'role', 'password')
+        cursos = {u['curso_id'] for u in usuarios if u.get('curso_id')}
+        if cursos:
+            cursos = {curso_id for (curso_id,) in db.session.query(Curso.id).filter(Curso.id.in_(cursos))}
+        errores = []
+        for i, u in enumerate(usuarios, start=2):
+            faltantes = [c for c in obligatorios if not u.get(c)]
+            if faltantes:
+                errores.append(f"Fila {i}: faltan {', '.join(faltantes)}")
+            elif u['role'] not in ('estudiante', 'profesor', 'admin'):
+                errores.append(f"Fila {i}: rol '{u['role']}' no válido")
+            elif len(u['password']) < 6:
+                errores.append(f"Fila {i}: la contraseña debe tener al menos 6 caracteres")
+            elif u.get('curso_id') and u['curso_id'] not in cursos:
+                errores.append(f"Fila {i}: el curso {u['curso_id']} no existe")
+        
+        emails = [u.get('email') for u in usuarios]
+        documentos = [u.get('numero_documento') for u in usuarios]
+        if len(set(emails)) != len(emails) or len(set(documentos)) != len(documentos):
+            errores.append('El archivo contiene emails o documentos repetidos')
+        existentes = Usuario.query.filter(
+            Usuario.email.in_(emails) | Usuario.numero_documento.in_(documentos)
+        ).count()
+        if existentes:
+            errores.append(f'{existentes} usuarios del archivo ya existen en el sistema')
+        
+        if errores:
+            for error in errores[:10]:
+                flash(error, 'error')
+            return render_template('admin/importar_usuarios.html', form=form)
+        
+        resultado = crear_usuarios_masivo(usuarios)
+        flash(f'Importación completada: {resultado}', 'success')
+        return redirect(url_for('admin.usuarios'))
+    
+    return render_template('admin/importar_usuarios.html', form=form)
+
 @admin_bp.route('/usuarios/<int:id>')
 @login_required
 @admin_required
@@ -220,6 +287,7 @@ def editar_usuario(id):
             usuario.materia_especialidad = None
         
         db.session.commit()
+        invalidar_usuario(usuario.id)
         flash(f'Usuario {usuario.nombres} {usuario.apellidos} actualizado exitosamente.', 'success')
         return redirect(url_for('admin.usuarios'))
     
@@ -235,8 +303,18 @@ def eliminar_usuario(id):
         abort(404)
     
     nombre_completo = f"{usuario.nombres} {usuario.apellidos}"
+    # Las entregas del estudiante se borran con él: cada archivo pierde su referencia
+    calificaciones = usuario.calificaciones.all()
+    for calificacion in calificaciones:
+        if calificacion.archivo_entrega:
+            liberar(calificacion.archivo_entrega)
+        db.session.delete(calificacion)
     db.session.delete(usuario)
+    db.session.flush()
+    if calificaciones:
+        contadores.reconciliar(db.session.connection(), {c.tarea_id for c in calificaciones})
     db.session.commit()
+    invalidar_usuario(id)
     
     flash(f'Usuario {nombre_completo} eliminado exitosamente.', 'success')
     return redirect(url_for('admin.usuarios'))
@@ -343,7 +421,7 @@ def eliminar_curso(id):
 @admin_required
 def asignaturas():
     """Listar todas las asignaturas con filtros"""
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     per_page = 10
     
     # Filtros
@@ -358,9 +436,8 @@ def asignaturas():
     if curso_filter:
         query = query.filter_by(curso_id=curso_filter)
     
-    asignaturas_paginadas = query.order_by(Asignatura.nombre).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    asignaturas_paginadas = paginar(query, (Asignatura.nombre, Asignatura.id),
+                                    cursor=cursor, por_pagina=per_page)
     
     # Para los filtros
     profesores = Usuario.query.filter_by(role='profesor').order_by(Usuario.apellidos, Usuario.nombres).all()
@@ -510,40 +587,59 @@ def reportar_ausencia():
     form.profesor_id.choices = [(p.id, f"{p.nombres} {p.apellidos}") for p in profesores]
     
     if form.validate_on_submit():
-        # Buscar horarios afectados
-        dia_semana = form.fecha_ausencia.data.strftime('%A')
-        horarios_afectados = Horario.query.filter_by(
+        # La búsqueda de reemplazos corre en segundo plano (ver trabajo_reportar_ausencia)
+        trabajo = trabajos.encolar(
+            'reportar_ausencia',
+            prioridad=trabajos.PRIORIDAD_ALTA,
+            usuario_id=current_user.id,
             profesor_id=form.profesor_id.data,
-            dia_semana=dia_semana,
-            activo=True
-        ).all()
-        
-        for horario in horarios_afectados:
-            # Buscar profesor de reemplazo
-            profesor_reemplazo = buscar_profesor_reemplazo(horario)
-            
-            # Crear notificación
-            notificacion = NotificacionReemplazo(
-                profesor_ausente_id=form.profesor_id.data,
-                profesor_reemplazo_id=profesor_reemplazo.id if profesor_reemplazo else None,
-                horario_id=horario.id,
-                fecha_ausencia=form.fecha_ausencia.data,
-                motivo_ausencia=form.motivo.data,
-                estado='pendiente' if profesor_reemplazo else 'sin_reemplazo'
-            )
-            
-            db.session.add(notificacion)
-        
-        db.session.commit()
-        
-        total_horarios = len(horarios_afectados)
-        reemplazos_encontrados = sum(1 for h in horarios_afectados if buscar_profesor_reemplazo(h))
-        
-        flash(f'Ausencia reportada. {reemplazos_encontrados} de {total_horarios} clases tienen reemplazo asignado.', 'info')
-        return redirect(url_for('admin.horarios'))
+            fecha_ausencia=form.fecha_ausencia.data.isoformat(),
+            motivo=form.motivo.data
+        )
+        return respuesta_encolado(trabajo, 'Ausencia reportada. Buscando profesores de reemplazo...')
     
     return render_template('admin/reportar_ausencia.html', form=form)
 
+@trabajos.registrar('reportar_ausencia')
+def trabajo_reportar_ausencia(contexto, profesor_id, fecha_ausencia, motivo=None):
+    """Crear las notificaciones de reemplazo de las clases afectadas por una ausencia"""
+    fecha = date.fromisoformat(fecha_ausencia)
+    horarios_afectados = Horario.query.filter_by(
+        profesor_id=profesor_id,
+        dia_semana=fecha.weekday(),
+        activo=True
+    ).order_by(Horario.hora_inicio).all()
+    
+    # En un reintento no se duplican las notificaciones ya creadas
+    ya_notificados = {n.horario_id for n in NotificacionReemplazo.query.filter_by(
+        profesor_ausente_id=profesor_id, fecha_ausencia=fecha
+    )}
+    
+    # Primero solo lecturas: el avance se guarda mientras la sesión no tiene escrituras pendientes
+    reemplazos = []
+    for i, horario in enumerate(horarios_afectados, 1):
+        if horario.id not in ya_notificados:
+            reemplazos.append((horario, buscar_profesor_reemplazo(horario)))
+        contexto.progreso(90 * i // len(horarios_afectados), f'Clase {i} de {len(horarios_afectados)}')
+    
+    for horario, profesor_reemplazo in reemplazos:
+        if profesor_reemplazo:
+            db.session.add(NotificacionReemplazo(
+                profesor_ausente_id=profesor_id,
+                profesor_reemplazo_id=profesor_reemplazo.id,
+                horario_id=horario.id,
+                fecha_ausencia=fecha,
+                mensaje=motivo
+            ))
+    db.session.commit()
+    
+    reemplazos_encontrados = len(ya_notificados) + sum(1 for _, p in reemplazos if p)
+    return {
+        'clases_afectadas': len(horarios_afectados),
+        'con_reemplazo': reemplazos_encontrados,
+        'sin_reemplazo': len(horarios_afectados) - reemplazos_encontrados
+    }
+
 def buscar_profesor_reemplazo(horario):
     """
     Algoritmo para buscar profesor de reemplazo
@@ -655,6 +751,7 @@ def rechazar_reemplazo(id):
 @admin_bp.route('/reportes')
 @login_required
 @admin_required
+@solo_lectura
 def reportes():
     """Panel de reportes y estadísticas"""
     from sqlalchemy import func
@@ -710,7 +807,10 @@ def reportes():
         Asignatura, Tarea.asignatura_id == Asignatura.id
     ).order_by(Calificacion.fecha_calificacion.desc()).limit(10).all()
     
+    años_academicos = [fila[0] for fila in db.session.query(Curso.año_academico).distinct().order_by(Curso.año_academico.desc())]
+    
     return render_template('admin/reportes.html',
+                         años_academicos=años_academicos,
                          total_usuarios=total_usuarios,
                          total_estudiantes=total_estudiantes,
                          total_profesores=total_profesores,
@@ -731,14 +831,14 @@ def configuracion():
     from datetime import datetime
     
     # Información del sistema
-    db_path = os.path.join(current_app.instance_path, 'database.db')
-    db_size = os.path.getsize(db_path) if os.path.exists(db_path) else 0
+    db_size = dialecto.tamaño_base(db.session.connection()) or 0
     db_size_mb = round(db_size / (1024 * 1024), 2)
     
     # Información de la aplicación
+    ultimo_backup = Trabajo.query.filter_by(tipo='backup', estado=trabajos.TERMINADO).order_by(Trabajo.id.desc()).first()
     app_info = {
         'version': '1.0.0',
-        'ultimo_backup': None,  # Se puede implementar
+        'ultimo_backup': ultimo_backup.fecha_fin if ultimo_backup else None,
         'uptime': datetime.now(),
         'bd_tamaño': db_size_mb
     }
@@ -746,70 +846,174 @@ def configuracion():
     return render_template('admin/configuracion.html', app_info=app_info)
 
 
-@admin_bp.route('/configuracion/backup')
+@admin_bp.route('/configuracion/backup', methods=['POST'])
 @login_required
 @admin_required
 def crear_backup():
-    """Crear backup de la base de datos"""
+    """Encolar un backup de la base de datos"""
+    trabajo = trabajos.encolar('backup', usuario_id=current_user.id)
+    return respuesta_encolado(trabajo, 'Backup en preparación. La descarga aparecerá al terminar.')
+
+@trabajos.registrar('backup', max_intentos=2)
+def trabajo_backup(contexto):
+    """Copia consistente aunque haya escrituras: API de backup de SQLite o pg_dump en PostgreSQL"""
     import shutil
-    from datetime import datetime
+    import sqlite3
+    import subprocess
+    
+    motor = db.engine.url.get_backend_name()
+    if motor not in ('sqlite', 'postgresql'):
+        raise RuntimeError(f'El backup desde la aplicación no está disponible para {motor}')
+    
+    extension = 'db' if motor == 'sqlite' else 'dump'
+    backup_filename = f'backup_colegio_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+    backup_path = os.path.join(contexto.carpeta, backup_filename)
+    
+    contexto.progreso(10, 'Copiando la base de datos...')
+    if motor == 'postgresql':
+        pg_dump = shutil.which('pg_dump')
+        if not pg_dump:
+            raise RuntimeError('pg_dump no está instalado en el servidor')
+        # La contraseña va por el entorno: en los argumentos la verían `ps` y el error del trabajo
+        from sqlalchemy.engine import URL
+        url = db.engine.url
+        sin_clave = URL.create('postgresql', username=url.username, host=url.host, port=url.port,
+                               database=url.database, query=url.query)
+        entorno = {**os.environ, 'PGPASSWORD': url.password or ''}
+        try:
+            subprocess.run([pg_dump, '--format=custom', f'--file={backup_path}',
+                            sin_clave.render_as_string(hide_password=False)],
+                           check=True, capture_output=True, env=entorno)
+        except subprocess.CalledProcessError as e:
+            detalle = e.stderr.decode('utf-8', 'replace').strip()
+            raise RuntimeError(f'pg_dump terminó con código {e.returncode}: {detalle}') from None
+    else:
+        conexion = db.engine.raw_connection()
+        try:
+            destino = sqlite3.connect(backup_path)
+            with destino:
+                conexion.driver_connection.backup(destino)
+            destino.close()
+        finally:
+            conexion.close()
+    
+    return {'archivo': backup_filename, 'tamaño_mb': round(os.path.getsize(backup_path) / (1024 * 1024), 2)}
+
+
+@admin_bp.route('/reportes/exportar-calificaciones', methods=['POST'])
+@login_required
+@admin_required
+def exportar_calificaciones():
+    """Encolar la exportación de calificaciones de uno o varios años (incluidos los archivados)"""
+    años = sorted({int(a) for a in request.form.getlist('año') if a.isdigit()})
+    if not años:
+        flash('Selecciona al menos un año académico', 'error')
+        return redirect(url_for('admin.reportes'))
+    trabajo = trabajos.encolar('exportar_calificaciones', usuario_id=current_user.id, años=años)
+    return respuesta_encolado(trabajo, 'Exportación de calificaciones en preparación.')
+
+@trabajos.registrar('exportar_calificaciones')
+@solo_lectura
+def trabajo_exportar_calificaciones(contexto, años):
+    """CSV de calificaciones por año; los años archivados se leen de su archivo"""
+    import csv
+    from sqlalchemy import literal, select
+    
+    def consulta(t, año):
+        c, ta, a, cu, u = t['calificacion'], t['tarea'], t['asignatura'], t['curso'], t['usuario']
+        return select(
+            literal(año).label('año'), cu.c.grado, cu.c.seccion, u.c.numero_documento, u.c.apellidos, u.c.nombres,
+            a.c.nombre, ta.c.titulo, c.c.periodo, c.c.nota, c.c.fecha_calificacion
+        ).select_from(
+            c.join(ta, ta.c.id == c.c.tarea_id).join(a, a.c.id == ta.c.asignatura_id)
+            .join(cu, cu.c.id == a.c.curso_id).join(u, u.c.id == c.c.estudiante_id)
+        ).where(cu.c.año_academico == año, c.c.nota > 0)
+    
+    nombre = f'calificaciones_{años[0]}' + (f'_{años[-1]}' if len(años) > 1 else '') + '.csv'
+    with open(os.path.join(contexto.carpeta, nombre), 'w', newline='', encoding='utf-8') as archivo, \
+            archivo_historico.adjuntos(años, lectura.motor()) as conexion:
+        writer = csv.writer(archivo)
+        writer.writerow(['Año', 'Grado', 'Sección', 'Documento', 'Apellidos', 'Nombres',
+                         'Asignatura', 'Tarea', 'Periodo', 'Nota', 'Fecha'])
+        filas = dialecto.copiar_a(conexion, archivo_historico.union_años(consulta, años), archivo)
+    
+    return {'archivo': nombre, 'filas': filas}
+
+@admin_bp.route('/promocion', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def promocion_año():
+    """Cambio de año académico: resumen simulado y confirmación"""
+    from sqlalchemy import func
     
-    try:
-        # Crear nombre del backup con timestamp
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_filename = f'backup_colegio_{timestamp}.db'
-        
-        # Rutas
-        db_path = os.path.join(current_app.instance_path, 'database.db')
-        backup_path = os.path.join(current_app.instance_path, backup_filename)
-        
-        # Copiar base de datos
-        shutil.copy2(db_path, backup_path)
-        
-        flash(f'Backup creado exitosamente: {backup_filename}', 'success')
-        return send_file(backup_path, as_attachment=True, download_name=backup_filename)
-        
-    except Exception as e:
-        flash(f'Error al crear backup: {str(e)}', 'error')
-        return redirect(url_for('admin.configuracion'))
+    año_actual = db.session.query(func.max(Curso.año_academico)).filter(Curso.activo == True).scalar()
+    origen = request.values.get('origen', type=int) or año_actual
+    destino = request.values.get('destino', type=int) or (origen + 1 if origen else None)
+    
+    if request.method == 'POST':
+        trabajo = trabajos.encolar('promocion', prioridad=trabajos.PRIORIDAD_ALTA, usuario_id=current_user.id,
+                                   origen=origen, destino=destino)
+        return respuesta_encolado(trabajo, f'Cambio de año {origen} → {destino} en curso...')
+    
+    # Vista previa solo con SELECT: un GET no toma el bloqueo de escritura
+    resumen = error = None
+    if origen:
+        try:
+            with lectura.motor().connect() as conexion:
+                resumen = promocion.previsualizar(conexion, origen, destino)
+        except ValueError as e:
+            error = str(e)
+    
+    return render_template('admin/promocion.html', origen=origen, destino=destino, resumen=resumen, error=error)
+
+@trabajos.registrar('promocion', max_intentos=1)
+def trabajo_promocion(contexto, origen, destino, repitentes=()):
+    """Aplicar el cambio de año (una transacción; si falla no queda nada a medias)"""
+    contexto.progreso(5, f'Promoviendo {origen} → {destino}...')
+    with db.engine.connect() as conexion:
+        resumen = promocion.promover(conexion, origen, destino, repitentes)
+    # Las sesiones en caché guardan los cursos de cada usuario
+    invalidar_todos()
+    resumen.pop('detalle')
+    return resumen
 
 
-@admin_bp.route('/reportes/exportar')
+@admin_bp.route('/reportes/exportar', methods=['POST'])
 @login_required
 @admin_required
 def exportar_reportes():
-    """Exportar reportes en formato CSV"""
+    """Encolar la exportación de reportes en formato CSV"""
+    trabajo = trabajos.encolar('exportar_reportes', usuario_id=current_user.id)
+    return respuesta_encolado(trabajo, 'Exportación en preparación. La descarga aparecerá al terminar.')
+
+@trabajos.registrar('exportar_reportes')
+@solo_lectura
+def trabajo_exportar_reportes(contexto):
+    """Escribir el reporte CSV en la carpeta del trabajo"""
     import csv
-    from io import StringIO
-    
-    # Crear CSV en memoria
-    output = StringIO()
-    writer = csv.writer(output)
     
-    # Headers
-    writer.writerow(['Tipo', 'Descripción', 'Valor', 'Fecha'])
+    nombre = f'reporte_colegio_{datetime.now().strftime("%Y%m%d")}.csv'
+    fecha = datetime.now().strftime('%Y-%m-%d')
     
     # Datos básicos
     total_usuarios = Usuario.query.filter_by(activo=True).count()
     total_estudiantes = Usuario.query.filter_by(role='estudiante', activo=True).count()
     total_profesores = Usuario.query.filter_by(role='profesor', activo=True).count()
     
-    writer.writerow(['Estadística', 'Total Usuarios', total_usuarios, datetime.now().strftime('%Y-%m-%d')])
-    writer.writerow(['Estadística', 'Total Estudiantes', total_estudiantes, datetime.now().strftime('%Y-%m-%d')])
-    writer.writerow(['Estadística', 'Total Profesores', total_profesores, datetime.now().strftime('%Y-%m-%d')])
+    with open(os.path.join(contexto.carpeta, nombre), 'w', newline='', encoding='utf-8') as archivo:
+        writer = csv.writer(archivo)
+        writer.writerow(['Tipo', 'Descripción', 'Valor', 'Fecha'])
+        writer.writerow(['Estadística', 'Total Usuarios', total_usuarios, fecha])
+        writer.writerow(['Estadística', 'Total Estudiantes', total_estudiantes, fecha])
+        writer.writerow(['Estadística', 'Total Profesores', total_profesores, fecha])
     
-    # Preparar respuesta
-    output.seek(0)
-    return Response(
-        output.getvalue(),
-        mimetype='text/csv',
-        headers={'Content-Disposition': f'attachment; filename=reporte_colegio_{datetime.now().strftime("%Y%m%d")}.csv'}
-    )
+    return {'archivo': nombre, 'filas': 3}
 
 
 @admin_bp.route('/estudiantes/buscar')
 @login_required
 @admin_required
+@solo_lectura
 def buscar_estudiantes():
     """Página para buscar y listar estudiantes"""
     from sqlalchemy import func
@@ -874,6 +1078,7 @@ def buscar_estudiantes():
 @admin_bp.route('/estudiantes/<int:estudiante_id>/perfil')
 @login_required
 @admin_required
+@solo_lectura
 def perfil_estudiante(estudiante_id):
     """Perfil académico completo del estudiante"""
     from sqlalchemy import func
@@ -936,13 +1141,13 @@ def perfil_estudiante(estudiante_id):
         hace_seis_meses = hoy - timedelta(days=180)
     
     progreso_mensual = db.session.query(
-        func.strftime('%Y-%m', Calificacion.fecha_calificacion).label('mes'),
+        dialecto.mes(Calificacion.fecha_calificacion).label('mes'),
         func.avg(Calificacion.nota).label('promedio_mes'),
         func.count(Calificacion.id).label('total_calificaciones')
     ).filter(
         Calificacion.estudiante_id == estudiante.id,
         Calificacion.fecha_calificacion >= hace_seis_meses
-    ).group_by(func.strftime('%Y-%m', Calificacion.fecha_calificacion)).order_by('mes').all()
+    ).group_by(dialecto.mes(Calificacion.fecha_calificacion)).order_by('mes').all()
     
     return render_template('admin/perfil_estudiante.html',
                          estudiante=estudiante,
@@ -0,0 +1,48 @@
+from flask import Blueprint, abort
+from flask_login import login_required, current_user
+from models import Asignatura, Curso, Tarea, Calificacion, usuario_curso
+from extensions import db
+from almacenamiento import enviar_archivo
+
+archivos_bp = Blueprint('archivos', __name__)
+
+@archivos_bp.route('/tarea/<int:id>')
+@login_required
+def tarea(id):
+    """Descargar el archivo adjunto de una tarea"""
+    query = db.session.query(Tarea.archivo_adjunto).filter(Tarea.id == id)
+    
+    if current_user.es_profesor:
+        query = query.filter(Tarea.profesor_id == current_user.id)
+    elif current_user.es_estudiante:
+        query = query.join(Asignatura).join(Curso).join(usuario_curso).filter(
+            usuario_curso.c.usuario_id == current_user.id,
+            Tarea.activa == True
+        )
+    elif not current_user.es_admin:
+        abort(403)
+    
+    clave = query.scalar()
+    if not clave:
+        abort(404)
+    return enviar_archivo(clave)
+
+@archivos_bp.route('/entrega/<int:id>')
+@login_required
+def entrega(id):
+    """Descargar el archivo entregado por un estudiante"""
+    query = db.session.query(Calificacion.archivo_entrega).filter(Calificacion.id == id)
+    
+    if current_user.es_profesor:
+        query = query.join(Tarea, Calificacion.tarea_id == Tarea.id).filter(
+            Tarea.profesor_id == current_user.id
+        )
+    elif current_user.es_estudiante:
+        query = query.filter(Calificacion.estudiante_id == current_user.id)
+    elif not current_user.es_admin:
+        abort(403)
+    
+    clave = query.scalar()
+    if not clave:
+        abort(404)
+    return enviar_archivo(clave)
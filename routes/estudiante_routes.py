@@ -1,12 +1,19 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
 from flask_login import login_required, current_user
 from functools import wraps
-from werkzeug.utils import secure_filename
-from models import Usuario, Curso, Asignatura, Tarea, Calificacion, Horario, usuario_curso
+from models import Usuario, Curso, Asignatura, Tarea, Calificacion, Horario, SesionCarga, BandejaTarea, Notificacion, usuario_curso
 from forms import EntregaTareaForm
 from extensions import db
+from almacenamiento import guardar_archivo
+from fragmentos import perezoso
+from paginacion import paginar
+import cargas
+import contadores
+import similitud
+import archivo_historico
 from datetime import datetime
-import os
+from sqlalchemy import func, case
+from sqlalchemy.orm import joinedload
 
 estudiante_bp = Blueprint('estudiante', __name__)
 
@@ -25,37 +32,41 @@ def estudiante_required(f):
 @estudiante_required
 def dashboard():
     """Dashboard del estudiante"""
+    # Los datos se consultan solo si el fragmento de la plantilla no está en caché
     # Obtener cursos del estudiante
-    cursos = current_user.cursos
+    cursos = perezoso(lambda: current_user.cursos)
     
-    # Tareas pendientes
-    tareas_pendientes = db.session.query(Tarea).join(Asignatura).join(Curso).join(usuario_curso).filter(
-        usuario_curso.c.usuario_id == current_user.id,
-        Tarea.activa == True,
-        Tarea.fecha_entrega > datetime.utcnow()
-    ).order_by(Tarea.fecha_entrega).limit(5).all()
+    # Tareas pendientes (sin entregar y a tiempo), desde la bandeja precalculada
+    tareas_pendientes = perezoso(lambda: [b.tarea for b in _bandeja().options(
+        joinedload(BandejaTarea.tarea).joinedload(Tarea.asignatura)
+    ).filter(
+        BandejaTarea.estado == 'pendiente',
+        BandejaTarea.fecha_entrega > datetime.utcnow()
+    ).order_by(BandejaTarea.fecha_entrega, BandejaTarea.tarea_id).limit(5)])
     
     # Tareas vencidas sin entregar
-    tareas_vencidas = db.session.query(Tarea).join(Asignatura).join(Curso).join(usuario_curso).outerjoin(
-        Calificacion, (Calificacion.tarea_id == Tarea.id) & (Calificacion.estudiante_id == current_user.id)
-    ).filter(
-        usuario_curso.c.usuario_id == current_user.id,
-        Tarea.activa == True,
-        Tarea.fecha_entrega < datetime.utcnow(),
-        Calificacion.id == None
-    ).count()
+    tareas_vencidas = perezoso(lambda: _bandeja().filter(
+        BandejaTarea.estado == 'pendiente',
+        BandejaTarea.fecha_entrega < datetime.utcnow()
+    ).count())
     
     # Calcular promedio general
-    calificaciones = Calificacion.query.filter_by(estudiante_id=current_user.id).all()
-    promedio_general = sum(c.nota for c in calificaciones) / len(calificaciones) if calificaciones else 0.0
+    promedio_general = perezoso(lambda: db.session.query(func.avg(Calificacion.nota)).filter(
+        Calificacion.estudiante_id == current_user.id
+    ).scalar() or 0.0)
     
     # Clases del día de hoy (simulado)
     clases_hoy = 4  # Simulado
     
+    # Recordatorios de entrega sin leer (ver recordatorios.py)
+    recordatorios = perezoso(lambda: Notificacion.query.filter_by(
+        usuario_id=current_user.id, leida=False
+    ).order_by(Notificacion.id.desc()).limit(5).all())
+    
     # Calificaciones recientes
-    calificaciones_recientes = Calificacion.query.filter_by(
+    calificaciones_recientes = perezoso(lambda: Calificacion.query.filter_by(
         estudiante_id=current_user.id
-    ).order_by(Calificacion.fecha_calificacion.desc()).limit(5).all()
+    ).order_by(Calificacion.fecha_calificacion.desc()).limit(5).all())
     
     return render_template('estudiante/dashboard.html',
                          cursos=cursos,
@@ -63,30 +74,59 @@ def dashboard():
                          tareas_vencidas=tareas_vencidas,
                          calificaciones_recientes=calificaciones_recientes,
                          promedio_general=promedio_general,
+                         recordatorios=recordatorios,
                          clases_hoy=clases_hoy)
 
+@estudiante_bp.route('/recordatorios/leidos', methods=['POST'])
+@login_required
+@estudiante_required
+def marcar_recordatorios():
+    """Marcar como leídos los recordatorios del estudiante"""
+    Notificacion.query.filter_by(usuario_id=current_user.id, leida=False).update({'leida': True})
+    db.session.commit()
+    return redirect(url_for('estudiante.dashboard'))
+
+def _bandeja():
+    """Tareas activas del estudiante actual en su bandeja (rango del índice por estudiante)"""
+    return BandejaTarea.query.filter(
+        BandejaTarea.estudiante_id == current_user.id,
+        BandejaTarea.activa == True
+    )
+
 @estudiante_bp.route('/tareas')
 @login_required
 @estudiante_required
 def tareas():
     """Ver todas las tareas del estudiante"""
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     estado = request.args.get('estado', 'todas')
+    ahora = datetime.utcnow()
     
-    # Query base para tareas del estudiante
-    query = db.session.query(Tarea).join(Asignatura).join(Curso).join(usuario_curso).filter(
-        usuario_curso.c.usuario_id == current_user.id,
-        Tarea.activa == True
-    )
+    # Conteos por estado en una sola pasada sobre la bandeja
+    sin_entregar = BandejaTarea.estado == 'pendiente'
+    pendientes_count, entregadas_count, vencidas_count = _bandeja().with_entities(
+        func.count(case((sin_entregar & (BandejaTarea.fecha_entrega > ahora), 1))),
+        func.count(case((~sin_entregar, 1))),
+        func.count(case((sin_entregar & (BandejaTarea.fecha_entrega < ahora), 1)))
+    ).one()
+    
+    query = _bandeja().options(
+        joinedload(BandejaTarea.tarea).joinedload(Tarea.asignatura).joinedload(Asignatura.profesor))
     
     # Filtrar por estado
     if estado == 'pendientes':
-        query = query.filter(Tarea.fecha_entrega > datetime.utcnow())
+        query = query.filter(sin_entregar, BandejaTarea.fecha_entrega > ahora)
+    elif estado == 'entregadas':
+        query = query.filter(~sin_entregar)
     elif estado == 'vencidas':
-        query = query.filter(Tarea.fecha_entrega < datetime.utcnow())
+        query = query.filter(sin_entregar, BandejaTarea.fecha_entrega < ahora)
     
-    tareas = query.order_by(Tarea.fecha_entrega.desc()).paginate(
-        page=page, per_page=10, error_out=False)
+    tareas = paginar(query, (BandejaTarea.fecha_entrega.desc(), BandejaTarea.tarea_id.desc()),
+                     cursor=cursor, por_pagina=10, contar=1000)
+    # La plantilla trabaja con tareas; el estado de la bandeja viaja con cada una
+    for entrada in tareas.items:
+        entrada.tarea.entregada = entrada.entregada
+    tareas.items = [entrada.tarea for entrada in tareas.items]
     
     # Obtener calificaciones del estudiante para estas tareas
     tareas_ids = [t.id for t in tareas.items]
@@ -98,7 +138,10 @@ def tareas():
     return render_template('estudiante/tareas.html', 
                          tareas=tareas, 
                          calificaciones=calificaciones,
-                         estado_filtro=estado)
+                         estado_filtro=estado,
+                         pendientes_count=pendientes_count,
+                         entregadas_count=entregadas_count,
+                         vencidas_count=vencidas_count)
 
 @estudiante_bp.route('/tarea/<int:id>')
 @login_required
@@ -121,22 +164,50 @@ def detalle_tarea(id):
                          tarea=tarea, 
                          calificacion=calificacion)
 
+def _tarea_para_entregar(id):
+    """Tarea activa de un curso del estudiante (404 si no le corresponde)"""
+    return db.session.query(Tarea).join(Asignatura).join(Curso).join(usuario_curso).filter(
+        Tarea.id == id,
+        usuario_curso.c.usuario_id == current_user.id,
+        Tarea.activa == True
+    ).first_or_404()
+
+def _entrega_existente(tarea_id):
+    return Calificacion.query.filter_by(
+        tarea_id=tarea_id,
+        estudiante_id=current_user.id
+    ).first()
+
+def _registrar_entrega(tarea_id, clave, comentarios, calificacion_existente=None):
+    """Guardar la clave del archivo entregado en la calificación del estudiante (sin commit)"""
+    if not (calificacion_existente and calificacion_existente.archivo_entrega):
+        contadores.registrar_entrega(db.session, tarea_id)
+    if calificacion_existente:
+        # Actualizar entrega existente
+        calificacion_existente.archivo_entrega = clave
+        if comentarios:
+            calificacion_existente.comentarios = comentarios
+    else:
+        # Crear nueva entrega (sin nota aún)
+        calificacion = Calificacion(
+            estudiante_id=current_user.id,
+            tarea_id=tarea_id,
+            nota=0.0,  # Se calificará después
+            archivo_entrega=clave,
+            comentarios=comentarios,
+            periodo='Primer Periodo'  # Default, se actualizará al calificar
+        )
+        db.session.add(calificacion)
+
 @estudiante_bp.route('/tarea/<int:id>/entregar', methods=['GET', 'POST'])
 @login_required
 @estudiante_required
 def entregar_tarea(id):
     """Entregar una tarea"""
-    tarea = db.session.query(Tarea).join(Asignatura).join(Curso).join(usuario_curso).filter(
-        Tarea.id == id,
-        usuario_curso.c.usuario_id == current_user.id,
-        Tarea.activa == True
-    ).first_or_404()
+    tarea = _tarea_para_entregar(id)
     
     # Verificar si ya existe una calificación (ya fue entregada)
-    calificacion_existente = Calificacion.query.filter_by(
-        tarea_id=id,
-        estudiante_id=current_user.id
-    ).first()
+    calificacion_existente = _entrega_existente(id)
     
     if calificacion_existente and calificacion_existente.archivo_entrega:
         flash('Ya has entregado esta tarea', 'info')
@@ -145,32 +216,13 @@ def entregar_tarea(id):
     form = EntregaTareaForm()
     
     if form.validate_on_submit():
-        # Guardar archivo de entrega
-        filename = secure_filename(form.archivo_entrega.data.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-        filename = f"{current_user.numero_documento}_{timestamp}{filename}"
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], 'entregas', filename)
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        form.archivo_entrega.data.save(filepath)
-        
-        if calificacion_existente:
-            # Actualizar entrega existente
-            calificacion_existente.archivo_entrega = f'entregas/{filename}'
-            if form.comentarios.data:
-                calificacion_existente.comentarios = form.comentarios.data
-        else:
-            # Crear nueva entrega (sin nota aún)
-            calificacion = Calificacion(
-                estudiante_id=current_user.id,
-                tarea_id=id,
-                nota=0.0,  # Se calificará después
-                archivo_entrega=f'entregas/{filename}',
-                comentarios=form.comentarios.data,
-                periodo='Primer Periodo'  # Default, se actualizará al calificar
-            )
-            db.session.add(calificacion)
+        # Guardar archivo de entrega (deduplicado por contenido)
+        clave = guardar_archivo(form.archivo_entrega.data)
+        _registrar_entrega(id, clave, form.comentarios.data, calificacion_existente)
         
         db.session.commit()
+        # Texto y firma MinHash en segundo plano, para el reporte de similitud del profesor
+        similitud.solicitar([clave])
         flash('Tarea entregada correctamente', 'success')
         return redirect(url_for('estudiante.detalle_tarea', id=id))
     
@@ -178,36 +230,124 @@ def entregar_tarea(id):
                          form=form, 
                          tarea=tarea)
 
+# --- Entrega por bloques (reanudable) ---
+# 1. POST /tarea/<id>/carga            -> abre la sesión (nombre, tamaño, sha256 opcional),
+#                                          o devuelve la abierta para el mismo archivo
+# 2. PUT  /carga/<sesion>/<indice>     -> un bloque, con su SHA-256 en X-Chunk-SHA256
+# 3. GET  /carga/<sesion>              -> bloques recibidos y faltantes (para reanudar)
+# 4. POST /carga/<sesion>/completar    -> ensambla, guarda y registra la entrega
+
+def _sesion_del_estudiante(sesion_id):
+    sesion = SesionCarga.query.filter_by(id=sesion_id, estudiante_id=current_user.id).first()
+    if not sesion:
+        abort(404)
+    return sesion
+
+@estudiante_bp.errorhandler(cargas.ErrorCarga)
+def error_carga(error):
+    return jsonify({'error': error.mensaje}), error.status
+
+@estudiante_bp.route('/tarea/<int:id>/carga', methods=['POST'])
+@login_required
+@estudiante_required
+def iniciar_carga(id):
+    """Abrir una sesión de carga por bloques para la entrega de una tarea"""
+    _tarea_para_entregar(id)
+    calificacion_existente = _entrega_existente(id)
+    if calificacion_existente and calificacion_existente.archivo_entrega:
+        return jsonify({'error': 'Ya has entregado esta tarea'}), 409
+
+    datos = request.get_json(silent=True) or {}
+    try:
+        tamaño = int(datos.get('tamaño', 0))
+    except (TypeError, ValueError):
+        tamaño = 0
+    sesion = cargas.crear_sesion(current_user.id, id, str(datos.get('nombre', '')),
+                                 tamaño, datos.get('sha256'))
+    return jsonify(cargas.estado(sesion)), 201
+
+@estudiante_bp.route('/carga/<sesion_id>')
+@login_required
+@estudiante_required
+def estado_carga(sesion_id):
+    """Bloques recibidos de una sesión, para reanudar tras un corte"""
+    return jsonify(cargas.estado(_sesion_del_estudiante(sesion_id)))
+
+@estudiante_bp.route('/carga/<sesion_id>/<int:indice>', methods=['PUT'])
+@login_required
+@estudiante_required
+def subir_bloque(sesion_id, indice):
+    """Recibir un bloque; el cuerpo de la petición son los bytes del bloque"""
+    sesion = _sesion_del_estudiante(sesion_id)
+    if (request.content_length or 0) > sesion.tamaño_bloque:
+        return jsonify({'error': 'Bloque demasiado grande'}), 413
+    cargas.recibir_bloque(sesion, indice, request.get_data(cache=False),
+                          request.headers.get('X-Chunk-SHA256'))
+    return jsonify({'indice': indice}), 200
+
+@estudiante_bp.route('/carga/<sesion_id>/completar', methods=['POST'])
+@login_required
+@estudiante_required
+def completar_carga(sesion_id):
+    """Ensamblar el archivo y registrarlo como entrega de la tarea"""
+    sesion = _sesion_del_estudiante(sesion_id)
+    tarea_id = sesion.tarea_id
+    _tarea_para_entregar(tarea_id)
+    calificacion_existente = _entrega_existente(tarea_id)
+    if calificacion_existente and calificacion_existente.archivo_entrega:
+        return jsonify({'error': 'Ya has entregado esta tarea'}), 409
+
+    datos = request.get_json(silent=True) or {}
+    clave = cargas.completar(sesion)
+    _registrar_entrega(tarea_id, clave, (datos.get('comentarios') or '')[:300] or None,
+                       calificacion_existente)
+    db.session.commit()
+    similitud.solicitar([clave])
+
+    flash('Tarea entregada correctamente', 'success')
+    return jsonify({'redirect': url_for('estudiante.detalle_tarea', id=tarea_id)})
+
 @estudiante_bp.route('/calificaciones')
 @login_required
 @estudiante_required
 def calificaciones():
-    """Ver todas las calificaciones del estudiante"""
-    page = request.args.get('page', 1, type=int)
+    """Ver todas las calificaciones del estudiante (o las de un año, aunque esté archivado)"""
+    cursor = request.args.get('cursor')
     periodo = request.args.get('periodo', 'todos')
+    año = request.args.get('año', type=int)
     
-    query = Calificacion.query.filter_by(estudiante_id=current_user.id)
-    
-    if periodo != 'todos':
-        query = query.filter_by(periodo=periodo)
-    
-    calificaciones = query.order_by(Calificacion.fecha_calificacion.desc()).paginate(
-        page=page, per_page=15, error_out=False)
+    años = [fila[0] for fila in db.session.query(Curso.año_academico).join(usuario_curso).filter(
+        usuario_curso.c.usuario_id == current_user.id
+    ).distinct().order_by(Curso.año_academico.desc())]
+    archivados = archivo_historico.años_archivados()
     
-    # Calcular promedio por periodo
-    promedios = {}
-    for p in ['Primer Periodo', 'Segundo Periodo', 'Tercer Periodo', 'Cuarto Periodo']:
-        notas = [c.nota for c in Calificacion.query.filter_by(
-            estudiante_id=current_user.id,
-            periodo=p
-        ).all() if c.nota > 0]
-        if notas:
-            promedios[p] = sum(notas) / len(notas)
-    
-    return render_template('estudiante/calificaciones.html',
-                         calificaciones=calificaciones,
-                         promedios=promedios,
-                         periodo_filtro=periodo)
+    # Un año archivado se lee de su archivo con los mismos modelos
+    with archivo_historico.sesion_año(año) as sesion:
+        base = sesion.query(Calificacion).filter(Calificacion.estudiante_id == current_user.id)
+        if año is not None and año not in archivados:
+            base = base.join(Tarea).join(Asignatura).join(Curso).filter(Curso.año_academico == año)
+        
+        query = base
+        if periodo != 'todos':
+            query = query.filter(Calificacion.periodo == periodo)
+        
+        calificaciones = paginar(query, (Calificacion.fecha_calificacion.desc(), Calificacion.id.desc()),
+                                 cursor=cursor, por_pagina=15, contar=1000)
+        
+        # Calcular promedio por periodo
+        promedios = {}
+        for p in ['Primer Periodo', 'Segundo Periodo', 'Tercer Periodo', 'Cuarto Periodo']:
+            notas = [c.nota for c in base.filter(Calificacion.periodo == p).all() if c.nota > 0]
+            if notas:
+                promedios[p] = sum(notas) / len(notas)
+        
+        return render_template('estudiante/calificaciones.html',
+                             calificaciones=calificaciones,
+                             promedios=promedios,
+                             periodo_filtro=periodo,
+                             años=años,
+                             año_filtro=año,
+                             archivado=año in archivados)
 
 @estudiante_bp.route('/horario')
 @login_required
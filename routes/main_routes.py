@@ -1,9 +1,9 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from flask_login import login_user, logout_user, login_required, current_user
 from urllib.parse import urlparse
-from models import Usuario
 from forms import LoginForm
 from extensions import db
+from autenticacion import autenticar
 
 main_bp = Blueprint('main', __name__)
 
@@ -26,106 +26,57 @@ def index():
     # Usar el login principal con WTForms que tiene CSRF
     return redirect(url_for('main.login'))
 
+def _redirigir_despues_login():
+    """Redirigir a `next` si es una ruta local, o al inicio según el rol"""
+    next_page = request.args.get('next')
+    if next_page and urlparse(next_page).netloc == '':
+        return redirect(next_page)
+    return redirect(url_for('main.index'))
+
 @main_bp.route('/simple-login', methods=['GET', 'POST'])
 def simple_login():
     """Inicio de sesión simplificado sin WTForms"""
-    print(f"DEBUG: Simple login request - Method: {request.method}")
-    
     if current_user.is_authenticated:
-        print("DEBUG: Usuario ya autenticado, redirigiendo")
         return redirect(url_for('main.index'))
     
+    status = 200
     if request.method == 'POST':
-        email = request.form.get('email', '').strip().lower()
-        password = request.form.get('password', '')
-        remember_me = bool(request.form.get('remember_me'))
+        resultado = autenticar(request.form.get('email', ''),
+                               request.form.get('password', ''),
+                               ip=request.remote_addr)
+        if resultado.usuario:
+            login_user(resultado.usuario, remember=bool(request.form.get('remember_me')))
+            return _redirigir_despues_login()
         
-        print(f"DEBUG: Datos recibidos - Email: {email}, Password: {'*' * len(password)}, Remember: {remember_me}")
-        
-        if email and password:
-            usuario = Usuario.query.filter_by(email=email).first()
-            
-            if usuario:
-                print(f"DEBUG: Usuario encontrado: {usuario.nombre_completo}, Role: {usuario.role}, Activo: {usuario.activo}")
-                
-                if usuario.activo and usuario.check_password(password):
-                    login_user(usuario, remember=remember_me)
-                    next_page = request.args.get('next')
-                    
-                    if next_page and urlparse(next_page).netloc == '':
-                        print(f"DEBUG: Login exitoso! Redirigiendo según role: {usuario.role}")
-                        return redirect(next_page)
-                    else:
-                        return redirect(url_for('main.index'))
-                else:
-                    if not usuario.activo:
-                        print("DEBUG: Usuario inactivo")
-                        flash('Tu cuenta está inactiva. Contacta al administrador.', 'error')
-                    else:
-                        print("DEBUG: Contraseña incorrecta")
-                        flash('Email o contraseña incorrectos.', 'error')
-            else:
-                print("DEBUG: Usuario no encontrado")
-                flash('Email o contraseña incorrectos.', 'error')
-        else:
-            print("DEBUG: Datos faltantes")
-            flash('Por favor completa todos los campos.', 'error')
+        flash(resultado.error, 'error')
+        status = resultado.status
     
-    return render_template('auth/simple_login.html')
+    return render_template('auth/simple_login.html'), status
 
 @main_bp.route('/login', methods=['GET', 'POST'])
 def login():
     """Página de inicio de sesión con WTForms"""
-    print(f"DEBUG: Login request - Method: {request.method}")
-    
     if current_user.is_authenticated:
-        print("DEBUG: Usuario ya autenticado, redirigiendo")
         return redirect(url_for('main.index'))
     
     form = LoginForm()
+    status = 200
     
     if form.validate_on_submit():
-        email = form.email.data.strip().lower()
-        password = form.password.data
-        remember_me = form.remember_me.data
+        resultado = autenticar(form.email.data, form.password.data, ip=request.remote_addr)
+        if resultado.usuario:
+            login_user(resultado.usuario, remember=form.remember_me.data)
+            return _redirigir_despues_login()
         
-        print(f"DEBUG: Login con WTForms - Email: {email}, Remember: {remember_me}")
-        
-        usuario = Usuario.query.filter_by(email=email).first()
-        
-        if usuario:
-            print(f"DEBUG: Usuario encontrado: {usuario.nombre_completo}, Role: {usuario.role}, Activo: {usuario.activo}")
-            
-            if usuario.activo and usuario.check_password(password):
-                login_user(usuario, remember=remember_me)
-                print(f"DEBUG: Usuario logueado exitosamente, redirigiendo según role: {usuario.role}")
-                
-                next_page = request.args.get('next')
-                if next_page and urlparse(next_page).netloc == '':
-                    return redirect(next_page)
-                else:
-                    return redirect(url_for('main.index'))
-            else:
-                if not usuario.activo:
-                    print("DEBUG: Usuario inactivo")
-                    flash('Tu cuenta está inactiva. Contacta al administrador.', 'error')
-                else:
-                    print("DEBUG: Contraseña incorrecta")
-                    flash('Email o contraseña incorrectos.', 'error')
-        else:
-            print("DEBUG: Usuario no encontrado en login WTF")
-            flash('Email o contraseña incorrectos.', 'error')
-    else:
-        if form.errors:
-            print(f"DEBUG: Errores en el formulario: {form.errors}")
+        flash(resultado.error, 'error')
+        status = resultado.status
     
-    return render_template('auth/login.html', form=form)
+    return render_template('auth/login.html', form=form), status
 
 @main_bp.route('/logout')
 @login_required
 def logout():
     """Cerrar sesión"""
-    print(f"DEBUG: Cerrando sesión del usuario: {current_user.nombre_completo}")
     logout_user()
     flash('Has cerrado sesión exitosamente.', 'info')
     return redirect(url_for('main.login'))
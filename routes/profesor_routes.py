@@ -1,12 +1,20 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, Response
 from flask_login import login_required, current_user
 from functools import wraps
-from werkzeug.utils import secure_filename
 from models import Usuario, Curso, Asignatura, Tarea, Calificacion, NotificacionReemplazo, usuario_curso
 from forms import TareaForm, CalificacionForm, RespuestaReemplazoForm
 from extensions import db
-from datetime import datetime
+from almacenamiento import guardar_archivo, ruta_archivo, nombre_de, zip_en_streaming
+from fragmentos import perezoso
+from paginacion import paginar
+from lectura import solo_lectura
+from sqlalchemy.orm import joinedload
+import contadores
+import similitud
+import asistencia as registro_asistencia
+from werkzeug.utils import secure_filename
 import os
+from datetime import datetime, date
 
 profesor_bp = Blueprint('profesor', __name__)
 
@@ -25,42 +33,33 @@ def profesor_required(f):
 @profesor_required
 def dashboard():
     """Dashboard del profesor"""
+    # Los datos se consultan solo si el fragmento de la plantilla no está en caché
     # Asignaturas que enseña el profesor
-    asignaturas = current_user.asignaturas_enseñadas
+    asignaturas = perezoso(lambda: current_user.asignaturas_enseñadas)
     
     # Tareas creadas por el profesor
-    tareas_activas = Tarea.query.filter_by(profesor_id=current_user.id, activa=True).count()
+    tareas_activas = perezoso(lambda: Tarea.query.filter_by(profesor_id=current_user.id, activa=True).count())
     
-    # Tareas pendientes de calificar
-    tareas_pendientes = db.session.query(Tarea).join(Calificacion, Tarea.id == Calificacion.tarea_id, isouter=True).filter(
-        Tarea.profesor_id == current_user.id,
-        Tarea.activa == True,
-        Calificacion.id == None
-    ).count()
+    # Tareas sin ninguna calificación (contador desnormalizado, sin join)
+    tareas_pendientes = perezoso(lambda: Tarea.query.filter_by(
+        profesor_id=current_user.id, activa=True, total_calificadas=0
+    ).count())
     
     # Contar estudiantes totales en cursos del profesor
-    estudiantes_total = db.session.query(Usuario).join(usuario_curso).join(Curso).join(Asignatura).filter(
+    estudiantes_total = perezoso(lambda: db.session.query(Usuario).join(usuario_curso).join(Curso).join(Asignatura).filter(
         Asignatura.profesor_id == current_user.id,
         Usuario.role == 'estudiante',
         Usuario.activo == True
-    ).distinct().count()
+    ).distinct().count())
     
     # Clases del día de hoy (simulado)
-    from datetime import date, datetime
-    today = date.today()
     clases_hoy = 3  # Simulado - en implementación real sería calculado desde Horario
     
-    # Notificaciones de reemplazo para el profesor
-    notificaciones_reemplazo = NotificacionReemplazo.query.filter_by(
-        profesor_reemplazo_id=current_user.id,
-        estado='pendiente'
-    ).count()
-    
     # Notificaciones de reemplazo pendientes
-    notificaciones_reemplazo = NotificacionReemplazo.query.filter_by(
+    notificaciones_reemplazo = perezoso(lambda: NotificacionReemplazo.query.filter_by(
         profesor_reemplazo_id=current_user.id,
         estado='pendiente'
-    ).all()
+    ).all())
     
     # Fecha y hora actual
     fecha_actual = datetime.now()
@@ -79,9 +78,9 @@ def dashboard():
 @profesor_required
 def tareas():
     """Listar tareas del profesor"""
-    page = request.args.get('page', 1, type=int)
-    tareas = Tarea.query.filter_by(profesor_id=current_user.id, activa=True).order_by(
-        Tarea.fecha_entrega.desc()).paginate(page=page, per_page=10, error_out=False)
+    tareas = paginar(Tarea.query.filter_by(profesor_id=current_user.id, activa=True),
+                     (Tarea.fecha_entrega.desc(), Tarea.id.desc()),
+                     cursor=request.args.get('cursor'), por_pagina=10)
     
     return render_template('profesor/tareas.html', tareas=tareas)
 
@@ -102,18 +101,13 @@ def nueva_tarea():
             descripcion=form.descripcion.data,
             fecha_entrega=datetime.combine(form.fecha_entrega.data, datetime.min.time()),
             asignatura_id=form.asignatura_id.data,
-            profesor_id=current_user.id
+            profesor_id=current_user.id,
+            total_estudiantes=contadores.estudiantes_esperados(form.asignatura_id.data)
         )
         
         # Guardar archivo adjunto si se proporciona
         if form.archivo_adjunto.data:
-            filename = secure_filename(form.archivo_adjunto.data.filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-            filename = timestamp + filename
-            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], 'tareas', filename)
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-            form.archivo_adjunto.data.save(filepath)
-            tarea.archivo_adjunto = f'tareas/{filename}'
+            tarea.archivo_adjunto = guardar_archivo(form.archivo_adjunto.data)
         
         db.session.add(tarea)
         db.session.commit()
@@ -141,6 +135,58 @@ def calificar_tarea(id):
                          estudiantes=estudiantes,
                          calificaciones=calificaciones)
 
+@profesor_bp.route('/tarea/<int:id>/entregas.zip')
+@login_required
+@profesor_required
+def descargar_entregas(id):
+    """Descargar todas las entregas de una tarea en un ZIP generado al vuelo"""
+    tarea = Tarea.query.filter_by(id=id, profesor_id=current_user.id).first_or_404()
+    
+    # Metadatos de todas las entregas en una sola consulta
+    entregas = db.session.query(
+        Calificacion.archivo_entrega, Usuario.numero_documento, Usuario.apellidos, Usuario.nombres
+    ).join(Usuario, Calificacion.estudiante_id == Usuario.id).filter(
+        Calificacion.tarea_id == tarea.id,
+        Calificacion.archivo_entrega.isnot(None)
+    ).order_by(Usuario.apellidos, Usuario.nombres).all()
+    
+    entradas = []
+    usados = set()
+    for clave, documento, apellidos, nombres in entregas:
+        ruta = ruta_archivo(clave)
+        if not os.path.isfile(ruta):
+            continue
+        nombre = secure_filename(f"{documento}_{apellidos}_{nombres}_{nombre_de(clave)}")
+        base, extension = os.path.splitext(nombre)
+        contador = 2
+        while nombre in usados:
+            nombre = f"{base}_{contador}{extension}"
+            contador += 1
+        usados.add(nombre)
+        entradas.append((nombre, ruta))
+    
+    if not entradas:
+        flash('Esta tarea no tiene archivos entregados', 'info')
+        return redirect(url_for('profesor.calificar_tarea', id=id))
+    
+    nombre_zip = secure_filename(f"entregas_{tarea.id}_{tarea.titulo}") + '.zip'
+    return Response(zip_en_streaming(entradas), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename={nombre_zip}'})
+
+@profesor_bp.route('/tarea/<int:id>/similitud')
+@login_required
+@profesor_required
+def similitud_tarea(id):
+    """Pares de entregas parecidas de una tarea (y de la misma tarea en los otros cursos del grado)"""
+    tarea = Tarea.query.filter_by(id=id, profesor_id=current_user.id).first_or_404()
+    reporte = similitud.reporte(tarea)
+    
+    # Entregas anteriores a la detección de similitud: se firman ahora en segundo plano
+    if reporte['sin_firma']:
+        similitud.solicitar(reporte['sin_firma'])
+    
+    return render_template('profesor/similitud_tarea.html', tarea=tarea, reporte=reporte)
+
 @profesor_bp.route('/calificacion/<int:tarea_id>/<int:estudiante_id>', methods=['GET', 'POST'])
 @login_required
 @profesor_required
@@ -160,6 +206,9 @@ def calificacion_individual(tarea_id, estudiante_id):
     form = CalificacionForm(obj=calificacion)
     
     if form.validate_on_submit():
+        ya_calificada = calificacion is not None and calificacion.nota > 0
+        if ya_calificada != (form.nota.data > 0):
+            contadores.registrar_calificacion(db.session, tarea_id, -1 if ya_calificada else 1)
         if calificacion:
             # Actualizar calificación existente
             calificacion.nota = form.nota.data
@@ -425,4 +474,148 @@ def horario():
     return render_template('profesor/horario.html', 
                          horario_semanal=horario_semanal,
                          dias_semana=dias_semana,
-                         dia_actual=dia_actual)
\ No newline at end of file
+                         dia_actual=dia_actual)
+
+def _fecha_clase(texto):
+    """Fecha de ?fecha=AAAA-MM-DD; hoy si no viene o no es válida"""
+    try:
+        return datetime.strptime(texto, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return date.today()
+
+def _puede_tomar_asistencia(horario, fecha):
+    """El profesor del horario o quien confirmó su reemplazo para esa fecha"""
+    if horario.profesor_id == current_user.id:
+        return True
+    return NotificacionReemplazo.query.filter_by(
+        horario_id=horario.id,
+        profesor_reemplazo_id=current_user.id,
+        fecha_ausencia=fecha,
+        estado='confirmado'
+    ).first() is not None
+
+@profesor_bp.route('/asistencia')
+@login_required
+@profesor_required
+def asistencia():
+    """Clases del profesor con su asistencia de hoy y el ausentismo de cada curso"""
+    from models import Horario, Asistencia
+    
+    hoy = date.today()
+    horarios = Horario.query.join(Curso).options(
+        joinedload(Horario.curso), joinedload(Horario.asignatura)
+    ).filter(
+        Horario.profesor_id == current_user.id,
+        Horario.activo == True,
+        Curso.activo == True
+    ).order_by(Horario.dia_semana, Horario.hora_inicio).all()
+    
+    tomadas_hoy = {h for (h,) in db.session.query(Asistencia.horario_id).filter(
+        Asistencia.fecha == hoy,
+        Asistencia.horario_id.in_([h.id for h in horarios])
+    )}
+    reemplazos_hoy = NotificacionReemplazo.query.filter_by(
+        profesor_reemplazo_id=current_user.id,
+        fecha_ausencia=hoy,
+        estado='confirmado'
+    ).all()
+    
+    cursos = {h.curso_id: h.curso for h in horarios}
+    tasas = registro_asistencia.tasas_por_curso(db.session, cursos)
+    ausentismo = []
+    for curso_id, curso in sorted(cursos.items(), key=lambda c: c[1].nombre_completo):
+        ausencias, posibles, clases = tasas.get(curso_id, (0, 0, 0))
+        ausentismo.append({
+            'curso': curso,
+            'clases': clases,
+            'ausencias': ausencias,
+            'porcentaje': registro_asistencia.porcentaje(ausencias, posibles)
+        })
+    
+    return render_template('profesor/asistencia.html',
+                         horarios=horarios,
+                         clases_hoy=[h for h in horarios if h.dia_semana == hoy.weekday()],
+                         reemplazos_hoy=reemplazos_hoy,
+                         tomadas_hoy=tomadas_hoy,
+                         ausentismo=ausentismo,
+                         hoy=hoy)
+
+@profesor_bp.route('/asistencia/<int:horario_id>', methods=['GET', 'POST'])
+@login_required
+@profesor_required
+def tomar_asistencia(horario_id):
+    """Marcar la asistencia de todo el curso en una clase"""
+    from models import Horario, Asistencia
+    
+    horario = Horario.query.get_or_404(horario_id)
+    fecha = _fecha_clase(request.values.get('fecha'))
+    
+    if not _puede_tomar_asistencia(horario, fecha):
+        flash('No tienes permisos para tomar asistencia en esta clase', 'error')
+        return redirect(url_for('profesor.asistencia'))
+    if fecha > date.today() or fecha.weekday() != horario.dia_semana:
+        flash(f'La clase de {horario.asignatura.nombre} no se dicta el {fecha.strftime("%d/%m/%Y")}', 'error')
+        return redirect(url_for('profesor.asistencia'))
+    
+    if request.method == 'POST':
+        ausentes = [int(e) for e in request.form.getlist('ausentes') if e.isdigit()]
+        registro = registro_asistencia.registrar(db.session, horario, fecha, ausentes, current_user.id)
+        db.session.commit()
+        flash(f'Asistencia guardada: {registro.total_ausentes} ausentes en '
+              f'{horario.curso.nombre_completo} ({fecha.strftime("%d/%m/%Y")})', 'success')
+        return redirect(url_for('profesor.asistencia'))
+    
+    registro = db.session.get(Asistencia, (horario.id, fecha))
+    if registro:
+        ids = registro_asistencia.ids_de(registro.lista)
+        ausentes = registro_asistencia.ausentes_de(registro)
+    else:
+        ids = registro_asistencia.matriculados(db.session, horario.curso_id)
+        ausentes = set()
+    estudiantes = Usuario.query.filter(Usuario.id.in_(list(ids))).order_by(
+        Usuario.apellidos, Usuario.nombres).all()
+    
+    return render_template('profesor/tomar_asistencia.html',
+                         horario=horario,
+                         fecha=fecha,
+                         registro=registro,
+                         estudiantes=estudiantes,
+                         ausentes=ausentes)
+
+@profesor_bp.route('/asistencia/curso/<int:curso_id>')
+@login_required
+@profesor_required
+@solo_lectura
+def reporte_asistencia(curso_id):
+    """Ausencias de cada estudiante de un curso del profesor"""
+    curso = Curso.query.get_or_404(curso_id)
+    if not any(a.curso_id == curso.id for a in current_user.asignaturas_enseñadas):
+        flash('No tienes permisos para ver la asistencia de este curso', 'error')
+        return redirect(url_for('profesor.asistencia'))
+    
+    desde = request.args.get('desde') and _fecha_clase(request.args['desde'])
+    hasta = request.args.get('hasta') and _fecha_clase(request.args['hasta'])
+    conteos = registro_asistencia.ausencias_por_estudiante(db.session, curso.id, desde, hasta)
+    ausencias_curso, posibles, clases = registro_asistencia.tasas_por_curso(
+        db.session, [curso.id], desde, hasta).get(curso.id, (0, 0, 0))
+    
+    estudiantes = Usuario.query.filter(Usuario.id.in_(list(conteos))).order_by(
+        Usuario.apellidos, Usuario.nombres).all() if conteos else []
+    filas = []
+    for estudiante in estudiantes:
+        ausencias, clases_estudiante = conteos[estudiante.id]
+        filas.append({
+            'estudiante': estudiante,
+            'ausencias': ausencias,
+            'clases': clases_estudiante,
+            'porcentaje': registro_asistencia.porcentaje(ausencias, clases_estudiante)
+        })
+    filas.sort(key=lambda f: -f['porcentaje'])
+    
+    return render_template('profesor/reporte_asistencia.html',
+                         curso=curso,
+                         filas=filas,
+                         clases=clases,
+                         porcentaje_curso=registro_asistencia.porcentaje(ausencias_curso, posibles),
+                         desde=desde,
+                         hasta=hasta)
@@ -0,0 +1,62 @@
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort, send_file
+from flask_login import login_required, current_user
+from models import Trabajo
+from extensions import db
+import trabajos
+import json
+import os
+
+trabajos_bp = Blueprint('trabajos', __name__)
+
+def _trabajo_visible(id):
+    """El trabajo si lo encoló el usuario actual (o es administrador); 404 si no"""
+    trabajo = db.session.get(Trabajo, id)
+    if not trabajo or (trabajo.usuario_id != current_user.id and not current_user.es_admin):
+        abort(404)
+    return trabajo
+
+def respuesta_encolado(trabajo, mensaje):
+    """Respuesta de una vista que encoló un trabajo: 202 con su estado (JSON) o la página de seguimiento"""
+    if request.accept_mimetypes.best == 'application/json':
+        url = url_for('trabajos.estado', id=trabajo.id)
+        return jsonify(success=True, message=mensaje, trabajo=trabajos.como_dict(trabajo), url=url), 202, {'Location': url}
+    flash(mensaje, 'info')
+    return redirect(url_for('trabajos.ver', id=trabajo.id))
+
+@trabajos_bp.route('/<int:id>')
+@login_required
+def ver(id):
+    """Página que sigue el avance de un trabajo"""
+    trabajo = _trabajo_visible(id)
+    return render_template('trabajos/ver.html', trabajo=trabajo)
+
+@trabajos_bp.route('/api/<int:id>')
+@login_required
+def estado(id):
+    """API con el estado, avance y resultado de un trabajo"""
+    trabajo = _trabajo_visible(id)
+    datos = trabajos.como_dict(trabajo)
+    if trabajo.estado == trabajos.TERMINADO and (datos['resultado'] or {}).get('archivo'):
+        datos['descarga'] = url_for('trabajos.descargar', id=trabajo.id)
+    return jsonify(datos)
+
+@trabajos_bp.route('/api')
+@login_required
+def recientes():
+    """API con los últimos trabajos del usuario"""
+    consulta = Trabajo.query.filter_by(usuario_id=current_user.id)
+    ultimos = consulta.order_by(Trabajo.id.desc()).limit(20).all()
+    return jsonify([trabajos.como_dict(t) for t in ultimos])
+
+@trabajos_bp.route('/<int:id>/descargar')
+@login_required
+def descargar(id):
+    """Descargar el archivo que produjo un trabajo terminado"""
+    trabajo = _trabajo_visible(id)
+    resultado = json.loads(trabajo.resultado) if trabajo.resultado else {}
+    if trabajo.estado != trabajos.TERMINADO or not resultado.get('archivo'):
+        abort(404)
+    ruta = os.path.join(trabajos.carpeta_de(trabajo.id), os.path.basename(resultado['archivo']))
+    if not os.path.exists(ruta):
+        abort(404)
+    return send_file(ruta, as_attachment=True, download_name=resultado['archivo'])
@@ -0,0 +1,296 @@
+"""
+Entregas parecidas: firmas MinHash del texto de cada archivo y LSH por tarea.
+
+Comparar cada entrega con todas las demás crece con el cuadrado del
+número de entregas. En cambio:
+
+1. Al llegar una entrega, su contenido queda pendiente de firma y un
+   trabajo de la cola (trabajos.py) extrae el texto (.txt, .docx y, si
+   está instalado `pypdf`, .pdf) y calcula su firma MinHash: el menor hash
+   de sus trigramas de palabras bajo NUM_PERMUTACIONES permutaciones. La
+   fracción de mínimos que coinciden entre dos firmas estima la similitud
+   de Jaccard de sus textos. Las firmas van por contenido (SHA-256), así
+   que un archivo repetido se firma una sola vez.
+2. El reporte de una tarea reparte las firmas de sus entregas, y de las
+   de la misma tarea en los otros cursos del grado, en BANDAS bandas de
+   FILAS mínimos. Solo se comparan las entregas que coinciden en alguna
+   banda completa: con similitud s la probabilidad de quedar como
+   candidatas es 1 - (1 - s^FILAS)^BANDAS, casi 1 por encima de 0.6 y
+   casi 0 para textos distintos. El costo es lineal en las entregas más
+   los pares candidatos.
+
+Los archivos idénticos (mismo SHA-256) se informan siempre, aunque no se
+les pueda extraer texto.
+"""
+
+import hashlib
+import html
+import os
+import random
+import re
+import unicodedata
+import zipfile
+from array import array
+from collections import defaultdict
+from itertools import combinations
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from extensions import db
+from models import Usuario, Curso, Asignatura, Tarea, Calificacion, FirmaContenido
+import almacenamiento
+import dialecto
+import trabajos
+
+try:
+    import pypdf
+except ImportError:  # Opcional: sin él los PDF quedan sin texto y solo cuentan las copias idénticas
+    pypdf = None
+
+NUM_PERMUTACIONES = 128
+BANDAS = 32
+FILAS = NUM_PERMUTACIONES // BANDAS
+MINIMO_PALABRAS = 20     # Con menos, cualquier par de textos cortos parece copia
+MAXIMO_CARACTERES = 2_000_000
+
+_PRIMO = (1 << 61) - 1
+_azar = random.Random(20240601)  # Fija: las firmas guardadas deben seguir siendo comparables
+_PERMUTACIONES = [(_azar.randrange(1, _PRIMO), _azar.randrange(0, _PRIMO)) for _ in range(NUM_PERMUTACIONES)]
+
+_PALABRA = re.compile(r'\w+')
+_DOCX_TEXTO = re.compile(r'<w:t(?:\s[^>]*)?>([^<]*)</w:t>|</w:p>')
+
+
+# Texto y firma
+
+def extraer_texto(ruta):
+    """Texto de un archivo según su contenido ('' si el formato no se puede leer)"""
+    with open(ruta, 'rb') as archivo:
+        cabecera = archivo.read(8)
+    if cabecera.startswith(b'PK'):
+        return _texto_docx(ruta)
+    if cabecera.startswith(b'%PDF'):
+        return _texto_pdf(ruta)
+    if cabecera.startswith(b'\xd0\xcf\x11\xe0'):
+        return ''  # .doc binario de Word
+    with open(ruta, 'rb') as archivo:
+        datos = archivo.read(MAXIMO_CARACTERES)
+    if b'\x00' in datos:
+        return ''
+    try:
+        return datos.decode('utf-8')
+    except UnicodeDecodeError:
+        return datos.decode('latin-1')
+
+
+def _texto_docx(ruta):
+    try:
+        with zipfile.ZipFile(ruta) as docx, docx.open('word/document.xml') as documento:
+            xml = documento.read(MAXIMO_CARACTERES * 4).decode('utf-8', 'replace')
+    except (zipfile.BadZipFile, KeyError):
+        return ''
+    # Basta con las corridas de texto (<w:t>) y los fines de párrafo
+    return ''.join(html.unescape(m.group(1)) if m.group(1) is not None else '\n'
+                   for m in _DOCX_TEXTO.finditer(xml))
+
+
+def _texto_pdf(ruta):
+    if pypdf is None:
+        return ''
+    try:
+        partes, total = [], 0
+        for pagina in pypdf.PdfReader(ruta).pages:
+            partes.append(pagina.extract_text() or '')
+            total += len(partes[-1])
+            if total > MAXIMO_CARACTERES:
+                break
+        return '\n'.join(partes)
+    except Exception:
+        return ''  # PDF dañado o cifrado
+
+
+def palabras(texto):
+    """Palabras en minúsculas y sin tildes, para que el formato no cuente"""
+    texto = unicodedata.normalize('NFKD', texto[:MAXIMO_CARACTERES].lower())
+    return _PALABRA.findall(''.join(c for c in texto if not unicodedata.combining(c)))
+
+
+def minhash(lista_palabras):
+    """Firma MinHash de los trigramas de palabras (None si no hay ninguno)"""
+    trigramas = {' '.join(lista_palabras[i:i + 3]) for i in range(max(1, len(lista_palabras) - 2))}
+    trigramas.discard('')
+    if not trigramas:
+        return None
+    hashes = [int.from_bytes(hashlib.blake2b(t.encode('utf-8'), digest_size=8).digest(), 'little')
+              for t in trigramas]
+    return array('I', [min((a * h + b) % _PRIMO for h in hashes) & 0xFFFFFFFF for a, b in _PERMUTACIONES])
+
+
+def de_bytes(datos):
+    firma = array('I')
+    firma.frombytes(datos)
+    return firma
+
+
+def similitud(firma_a, firma_b):
+    """Similitud de Jaccard estimada: fracción de mínimos iguales"""
+    return sum(x == y for x, y in zip(firma_a, firma_b)) / len(firma_a)
+
+
+def firmar(sha256):
+    """Extraer el texto de un contenido y guardar su firma (con commit); devuelve el estado"""
+    fila = db.session.get(FirmaContenido, sha256) or FirmaContenido(sha256=sha256)
+    ruta = almacenamiento.ruta_contenido(sha256)
+    lista = palabras(extraer_texto(ruta)) if os.path.isfile(ruta) else []
+    firma = minhash(lista) if len(lista) >= MINIMO_PALABRAS else None
+    fila.palabras = len(lista)
+    fila.firma = firma.tobytes() if firma is not None else None
+    fila.estado = 'firmada' if firma is not None else 'sin_texto'
+    db.session.add(fila)
+    db.session.commit()
+    return fila.estado
+
+
+@trabajos.registrar('firmar_entregas')
+def _trabajo_firmar(contexto, hashes):
+    """Firmar los contenidos pendientes, uno por transacción"""
+    resumen = {'firmada': 0, 'sin_texto': 0}
+    for i, sha256 in enumerate(hashes, 1):
+        resumen[firmar(sha256)] += 1
+        contexto.progreso(100 * i / len(hashes), f'{i} de {len(hashes)} archivos')
+    return resumen
+
+
+def solicitar(claves):
+    """Dejar pendientes las entregas sin firma y encolar su firma; devuelve el Trabajo o None.
+
+    Se llama después del commit de la entrega (encolar hace su propio
+    commit). Un contenido ya registrado, firmado o pendiente, no se vuelve
+    a encolar.
+    """
+    hashes = sorted({almacenamiento.hash_de(c) for c in claves} - {None})
+    if not hashes:
+        return None
+    registrados = set(db.session.execute(
+        select(FirmaContenido.sha256).where(FirmaContenido.sha256.in_(hashes))).scalars())
+    nuevos = [h for h in hashes if h not in registrados]
+    if not nuevos:
+        return None
+    # Dos entregas del mismo archivo a la vez: la segunda no inserta nada
+    dialecto.upsert(db.session.connection(), FirmaContenido.__table__,
+                    [{'sha256': h, 'estado': 'pendiente', 'palabras': 0} for h in nuevos], ['sha256'])
+    return trabajos.encolar('firmar_entregas', prioridad=trabajos.PRIORIDAD_BAJA, hashes=nuevos)
+
+
+# Reporte por tarea
+
+def tareas_hermanas(tarea):
+    """Ids de la misma tarea (mismo título) en la misma asignatura de los otros cursos del grado"""
+    curso = tarea.asignatura.curso
+    titulo = func.lower(func.trim(Tarea.titulo))
+    return list(db.session.execute(
+        select(Tarea.id).join(Asignatura, Tarea.asignatura_id == Asignatura.id)
+        .join(Curso, Asignatura.curso_id == Curso.id)
+        .where(Asignatura.nombre == tarea.asignatura.nombre,
+               Curso.grado == curso.grado,
+               Curso.año_academico == curso.año_academico,
+               Curso.id != curso.id,
+               titulo == tarea.titulo.strip().lower())
+    ).scalars())
+
+
+def _entregas(tarea_ids):
+    filas = db.session.execute(
+        select(Calificacion.id, Calificacion.tarea_id, Calificacion.archivo_entrega,
+               Usuario.id, Usuario.nombres, Usuario.apellidos, Curso.grado, Curso.seccion)
+        .join(Usuario, Calificacion.estudiante_id == Usuario.id)
+        .join(Tarea, Calificacion.tarea_id == Tarea.id)
+        .join(Asignatura, Tarea.asignatura_id == Asignatura.id)
+        .join(Curso, Asignatura.curso_id == Curso.id)
+        .where(Calificacion.tarea_id.in_(tarea_ids), Calificacion.archivo_entrega.isnot(None))
+        .order_by(Calificacion.id)
+    ).all()
+    return [{
+        'calificacion_id': calificacion_id,
+        'tarea_id': tarea_id,
+        'clave': clave,
+        'sha256': almacenamiento.hash_de(clave),
+        'estudiante_id': estudiante_id,
+        'estudiante': f'{nombres} {apellidos}',
+        'curso': f'{grado}{seccion}',
+    } for calificacion_id, tarea_id, clave, estudiante_id, nombres, apellidos, grado, seccion in filas]
+
+
+def candidatos(firmas):
+    """Pares de claves de `firmas` ({clave: array}) que coinciden en al menos una banda"""
+    pares = set()
+    for banda in range(BANDAS):
+        cubetas = defaultdict(list)
+        inicio = banda * FILAS
+        for clave, firma in firmas.items():
+            cubetas[tuple(firma[inicio:inicio + FILAS])].append(clave)
+        for cubeta in cubetas.values():
+            if len(cubeta) > 1:
+                pares.update(combinations(sorted(cubeta), 2))
+    return pares
+
+
+def reporte(tarea, umbral=None):
+    """Pares de entregas parecidas de una tarea, con al menos una entrega de esta tarea.
+
+    Devuelve {'pares', 'entregas', 'firmadas', 'pendientes', 'sin_texto',
+    'candidatos', 'otros_cursos', 'umbral', 'sin_firma'}; cada par lleva
+    las dos entregas, la similitud estimada y si los archivos son
+    idénticos. 'sin_firma' son las claves que nunca se encolaron (entregas
+    anteriores a este módulo), para pasarlas a solicitar().
+    """
+    umbral = umbral if umbral is not None else current_app.config.get('SIMILITUD_UMBRAL', 0.5)
+    hermanas = tareas_hermanas(tarea)
+    entregas = _entregas([tarea.id, *hermanas])
+    hashes = {e['sha256'] for e in entregas} - {None}
+    firmas_guardadas = {h: (estado, firma) for h, estado, firma in db.session.execute(
+        select(FirmaContenido.sha256, FirmaContenido.estado, FirmaContenido.firma)
+        .where(FirmaContenido.sha256.in_(hashes)))} if hashes else {}
+
+    # Un nodo por contenido: las entregas del mismo archivo son copias exactas entre sí
+    por_contenido = defaultdict(list)
+    for entrega in entregas:
+        por_contenido[entrega['sha256'] or entrega['clave']].append(entrega)
+    firmas = {h: de_bytes(datos) for h, (estado, datos) in firmas_guardadas.items() if estado == 'firmada'}
+
+    pares = []
+
+    def agregar(a, b, valor, exacta):
+        if a['tarea_id'] == tarea.id or b['tarea_id'] == tarea.id:
+            if b['tarea_id'] == tarea.id and a['tarea_id'] != tarea.id:
+                a, b = b, a
+            pares.append({'a': a, 'b': b, 'similitud': valor, 'exacta': exacta})
+
+    for grupo in por_contenido.values():
+        for a, b in combinations(grupo, 2):
+            if a['estudiante_id'] != b['estudiante_id']:
+                agregar(a, b, 1.0, True)
+    pares_candidatos = candidatos(firmas)
+    for h1, h2 in pares_candidatos:
+        valor = similitud(firmas[h1], firmas[h2])
+        if valor >= umbral:
+            for a in por_contenido[h1]:
+                for b in por_contenido[h2]:
+                    if a['estudiante_id'] != b['estudiante_id']:
+                        agregar(a, b, valor, False)
+    pares.sort(key=lambda p: (-p['similitud'], p['a']['estudiante'], p['b']['estudiante']))
+
+    propias = [e for e in entregas if e['tarea_id'] == tarea.id]
+    estados = [firmas_guardadas.get(e['sha256'], ('pendiente' if e['sha256'] else 'sin_texto',))[0] for e in propias]
+    return {
+        'pares': pares,
+        'entregas': len(propias),
+        'firmadas': estados.count('firmada'),
+        'pendientes': estados.count('pendiente'),
+        'sin_texto': estados.count('sin_texto'),
+        'candidatos': len(pares_candidatos),
+        'otros_cursos': len(entregas) - len(propias),
+        'umbral': umbral,
+        'sin_firma': [e['clave'] for e in entregas if e['sha256'] and e['sha256'] not in firmas_guardadas],
+    }
@@ -47,8 +47,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Sistema de tiempo real para horarios
     if (document.getElementById('tiempo-real-container')) {
-        actualizarTiempoReal();
-        setInterval(actualizarTiempoReal, 30000); // Actualizar cada 30 segundos
+        escucharTiempoReal();
     }
 
     // Búsqueda en tiempo real para tablas
@@ -107,75 +106,100 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+// Recibir el estado por el canal de eventos del servidor ASGI (asgi.py); si no está
+// desplegado, consultar la API cada 30 segundos
+function escucharTiempoReal() {
+    const consultar = function() {
+        actualizarTiempoReal();
+        setInterval(actualizarTiempoReal, 30000); // Actualizar cada 30 segundos
+    };
+    if (!window.EventSource) {
+        consultar();
+        return;
+    }
+    const eventos = new EventSource('/horario/api/eventos');
+    eventos.addEventListener('estado', function(evento) {
+        mostrarEstadoTiempoReal(JSON.parse(evento.data));
+    });
+    eventos.onerror = function() {
+        // El navegador reintenta solo los cortes; CLOSED es que el canal no existe
+        if (eventos.readyState === EventSource.CLOSED) {
+            consultar();
+        }
+    };
+}
+
 // Función para actualizar el estado en tiempo real
 function actualizarTiempoReal() {
     fetch('/horario/api/estado_actual')
         .then(response => response.json())
-        .then(data => {
-            if (data.error) {
-                console.log(data.error);
-                return;
-            }
-            
-            // Actualizar hora actual
-            const horaElement = document.getElementById('hora-actual');
-            if (horaElement) {
-                horaElement.textContent = data.hora_actual;
-            }
-            
-            // Actualizar clase actual
-            const claseActualElement = document.getElementById('clase-actual');
-            if (claseActualElement && data.clase_actual) {
-                let claseHtml = `
-                    <div class="horario-item">
-                        <div class="horario-hora">${data.clase_actual.hora_inicio} - ${data.clase_actual.hora_fin}</div>
-                        <div class="horario-asignatura">${data.clase_actual.asignatura}</div>
-                        <div class="horario-profesor">
-                            ${data.clase_actual.tiene_reemplazo ? 
-                                `<span class="text-warning"><i class="fas fa-exchange-alt me-1"></i>Reemplazo: ${data.clase_actual.profesor_reemplazo}</span>` :
-                                data.clase_actual.profesor
-                            }
-                        </div>
-                        <div class="text-muted">
-                            <small><i class="fas fa-users me-1"></i>${data.clase_actual.curso}</small>
-                            ${data.clase_actual.aula ? `<small class="ms-2"><i class="fas fa-door-open me-1"></i>${data.clase_actual.aula}</small>` : ''}
-                        </div>
-                    </div>
-                `;
-                claseActualElement.innerHTML = claseHtml;
-            }
-            
-            // Actualizar próxima clase
-            const proximaClaseElement = document.getElementById('proxima-clase');
-            if (proximaClaseElement && data.proxima_clase) {
-                let proximaHtml = `
-                    <div class="horario-item">
-                        <div class="horario-hora">${data.proxima_clase.hora_inicio} - ${data.proxima_clase.hora_fin}</div>
-                        <div class="horario-asignatura">${data.proxima_clase.asignatura}</div>
-                        <div class="horario-profesor">${data.proxima_clase.profesor}</div>
-                        <div class="text-muted">
-                            <small><i class="fas fa-users me-1"></i>${data.proxima_clase.curso}</small>
-                            ${data.proxima_clase.aula ? `<small class="ms-2"><i class="fas fa-door-open me-1"></i>${data.proxima_clase.aula}</small>` : ''}
-                        </div>
-                    </div>
-                `;
-                proximaClaseElement.innerHTML = proximaHtml;
-            }
-            
-            // Actualizar indicador de cambios
-            const cambiosElement = document.getElementById('cambios-confirmados');
-            if (cambiosElement) {
-                cambiosElement.textContent = data.cambios_confirmados || 0;
-                if (data.cambios_confirmados > 0) {
-                    cambiosElement.parentElement.classList.add('text-warning');
-                }
-            }
-        })
+        .then(mostrarEstadoTiempoReal)
         .catch(error => {
             console.error('Error al actualizar tiempo real:', error);
         });
 }
 
+function mostrarEstadoTiempoReal(data) {
+    if (data.error) {
+        console.log(data.error);
+        return;
+    }
+    
+    // Actualizar hora actual
+    const horaElement = document.getElementById('hora-actual');
+    if (horaElement) {
+        horaElement.textContent = data.hora_actual;
+    }
+    
+    // Actualizar clase actual
+    const claseActualElement = document.getElementById('clase-actual');
+    if (claseActualElement && data.clase_actual) {
+        let claseHtml = `
+            <div class="horario-item">
+                <div class="horario-hora">${data.clase_actual.hora_inicio} - ${data.clase_actual.hora_fin}</div>
+                <div class="horario-asignatura">${data.clase_actual.asignatura}</div>
+                <div class="horario-profesor">
+                    ${data.clase_actual.tiene_reemplazo ? 
+                        `<span class="text-warning"><i class="fas fa-exchange-alt me-1"></i>Reemplazo: ${data.clase_actual.profesor_reemplazo}</span>` :
+                        data.clase_actual.profesor
+                    }
+                </div>
+                <div class="text-muted">
+                    <small><i class="fas fa-users me-1"></i>${data.clase_actual.curso}</small>
+                    ${data.clase_actual.aula ? `<small class="ms-2"><i class="fas fa-door-open me-1"></i>${data.clase_actual.aula}</small>` : ''}
+                </div>
+            </div>
+        `;
+        claseActualElement.innerHTML = claseHtml;
+    }
+    
+    // Actualizar próxima clase
+    const proximaClaseElement = document.getElementById('proxima-clase');
+    if (proximaClaseElement && data.proxima_clase) {
+        let proximaHtml = `
+            <div class="horario-item">
+                <div class="horario-hora">${data.proxima_clase.hora_inicio} - ${data.proxima_clase.hora_fin}</div>
+                <div class="horario-asignatura">${data.proxima_clase.asignatura}</div>
+                <div class="horario-profesor">${data.proxima_clase.profesor}</div>
+                <div class="text-muted">
+                    <small><i class="fas fa-users me-1"></i>${data.proxima_clase.curso}</small>
+                    ${data.proxima_clase.aula ? `<small class="ms-2"><i class="fas fa-door-open me-1"></i>${data.proxima_clase.aula}</small>` : ''}
+                </div>
+            </div>
+        `;
+        proximaClaseElement.innerHTML = proximaHtml;
+    }
+    
+    // Actualizar indicador de cambios
+    const cambiosElement = document.getElementById('cambios-confirmados');
+    if (cambiosElement) {
+        cambiosElement.textContent = data.cambios_confirmados || 0;
+        if (data.cambios_confirmados > 0) {
+            cambiosElement.parentElement.classList.add('text-warning');
+        }
+    }
+}
+
 // Función para formatear el tamaño de archivo
 function formatFileSize(bytes) {
     if (bytes === 0) return '0 Bytes';
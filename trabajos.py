@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Cola de trabajos en segundo plano guardada en la propia base de datos.
+
+Las vistas encolan con encolar() y responden de inmediato; un pool de
+hilos dentro de la aplicación (TRABAJOS_HILOS) o procesos aparte toman
+los trabajos por prioridad, informan su avance y reintentan los fallos
+con espera creciente. No hace falta ningún broker: la tabla `trabajo` es
+la cola y un UPDATE condicionado garantiza que cada trabajo lo tome un
+solo trabajador, aunque haya varios procesos.
+
+    python trabajos.py               # Trabajador con TRABAJOS_HILOS hilos
+    python trabajos.py --hilos 4     # Trabajador con 4 hilos
+    python trabajos.py --una-vez     # Atender lo pendiente y salir
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, select, update
+
+from extensions import db
+from models import Trabajo
+
+PENDIENTE = 'pendiente'
+EN_CURSO = 'en_curso'
+TERMINADO = 'terminado'
+FALLIDO = 'fallido'
+
+PRIORIDAD_ALTA = 0
+PRIORIDAD_NORMAL = 5
+PRIORIDAD_BAJA = 9
+
+_trabajo = Trabajo.__table__
+
+# tipo -> (función, intentos máximos); se llena con @registrar al importar las rutas
+_registro = {}
+
+# Pool de este proceso (se inicia con la primera petición, ver init_app)
+_pool = None
+_lock_inicio = threading.Lock()
+
+
+def registrar(tipo, max_intentos=3):
+    """Decorador: registrar la función que ejecuta los trabajos de `tipo`.
+
+    La función recibe un Contexto y los argumentos con que se encoló, y
+    devuelve un resultado serializable en JSON.
+    """
+    def decorador(funcion):
+        _registro[tipo] = (funcion, max_intentos)
+        return funcion
+    return decorador
+
+
+class Contexto:
+    """Lo que recibe cada trabajo: su id, su carpeta de archivos y el reporte de avance"""
+
+    def __init__(self, trabajo):
+        self.id = trabajo.id
+        self.usuario_id = trabajo.usuario_id
+        self.intento = trabajo.intentos
+
+    @property
+    def carpeta(self):
+        """Carpeta para los archivos que produce el trabajo (se crea al pedirla)"""
+        ruta = carpeta_de(self.id)
+        os.makedirs(ruta, exist_ok=True)
+        return ruta
+
+    def progreso(self, porcentaje, mensaje=None):
+        """Guardar el avance (y el latido) en su propia transacción.
+
+        Con SQLite conviene llamarlo fuera de una escritura en curso de la
+        sesión, que tiene tomado el bloqueo de la base de datos.
+        """
+        valores = {'progreso': max(0, min(100, int(porcentaje))), 'latido': datetime.utcnow()}
+        if mensaje is not None:
+            valores['mensaje'] = mensaje[:200]
+        with db.engine.begin() as conexion:
+            conexion.execute(update(_trabajo).where(_trabajo.c.id == self.id).values(**valores))
+
+
+def carpeta_de(trabajo_id):
+    from flask import current_app
+    raiz = current_app.config.get('TRABAJOS_CARPETA') or os.path.join(current_app.instance_path, 'trabajos')
+    return os.path.join(raiz, str(trabajo_id))
+
+
+def encolar(tipo, prioridad=PRIORIDAD_NORMAL, usuario_id=None, **argumentos):
+    """Guardar un trabajo nuevo (con commit) y avisar al pool; devuelve el Trabajo"""
+    if tipo not in _registro:
+        raise ValueError(f'Tipo de trabajo desconocido: {tipo}')
+    trabajo = Trabajo(
+        tipo=tipo,
+        prioridad=prioridad,
+        usuario_id=usuario_id,
+        argumentos=json.dumps(argumentos, default=str),
+        max_intentos=_registro[tipo][1]
+    )
+    db.session.add(trabajo)
+    db.session.commit()
+    if _pool is not None:
+        _pool.avisar()
+    return trabajo
+
+
+def como_dict(trabajo):
+    """Estado del trabajo para la API JSON"""
+    return {
+        'id': trabajo.id,
+        'tipo': trabajo.tipo,
+        'estado': trabajo.estado,
+        'prioridad': trabajo.prioridad,
+        'progreso': trabajo.progreso,
+        'mensaje': trabajo.mensaje,
+        'intentos': trabajo.intentos,
+        'max_intentos': trabajo.max_intentos,
+        'resultado': json.loads(trabajo.resultado) if trabajo.resultado else None,
+        'error': trabajo.error,
+        'fecha_creacion': trabajo.fecha_creacion.isoformat() if trabajo.fecha_creacion else None,
+        'fecha_inicio': trabajo.fecha_inicio.isoformat() if trabajo.fecha_inicio else None,
+        'fecha_fin': trabajo.fecha_fin.isoformat() if trabajo.fecha_fin else None,
+    }
+
+
+def _tomar(nombre):
+    """Marcar como en curso el siguiente trabajo disponible; devuelve su id o None.
+
+    El UPDATE vuelve a comprobar el estado, así dos trabajadores que eligen
+    la misma fila no pueden tomarla los dos. En PostgreSQL la subconsulta
+    salta las filas bloqueadas (SKIP LOCKED) y cada trabajador elige otra;
+    SQLite serializa las escrituras y no lo necesita.
+    """
+    ahora = datetime.utcnow()
+    siguiente = select(_trabajo.c.id).where(
+        _trabajo.c.estado == PENDIENTE,
+        _trabajo.c.disponible_desde <= ahora
+    ).order_by(_trabajo.c.prioridad, _trabajo.c.id).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+    with db.engine.begin() as conexion:
+        return conexion.execute(
+            update(_trabajo)
+            .where(_trabajo.c.id == siguiente, _trabajo.c.estado == PENDIENTE)
+            .values(estado=EN_CURSO, trabajador=nombre, intentos=_trabajo.c.intentos + 1,
+                    fecha_inicio=ahora, latido=ahora, progreso=0)
+            .returning(_trabajo.c.id)
+        ).scalar()
+
+
+def _finalizar(trabajo_id, **valores):
+    with db.engine.begin() as conexion:
+        conexion.execute(update(_trabajo).where(_trabajo.c.id == trabajo_id).values(**valores))
+
+
+def _fallar(trabajo, error, reintento):
+    """Volver a la cola con espera creciente o, sin intentos restantes, marcar como fallido"""
+    ahora = datetime.utcnow()
+    if trabajo.intentos < trabajo.max_intentos:
+        espera = timedelta(seconds=reintento * 2 ** (trabajo.intentos - 1))
+        _finalizar(trabajo.id, estado=PENDIENTE, error=error, trabajador=None,
+                   disponible_desde=ahora + espera, mensaje=f'Reintento {trabajo.intentos + 1} de {trabajo.max_intentos}')
+    else:
+        _finalizar(trabajo.id, estado=FALLIDO, error=error, fecha_fin=ahora)
+
+
+class _Latido:
+    """Renueva el latido de un trabajo mientras corre, aunque no informe su avance.
+
+    Sin esto, un trabajo largo que no llama a progreso() (un backup de una
+    base grande) parece abandonado pasado TRABAJOS_EXPIRACION y otro
+    trabajador lo vuelve a ejecutar mientras el primero sigue.
+    """
+
+    def __init__(self, app, trabajo_id, intervalo):
+        self.app = app
+        self.trabajo_id = trabajo_id
+        self.intervalo = intervalo
+        self._fin = threading.Event()
+
+    def __enter__(self):
+        threading.Thread(target=self._ejecutar, name=f'latido-{self.trabajo_id}', daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        # Sin esperar al hilo: con SQLite puede estar esperando el bloqueo que tiene el trabajo
+        self._fin.set()
+
+    def _ejecutar(self):
+        while not self._fin.wait(self.intervalo):
+            try:
+                with self.app.app_context(), db.engine.begin() as conexion:
+                    conexion.execute(update(_trabajo).where(
+                        _trabajo.c.id == self.trabajo_id, _trabajo.c.estado == EN_CURSO
+                    ).values(latido=datetime.utcnow()))
+            except Exception:
+                # Se reintenta en el siguiente intervalo (p. ej. base bloqueada por el propio trabajo)
+                self.app.logger.warning('No se pudo renovar el latido del trabajo %s', self.trabajo_id,
+                                        exc_info=True)
+
+
+def ejecutar(app, trabajo_id):
+    """Ejecutar un trabajo ya tomado y guardar su resultado o su error"""
+    with app.app_context():
+        try:
+            trabajo = db.session.get(Trabajo, trabajo_id)
+            if trabajo is None:
+                return
+            registrado = _registro.get(trabajo.tipo)
+            if registrado is None and 'arranque' in app.extensions:
+                # Rutas perezosas: el módulo que registra el tipo quizá no se importó todavía
+                app.extensions['arranque'].importar_todo()
+                registrado = _registro.get(trabajo.tipo)
+            if registrado is None:
+                _finalizar(trabajo_id, estado=FALLIDO, error=f'Tipo de trabajo desconocido: {trabajo.tipo}',
+                           fecha_fin=datetime.utcnow())
+                return
+            contexto = Contexto(trabajo)
+            argumentos = json.loads(trabajo.argumentos or '{}')
+            try:
+                with _Latido(app, trabajo_id, app.config.get('TRABAJOS_LATIDO', 60)):
+                    resultado = registrado[0](contexto, **argumentos)
+                    db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.exception('Error en el trabajo %s (%s)', trabajo_id, trabajo.tipo)
+                _fallar(trabajo, f'{type(e).__name__}: {e}', app.config.get('TRABAJOS_REINTENTO', 30))
+                return
+            _finalizar(trabajo_id, estado=TERMINADO, progreso=100, error=None,
+                       resultado=json.dumps(resultado, default=str), fecha_fin=datetime.utcnow())
+        finally:
+            db.session.remove()
+
+
+def recuperar_expirados(expiracion):
+    """Devolver a la cola los trabajos en curso cuyo trabajador dejó de dar señales"""
+    ahora = datetime.utcnow()
+    with db.engine.begin() as conexion:
+        return conexion.execute(
+            update(_trabajo)
+            .where(_trabajo.c.estado == EN_CURSO, _trabajo.c.latido < ahora - timedelta(seconds=expiracion))
+            .values(estado=case((_trabajo.c.intentos >= _trabajo.c.max_intentos, FALLIDO), else_=PENDIENTE),
+                    fecha_fin=case((_trabajo.c.intentos >= _trabajo.c.max_intentos, ahora), else_=None),
+                    trabajador=None, error='El trabajador dejó de responder')
+        ).rowcount
+
+
+def procesar_pendientes(app, limite=None):
+    """Atender en este hilo los trabajos disponibles; devuelve cuántos se ejecutaron"""
+    nombre = f'{os.getpid()}:{threading.current_thread().name}'
+    ejecutados = 0
+    while limite is None or ejecutados < limite:
+        with app.app_context():
+            trabajo_id = _tomar(nombre)
+        if trabajo_id is None:
+            break
+        ejecutar(app, trabajo_id)
+        ejecutados += 1
+    return ejecutados
+
+
+class PoolTrabajos:
+    """Hilos que atienden la cola.
+
+    Los trabajos encolados en este proceso despiertan a un hilo al
+    instante (avisar); los de otros procesos se descubren consultando la
+    cola cada `espera` segundos.
+    """
+
+    def __init__(self, app, hilos=2, espera=2.0):
+        self.app = app
+        self.hilos = hilos
+        self.espera = espera
+        self._condicion = threading.Condition()
+        self._detener = False
+        self._hilos = []
+        self._ultima_revision = 0.0
+
+    def iniciar(self):
+        for i in range(self.hilos):
+            hilo = threading.Thread(target=self._ejecutar, name=f'trabajos-{i + 1}', daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def detener(self):
+        with self._condicion:
+            self._detener = True
+            self._condicion.notify_all()
+        for hilo in self._hilos:
+            hilo.join()
+
+    def avisar(self):
+        with self._condicion:
+            self._condicion.notify()
+
+    def _revisar_expirados(self):
+        # Como mucho una vez por minuto entre todos los hilos del proceso
+        ahora = time.monotonic()
+        with self._condicion:
+            if ahora - self._ultima_revision < 60:
+                return
+            self._ultima_revision = ahora
+        with self.app.app_context():
+            recuperar_expirados(self.app.config.get('TRABAJOS_EXPIRACION', 600))
+
+    def _ejecutar(self):
+        nombre = f'{os.getpid()}:{threading.current_thread().name}'
+        while not self._detener:
+            try:
+                self._revisar_expirados()
+                with self.app.app_context():
+                    trabajo_id = _tomar(nombre)
+            except Exception:
+                self.app.logger.exception('Error consultando la cola de trabajos')
+                trabajo_id = None
+            if trabajo_id is None:
+                with self._condicion:
+                    if not self._detener:
+                        self._condicion.wait(self.espera)
+                continue
+            ejecutar(self.app, trabajo_id)
+
+
+def iniciar(app, hilos=None):
+    """Crear y arrancar el pool de este proceso (una sola vez)"""
+    global _pool
+    with _lock_inicio:
+        if _pool is None:
+            pool = PoolTrabajos(app, hilos or app.config.get('TRABAJOS_HILOS', 2))
+            pool.iniciar()
+            _pool = pool
+    return _pool
+
+
+def init_app(app):
+    """Arrancar el pool con la primera petición (los scripts y las pruebas no lo inician)"""
+    if app.config.get('TRABAJOS_HILOS', 2) <= 0 or app.testing:
+        return
+
+    @app.before_request
+    def iniciar_trabajos():
+        if _pool is None:
+            iniciar(app)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hilos', type=int, default=None, help='Hilos del trabajador (por defecto TRABAJOS_HILOS)')
+    parser.add_argument('--una-vez', action='store_true', help='Atender lo pendiente y salir')
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app()
+    if args.una_vez:
+        with app.app_context():
+            recuperar_expirados(app.config.get('TRABAJOS_EXPIRACION', 600))
+        total = procesar_pendientes(app)
+        print(f"✅ {total} trabajos ejecutados")
+        return 0
+
+    pool = iniciar(app, args.hilos)
+    print(f"⚙️  Trabajador en marcha con {pool.hilos} hilos (Ctrl+C para salir)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\n⏹️  Deteniendo trabajador...")
+        pool.detener()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())